@@ -0,0 +1,162 @@
+"""
+Benchmarks the download-and-convert path of the downloader against a local fake
+YouTube, at several stream sizes, formats and concurrency levels, and stores
+the results as JSON so they can be compared between commits.
+
+Every scenario runs in a fresh interpreter, so its peak RSS and CPU time are its own.
+
+Usage: python -m benchmarks.download_convert [--sizes MB ...] [--formats MP4 MP3,OPUS ...]
+       [--concurrency N ...] [--videos N] [--rate MB/s] [--failure-rate P]
+       [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.fake_youtube import FakeVideo, FakeYouTube, make_media, patch_resolution
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def peak_rss(usage: resource.struct_rusage) -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def run_scenario(base_url: str, urls: list[str], format_name: str, concurrency: int) -> dict:
+    """Downloads and converts `urls` in this process, returning its measurements."""
+    from youtube_downloader.cli import HeadlessRunner
+    from youtube_downloader.core.constants import Formats
+    from youtube_downloader.core.library import configure_library
+    from youtube_downloader.models.job import JobState
+
+    with tempfile.TemporaryDirectory() as output, open(os.devnull, "w") as devnull, patch_resolution(base_url):
+        # Every scenario starts from an empty library, or it would not download anything
+        configure_library(os.path.join(output, ".library"))
+        formats = [Formats[name].value for name in format_name.split(",")]
+        runner = HeadlessRunner(output, formats[0], concurrency, output=devnull, extra_formats=formats[1:])
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        runner.submit(urls)
+        jobs = runner.wait()
+        wall_time = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "wall_time": wall_time,
+        "failed": sum(job.state is JobState.FAILED for job in jobs),
+        "cpu_user": after.ru_utime - before.ru_utime + children.ru_utime,
+        "cpu_system": after.ru_stime - before.ru_stime + children.ru_stime,
+        "peak_rss": peak_rss(after),
+        "ffmpeg_peak_rss": peak_rss(children),
+    }
+
+
+def run_child(fake: FakeYouTube, urls: list[str], format_name: str, concurrency: int) -> dict:
+    served = fake.bytes_served
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.download_convert", "--child", fake.base_url, format_name,
+         str(concurrency), *urls],
+        capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Scenario failed:\n{process.stderr}")
+    result = json.loads(process.stdout.splitlines()[-1])
+    result["bytes"] = fake.bytes_served - served
+    result["throughput"] = result["bytes"] / result["wall_time"]
+    return result
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    key = lambda result: (result["format"], result["size_mb"], result["concurrency"], result["videos"])
+    previous = {key(result): result for result in baseline["results"]}
+    print(f"\nCompared to {baseline['commit']}:")
+    for result in results:
+        old = previous.get(key(result))
+        if old is not None:
+            change = (result["wall_time"] / old["wall_time"] - 1) * 100
+            print(f"  {result['format']:>4} {result['size_mb']:>6.1f} MB x{result['concurrency']}: "
+                  f"{old['wall_time']:7.2f}s -> {result['wall_time']:7.2f}s ({change:+.1f}%)")
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        base_url, format_name, concurrency, *urls = sys.argv[2:]
+        print(json.dumps(run_scenario(base_url, urls, format_name, int(concurrency))))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[4, 16], help="video stream sizes in MB")
+    parser.add_argument(
+        "--formats", nargs="+", default=["MP4", "MP3"],
+        help="output formats, comma separated ones such as MP4,MP3 are made from a single download"
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="concurrent downloads")
+    parser.add_argument("--videos", type=int, default=4, help="videos downloaded per scenario")
+    parser.add_argument("--rate", type=float, default=0, help="per-connection limit in MB/s, 0 for none")
+    parser.add_argument("--failure-rate", type=float, default=0, help="probability of a range request failing")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="FILE", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    fake = FakeYouTube(args.rate * 1024 * 1024 or None, args.failure_rate).start()
+    results = []
+    with tempfile.TemporaryDirectory() as media:
+        for size_mb in args.sizes:
+            streams, length = make_media(media, int(size_mb * 1024 * 1024))
+            urls = [
+                fake.add_video(FakeVideo(f"b{int(size_mb * 10):04}v{index:05}", f"Video {index}", length, streams))
+                for index in range(args.videos)
+            ]
+            for format_name in args.formats:
+                for concurrency in args.concurrency:
+                    result = {
+                        "format": format_name,
+                        "size_mb": size_mb,
+                        "concurrency": concurrency,
+                        "videos": args.videos,
+                        **run_child(fake, urls, format_name, concurrency),
+                    }
+                    results.append(result)
+                    print(f"{format_name:>4} {size_mb:>6.1f} MB x{concurrency}: {result['wall_time']:7.2f}s "
+                          f"{result['throughput'] / 1024 / 1024:8.2f} MB/s  "
+                          f"cpu {result['cpu_user'] + result['cpu_system']:6.2f}s  "
+                          f"rss {result['peak_rss'] / 1024 / 1024:6.1f} MB  failed {result['failed']}")
+    fake.stop()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({
+            "commit": commit,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": vars(args),
+            "results": results,
+        }, file, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+A local stand-in for YouTube: serves the metadata of synthetic videos and their
+streams, with a per-connection throughput limit, injected failures and throttling, and
+patches the resolution of videos to use it instead of pytubefix.
+"""
+import http.server
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, Iterator, Optional
+from youtube_downloader.core import resolver
+from youtube_downloader.core.cache import VideoCache
+from youtube_downloader.models.video_info import StreamInfo, VideoInfo
+
+BLOCK_SIZE = 64 * 1024
+# Bytes per second of media of the lossless sample video, used to size it
+SAMPLE_VIDEO_RATE = 480 * 1024
+SAMPLE_AUDIO_BITRATE = 128_000
+
+
+@dataclass
+class FakeStream:
+    itag: int
+    path: str
+    mime_type: str
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    resolution: Optional[str] = None
+    bitrate: Optional[int] = None
+    progressive: bool = False
+
+
+@dataclass
+class FakeVideo:
+    video_id: str
+    title: str
+    length: int
+    streams: list[FakeStream] = field(default_factory=list)
+    # Path of the JPEG served as the thumbnail of the video, it has none if None
+    thumbnail: Optional[str] = None
+
+
+def make_media(directory: str, size: int) -> tuple[list[FakeStream], int]:
+    """
+    Encodes a lossless H.264 video stream of about `size` bytes and a matching
+    AAC audio stream with FFmpeg, both fragmented like YouTube's adaptive streams.
+
+    Returns the streams and the length of the media in seconds.
+    """
+    length = max(1, round(size / SAMPLE_VIDEO_RATE))
+    video_path = os.path.join(directory, f"video-{size}.mp4")
+    audio_path = os.path.join(directory, f"audio-{size}.m4a")
+    fragmented = ["-movflags", "frag_keyframe+empty_moov", "-f", "mp4"]
+    if not os.path.exists(video_path):
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=640x360:rate=25", "-t", str(length),
+            "-c:v", "libx264", "-preset", "ultrafast", "-qp", "0", *fragmented, video_path
+        ], check=True)
+    if not os.path.exists(audio_path):
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "sine=frequency=440", "-t", str(length),
+            "-c:a", "aac", "-b:a", str(SAMPLE_AUDIO_BITRATE), *fragmented, audio_path
+        ], check=True)
+    streams = [
+        FakeStream(137, video_path, "video/mp4", video_codec="avc1.640028", resolution="1080p",
+                   bitrate=os.path.getsize(video_path) * 8 // length),
+        FakeStream(140, audio_path, "audio/mp4", audio_codec="mp4a.40.2", bitrate=SAMPLE_AUDIO_BITRATE),
+    ]
+    return streams, length
+
+
+def make_thumbnail(directory: str) -> str:
+    """Encodes a 480x360 JPEG thumbnail with FFmpeg, the size of YouTube's hqdefault ones."""
+    path = os.path.join(directory, "thumbnail.jpg")
+    if not os.path.exists(path):
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=480x360", "-frames:v", "1", path
+        ], check=True)
+    return path
+
+
+class FakeYouTube:
+    """
+    Serves `/watch?v=<id>` metadata as JSON, `/videoplayback` range requests and
+    `/thumbnail?v=<id>` images for the registered videos.
+
+    Attributes
+    ----------
+    rate : Optional[float]
+        The bytes per second a single connection is limited to, unlimited if None.
+    failure_rate : float
+        The probability of a range request failing with a 503.
+    throttle_after : Optional[int]
+        The bytes of each range response sent at full speed before it slows down
+        to `throttle_rate`, as YouTube does to some connections. Never if None.
+    throttle_rate : float
+        The bytes per second a throttled response is slowed down to.
+    throttled_itags : set[int]
+        The streams whose responses are throttled from their first byte, whatever `throttle_after`.
+    """
+    def __init__(
+            self,
+            rate: Optional[float] = None,
+            failure_rate: float = 0.0,
+            seed: int = 0,
+            throttle_after: Optional[int] = None,
+            throttle_rate: float = 32 * 1024,
+            throttled_itags: Iterable[int] = ()
+            ) -> None:
+        self.rate = rate
+        self.failure_rate = failure_rate
+        self.throttle_after = throttle_after
+        self.throttle_rate = throttle_rate
+        self.throttled_itags = set(throttled_itags)
+        self.videos: dict[str, FakeVideo] = {}
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self.bytes_served = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def add_video(self, video: FakeVideo) -> str:
+        """Registers a video and returns its watch URL."""
+        self.videos[video.video_id] = video
+        return f"https://www.youtube.com/watch?v={video.video_id}"
+
+    def start(self) -> "FakeYouTube":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.failure_rate
+            self.failures += failed
+            return failed
+
+    def _metadata(self, video: FakeVideo) -> dict:
+        streams = [
+            StreamInfo(
+                itag=stream.itag,
+                url=f"{self.base_url}/videoplayback?id={video.video_id}&itag={stream.itag}&clen={os.path.getsize(stream.path)}",
+                mime_type=stream.mime_type,
+                is_progressive=stream.progressive,
+                video_codec=stream.video_codec,
+                audio_codec=stream.audio_codec,
+                resolution=stream.resolution,
+                bitrate=stream.bitrate
+            )
+            for stream in video.streams
+        ]
+        thumbnail_url = f"{self.base_url}/thumbnail?v={video.video_id}" if video.thumbnail else ""
+        info = VideoInfo(video.video_id, video.title, "Benchmark", video.length, "", thumbnail_url, streams)
+        return asdict(info)
+
+    def _handler(self) -> type[http.server.BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+            def send_body(
+                    self,
+                    body: bytes,
+                    content_type: str = "application/octet-stream",
+                    throttle_from: Optional[int] = None
+                    ) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                began = time.perf_counter()
+                try:
+                    for offset in range(0, len(body), BLOCK_SIZE):
+                        if throttle_from is not None and offset >= throttle_from:
+                            time.sleep(BLOCK_SIZE / fake.throttle_rate)
+                        self.wfile.write(body[offset:offset + BLOCK_SIZE])
+                        if fake.rate:
+                            delay = (offset + BLOCK_SIZE) / fake.rate - (time.perf_counter() - began)
+                            if delay > 0:
+                                time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # The client cancelled the download
+
+            def do_GET(self) -> None:
+                url = urllib.parse.urlparse(self.path)
+                query = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+                video = fake.videos.get(query.get("v") or query.get("id", ""))
+                if video is None:
+                    self.send_error(404)
+                    return
+                if url.path == "/watch":
+                    self.send_body(json.dumps(fake._metadata(video)).encode("utf-8"), "application/json")
+                    return
+                if url.path == "/thumbnail" and video.thumbnail:
+                    with open(video.thumbnail, "rb") as file:
+                        self.send_body(file.read(), "image/jpeg")
+                    return
+                if fake._should_fail():
+                    self.send_error(503)
+                    return
+                stream = next(stream for stream in video.streams if stream.itag == int(query["itag"]))
+                start, stop = (int(value) for value in query["range"].split("-"))
+                with open(stream.path, "rb") as file:
+                    file.seek(start)
+                    body = file.read(stop - start + 1)
+                throttle_from = 0 if stream.itag in fake.throttled_itags else fake.throttle_after
+                with fake._lock:
+                    fake.bytes_served += len(body)
+                    fake.throttled += throttle_from is not None and throttle_from < len(body)
+                self.send_body(body, throttle_from=throttle_from)
+
+        return Handler
+
+
+@contextmanager
+def patch_resolution(base_url: str) -> Iterator[None]:
+    """Resolves videos from the `FakeYouTube` at `base_url` instead of YouTube, through a fresh in-memory cache."""
+    original_resolve, original_resolver = resolver.resolve_video, resolver._resolver
+
+    def resolve_video(url: str) -> VideoInfo:
+        video_id = resolver.video_id_of(url)
+        with urllib.request.urlopen(f"{base_url}/watch?v={video_id}") as response:
+            data = json.load(response)
+        data["streams"] = [StreamInfo(**stream) for stream in data["streams"]]
+        return VideoInfo(**data)
+
+    resolver.resolve_video = resolve_video
+    resolver._resolver = resolver.MetadataResolver(VideoCache())
+    try:
+        yield
+    finally:
+        resolver.resolve_video, resolver._resolver = original_resolve, original_resolver
@@ -0,0 +1,75 @@
+"""
+Measures the speedup of segmented downloads against a local HTTP server that
+throttles every connection, the way YouTube limits per-connection throughput.
+
+Usage: python -m benchmarks.segmented_download [--size MB] [--rate MB/s] [--connections N ...]
+"""
+import argparse
+import http.server
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+from youtube_downloader.core.engine import get_engine
+from youtube_downloader.core.transfer import download_to_file
+
+BLOCK_SIZE = 64 * 1024
+
+
+def make_server(payload: bytes, rate: float) -> http.server.ThreadingHTTPServer:
+    class ThrottledHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            start, stop = (int(value) for value in query["range"][0].split("-"))
+            body = payload[start:stop + 1]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            began = time.perf_counter()
+            for offset in range(0, len(body), BLOCK_SIZE):
+                self.wfile.write(body[offset:offset + BLOCK_SIZE])
+                delay = (offset + BLOCK_SIZE) / rate - (time.perf_counter() - began)
+                if delay > 0:
+                    time.sleep(delay)
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ThrottledHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=float, default=32, help="payload size in MB")
+    parser.add_argument("--rate", type=float, default=4, help="per-connection limit in MB/s")
+    parser.add_argument("--segment-size", type=float, default=2, help="segment size in MB")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    payload = os.urandom(int(args.size * 1024 * 1024))
+    server = make_server(payload, args.rate * 1024 * 1024)
+    url = f"http://127.0.0.1:{server.server_port}/videoplayback?id=bench"
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        destination = os.path.join(directory, "bench.mp4")
+        for connections in args.connections:
+            start = time.perf_counter()
+            get_engine().run(download_to_file(url, len(payload), destination, connections=connections,
+                                              segment_size=int(args.segment_size * 1024 * 1024)))
+            elapsed = time.perf_counter() - start
+            with open(destination, "rb") as file:
+                assert file.read() == payload, "downloaded file differs from the payload"
+            baseline = baseline or elapsed
+            print(f"{connections:>3} connections: {elapsed:6.2f}s "
+                  f"{len(payload) / elapsed / 1024 / 1024:7.2f} MB/s  speedup x{baseline / elapsed:.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
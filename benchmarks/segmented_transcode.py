@@ -0,0 +1,111 @@
+"""
+Converts a long video to AVI and MOV, whose video is encoded again, in a single
+FFmpeg run and in segments encoded by more and more parallel runs.
+
+The source is made up by FFmpeg like YouTube's adaptive streams: an H.264 video
+track with a keyframe every few seconds and an AAC audio track, in separate files.
+Every segmented output is checked against the single run one: same duration,
+same decoding timestamps and durations for every packet of both tracks, and same
+presentation times for the frames. Their order may differ around the cuts, where
+the encoder places its B-frames in another pattern.
+
+Usage: python -m benchmarks.segmented_transcode [--length S] [--size WxH] [--workers N ...] [--formats AVI MOV]
+"""
+import argparse
+import os
+import re
+import subprocess
+import tempfile
+import time
+from youtube_downloader.core.constants import Formats, TRANSCODE_SLOTS
+from youtube_downloader.core.downloader import Downloader
+from youtube_downloader.core.planner import plan_conversion
+from youtube_downloader.models.video_info import StreamInfo
+
+# Frames between keyframes of the source, as in YouTube's streams
+KEYFRAME_INTERVAL = 150
+
+
+def make_source(directory: str, length: float, size: str) -> list[str]:
+    """Writes a video stream and an audio stream lasting `length` seconds, returning their paths."""
+    video = os.path.join(directory, "video.mp4")
+    audio = os.path.join(directory, "audio.m4a")
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-nostdin", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30000/1001:duration={length}",
+        "-c:v", "libx264", "-preset", "veryfast", "-g", str(KEYFRAME_INTERVAL), video,
+    ], check=True)
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-nostdin", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={length}", "-c:a", "aac", audio,
+    ], check=True)
+    return [video, audio]
+
+
+def packets(path: str) -> tuple[float, list[str]]:
+    """
+    The duration of a file, the stream, decoding timestamp and duration of each of its
+    packets, followed by the presentation timestamps of each stream in display order.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostdin", "-i", path, "-map", "0", "-c", "copy", "-f", "framecrc", "-"],
+        capture_output=True, text=True, check=True
+    )
+    match = re.search(r"Duration: (\d+):(\d+):([\d.]+)", result.stderr)
+    hours, minutes, seconds = match.groups() if match else ("0", "0", "0")
+    rows = [
+        [field.strip() for field in line.split(",")[:4]]
+        for line in result.stdout.splitlines() if not line.startswith("#")
+    ]
+    timing = [f"{stream},{dts},{duration}" for stream, dts, _, duration in rows]
+    for index in sorted({stream for stream, *_ in rows}):
+        timing.extend(sorted((pts for stream, _, pts, _ in rows if stream == index), key=int))
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds), timing
+
+
+def convert(sources: list[str], file_format_name: str, output: str, length: float, workers: int) -> float:
+    """Converts the sources in `workers` runs, returning the seconds it took."""
+    file_format = Formats[file_format_name].value
+    # Described as VP9 from a WebM stream, so the H.264 of MOV is encoded again rather than copied
+    streams = [
+        StreamInfo(0, "", "video/webm", False, video_codec="vp9"),
+        StreamInfo(1, "", "audio/mp4", False, audio_codec="mp4a.40.2"),
+    ]
+    plan = plan_conversion(streams, file_format)
+    downloader = Downloader("https://www.youtube.com/watch?v=segmented01", output, file_format)
+    start = time.perf_counter()
+    downloader.convert_video(f"{workers}", sources, [plan], output, length, None, workers)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--length", type=float, default=600, help="length of the video in seconds")
+    parser.add_argument("--size", default="1280x720", help="frame size of the video")
+    parser.add_argument("--workers", type=int, nargs="+", help="parallel runs to try, powers of two up to the cores by default")
+    parser.add_argument("--formats", nargs="+", default=["AVI", "MOV"], choices=[member.name for member in Formats])
+    args = parser.parse_args()
+    workers = args.workers or [2 ** power for power in range(TRANSCODE_SLOTS.bit_length()) if 2 ** power > 1]
+    if not args.workers and TRANSCODE_SLOTS not in workers and TRANSCODE_SLOTS > 1:
+        workers.append(TRANSCODE_SLOTS)
+
+    print(f"{TRANSCODE_SLOTS} cores, {args.length:.0f}s of {args.size} video")
+    with tempfile.TemporaryDirectory() as media:
+        sources = make_source(media, args.length, args.size)
+        for name in args.formats:
+            extension = Formats[name].value.extension
+            single = convert(sources, name, media, args.length, 1)
+            reference = packets(os.path.join(media, f"1.{extension}"))
+            print(f"{name:>4}  single run: {single:7.2f}s  duration {reference[0]:.2f}s  {sum("," in row for row in reference[1])} packets")
+            for count in workers:
+                elapsed = convert(sources, name, media, args.length, count)
+                duration, timing = packets(os.path.join(media, f"{count}.{extension}"))
+                check = "same timing" if (duration, timing) == reference else (
+                    f"DIFFERENT: duration {duration:.2f}s, {len(timing)} packets, "
+                    f"{sum(a != b for a, b in zip(timing, reference[1]))} differing"
+                )
+                print(f"{name:>4}  {count:>3} workers: {elapsed:7.2f}s  speedup {single / elapsed:5.2f}x  {check}")
+
+
+if __name__ == "__main__":
+    main()
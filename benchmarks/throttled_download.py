@@ -0,0 +1,81 @@
+"""
+Downloads a video from a local fake YouTube that throttles on purpose, with the
+throttling detection and retries of the transfers turned off and on.
+
+Three servers are tried: one slowing every response down after its first bytes,
+one throttling a stream from its first byte while an equivalent itag is served
+at full speed, and one failing a share of the requests with a 503.
+
+Usage: python -m benchmarks.throttled_download [--size MB] [--throttle-after KB] [--throttle-rate KB/s]
+       [--min-rate KB/s] [--window S] [--failure-rate P]
+"""
+import argparse
+import dataclasses
+import os
+import tempfile
+import time
+from benchmarks.fake_youtube import FakeStream, FakeVideo, FakeYouTube, make_media, patch_resolution
+from youtube_downloader.core.constants import Formats
+from youtube_downloader.core.downloader import Downloader
+from youtube_downloader.core.library import configure_library
+from youtube_downloader.core.retry import TransferPolicy, get_transfer_policy
+
+# The itag of the copy of the video stream, served under another itag like YouTube's duplicate encodes
+MIRROR_ITAG = 10137
+
+
+def run(fake: FakeYouTube, url: str, policy: TransferPolicy) -> tuple[float, str]:
+    """Downloads `url` with `policy`, returning the seconds it took and how it ended."""
+    # Transfers follow the process-wide policy, as with the --throttle-rate option of the CLI
+    current = get_transfer_policy()
+    for name, value in dataclasses.asdict(policy).items():
+        setattr(current, name, value)
+    with tempfile.TemporaryDirectory() as output, patch_resolution(fake.base_url):
+        configure_library(os.path.join(output, ".library"))
+        downloader = Downloader(url, output, Formats.MP4.value, pipelined=False)
+        start = time.perf_counter()
+        try:
+            downloader.run()
+            outcome = "done"
+        except Exception as e:
+            outcome = f"failed: {e}"
+        return time.perf_counter() - start, outcome
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=float, default=4, help="video stream size in MB")
+    parser.add_argument("--throttle-after", type=float, default=512, help="KB of each response sent at full speed")
+    parser.add_argument("--throttle-rate", type=float, default=128, help="speed of a throttled response in KB/s")
+    parser.add_argument("--min-rate", type=float, default=192, help="throttling threshold of the downloader in KB/s")
+    parser.add_argument("--window", type=float, default=1, help="seconds the throughput is measured over")
+    parser.add_argument("--failure-rate", type=float, default=0.3, help="probability of a request failing")
+    args = parser.parse_args()
+
+    policies = {
+        "off": TransferPolicy(min_rate=None, retries=0),
+        "on": TransferPolicy(min_rate=args.min_rate * 1024, window=args.window),
+    }
+    with tempfile.TemporaryDirectory() as media:
+        streams, length = make_media(media, int(args.size * 1024 * 1024))
+        mirror = dataclasses.replace(streams[0], itag=MIRROR_ITAG)
+        servers = {
+            "throttled responses": FakeYouTube(
+                throttle_after=int(args.throttle_after * 1024), throttle_rate=args.throttle_rate * 1024
+            ),
+            "throttled itag": FakeYouTube(throttled_itags={streams[0].itag}, throttle_rate=args.throttle_rate * 1024),
+            "failing requests": FakeYouTube(failure_rate=args.failure_rate, seed=1),
+        }
+        for scenario, fake in servers.items():
+            fake.start()
+            url = fake.add_video(FakeVideo("throttled01", "Throttled", length, [*streams, mirror]))
+            for name, policy in policies.items():
+                requests, throttled = fake.requests, fake.throttled
+                elapsed, outcome = run(fake, url, policy)
+                print(f"{scenario:>20}, detection {name:>3}: {elapsed:7.2f}s  "
+                      f"requests {fake.requests - requests:3}  throttled {fake.throttled - throttled:3}  {outcome}")
+            fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import asyncio
+import datetime
+import threading
+import time
+from youtube_downloader.core.bandwidth import BandwidthLimiter, BandwidthRule
+from youtube_downloader.core.constants import INTERACTIVE_PRIORITY
+
+RATE = 1_000_000
+CHUNK = 50_000
+CHUNKS = 20
+
+
+def test_no_cap_never_waits():
+    limiter = BandwidthLimiter()
+    started = time.monotonic()
+    limiter.default_share.consume(1024 * 1024 * 1024)
+    assert time.monotonic() - started < 0.1
+
+
+def assert_throughput(elapsed: float) -> None:
+    # The first chunk goes at once, the bucket only starts charging the cap from it
+    throughput = (CHUNKS - 1) * CHUNK / elapsed
+    assert 0.9 * RATE <= throughput <= 1.03 * RATE
+
+
+def test_the_cap_holds_back_the_chunks():
+    limiter = BandwidthLimiter(rate=RATE, burst=0.01)
+    started = time.monotonic()
+    for _ in range(CHUNKS):
+        limiter.default_share.consume(CHUNK)
+    assert_throughput(time.monotonic() - started)
+
+
+def test_the_cap_holds_back_asynchronous_chunks():
+    limiter = BandwidthLimiter(rate=RATE, burst=0.01)
+
+    async def consume() -> float:
+        started = time.monotonic()
+        for _ in range(CHUNKS):
+            await limiter.default_share.consume_async(CHUNK)
+        return time.monotonic() - started
+
+    assert_throughput(asyncio.run(consume()))
+
+
+def test_interactive_shares_go_first():
+    limiter = BandwidthLimiter(rate=1_000_000, burst=0.01)
+    limiter.default_share.consume(200_000)  # Leaves the bucket in debt, so the next chunks queue up
+    background, interactive = limiter.share(), limiter.share(INTERACTIVE_PRIORITY)
+    order = []
+
+    def consume(share, name):
+        share.consume(50_000)
+        order.append(name)
+
+    threads = [threading.Thread(target=consume, args=(background, "background"))]
+    threads[0].start()
+    time.sleep(0.01)
+    threads.append(threading.Thread(target=consume, args=(interactive, "interactive")))
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    assert order == ["interactive", "background"]
+
+
+def test_schedule():
+    rule = BandwidthRule(datetime.time(22), datetime.time(6), 1000)
+    assert rule.applies(datetime.time(23))
+    assert rule.applies(datetime.time(5))
+    assert not rule.applies(datetime.time(12))
+    whole_day = [BandwidthRule(datetime.time(0), datetime.time(12), 2000), BandwidthRule(datetime.time(12), datetime.time(0), 2000)]
+    limiter = BandwidthLimiter(rate=5000, schedule=whole_day)
+    assert limiter.current_rate() == 2000
+    limiter.set_schedule([])
+    assert limiter.current_rate() == 5000
@@ -0,0 +1,67 @@
+from youtube_downloader.core.events import Event, EventBus, OverflowPolicy
+
+
+class ManualDispatcher:
+    """Holds the deliveries until the test runs them, as a consumer thread busy elsewhere would."""
+    def __init__(self) -> None:
+        self.pending = []
+
+    def __call__(self, function) -> None:
+        self.pending.append(function)
+
+    def run(self) -> None:
+        pending, self.pending = self.pending, []
+        for function in pending:
+            function()
+
+
+def test_merge_keeps_the_latest_event_per_key():
+    bus = EventBus()
+    dispatcher = ManualDispatcher()
+    received = []
+    bus.subscribe("progress", received.append, dispatcher, batch=True, policy=OverflowPolicy.MERGE)
+    for progress in (10, 20, 30):
+        bus.publish(Event("progress", {"job": 1, "progress": progress}, key=1))
+    bus.publish(Event("progress", {"job": 2, "progress": 5}, key=2))
+    assert len(dispatcher.pending) == 1  # A single delivery for the whole burst
+    dispatcher.run()
+    assert received == [[{"job": 1, "progress": 30}, {"job": 2, "progress": 5}]]
+    stats = bus.stats()["progress"]
+    assert (stats.published, stats.merged, stats.delivered, stats.dropped) == (4, 2, 2, 0)
+
+
+def test_merged_events_keep_their_place():
+    bus = EventBus()
+    dispatcher = ManualDispatcher()
+    received = []
+    bus.subscribe("progress", received.append, dispatcher, policy=OverflowPolicy.MERGE)
+    bus.publish(Event("progress", {"job": 1, "progress": 10}, key=1))
+    bus.publish(Event("progress", {"job": 2, "progress": 10}, key=2))
+    bus.publish(Event("progress", {"job": 1, "progress": 20}, key=1))
+    dispatcher.run()
+    assert received == [{"job": 1, "progress": 20}, {"job": 2, "progress": 10}]
+
+
+def test_overflow_policies():
+    bus = EventBus()
+    oldest, newest = [], []
+    dispatcher = ManualDispatcher()
+    bus.subscribe("log", oldest.append, dispatcher, batch=True, max_pending=2)
+    bus.subscribe("log", newest.append, dispatcher, batch=True, policy=OverflowPolicy.DROP_NEWEST, max_pending=2)
+    for index in range(4):
+        bus.publish(Event("log", {"index": index}))
+    dispatcher.run()
+    assert oldest == [[{"index": 2}, {"index": 3}]]
+    assert newest == [[{"index": 0}, {"index": 1}]]
+    assert bus.stats()["log"].dropped == 4
+
+
+def test_without_dispatcher_events_are_delivered_at_once():
+    bus = EventBus()
+    received = []
+    subscription = bus.subscribe("done", received.append)
+    bus.publish(Event("done", {"job": 1}))
+    assert received == [{"job": 1}]
+    bus.unsubscribe(subscription)
+    bus.publish(Event("done", {"job": 2}))
+    assert received == [{"job": 1}]
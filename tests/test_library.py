@@ -0,0 +1,38 @@
+import errno
+import os
+import pytest
+from youtube_downloader.core import library
+from youtube_downloader.core.library import LibraryIndex, file_hash
+
+
+def test_source_on_another_file_system_is_copied_in(tmp_path, monkeypatch):
+    index = LibraryIndex(str(tmp_path / "library"))
+    source = tmp_path / "output" / ".abcdefghijk.137.mp4"
+    source.parent.mkdir()
+    source.write_bytes(b"stream" * 1000)
+    sha256 = file_hash(str(source))
+
+    def rename(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(library.os, "rename", rename)
+    path = index.add_source("abcdefghijk", 137, str(source))
+    assert not source.exists()
+    assert path == os.path.join(index.sources_directory, sha256 + ".mp4")
+    assert file_hash(path) == sha256
+    assert os.listdir(index.sources_directory) == [sha256 + ".mp4"]
+    assert index.find_source("abcdefghijk", 137) == path
+
+
+def test_other_rename_errors_are_raised(tmp_path, monkeypatch):
+    index = LibraryIndex(str(tmp_path / "library"))
+    source = tmp_path / ".abcdefghijk.140.m4a"
+    source.write_bytes(b"audio")
+
+    def rename(src, dst):
+        raise OSError(errno.EACCES, "Permission denied")
+
+    monkeypatch.setattr(library.os, "rename", rename)
+    with pytest.raises(PermissionError):
+        index.add_source("abcdefghijk", 140, str(source))
+    assert source.exists()
@@ -0,0 +1,50 @@
+import hashlib
+from youtube_downloader.core.manifest import CompletedRange, DownloadManifest, stream_source
+
+
+def make_manifest(*ranges: CompletedRange, filesize: int = 100) -> DownloadManifest:
+    return DownloadManifest("abcdefghijk", 140, filesize, "/videoplayback?id=abcdefghijk&itag=140", list(ranges))
+
+
+def checksum(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_stream_source_ignores_the_signature_and_the_host():
+    first = stream_source("https://a.googlevideo.com/videoplayback?id=x&itag=140&clen=10&sig=1&expire=2")
+    second = stream_source("https://b.googlevideo.com/videoplayback?expire=3&sig=4&clen=10&itag=140&id=x")
+    assert first == second
+    assert first != stream_source("https://a.googlevideo.com/videoplayback?id=x&itag=140&clen=11")
+
+
+def test_missing_ranges():
+    assert make_manifest().missing_ranges() == [(0, 100)]
+    assert make_manifest(CompletedRange(0, 100, "")).missing_ranges() == []
+    manifest = make_manifest(CompletedRange(60, 80, ""), CompletedRange(10, 30, ""), CompletedRange(20, 40, ""))
+    assert manifest.missing_ranges() == [(0, 10), (40, 60), (80, 100)]
+    assert manifest.completed_bytes() == 60
+
+
+def test_verify_drops_the_ranges_that_changed(tmp_path):
+    data = bytes(range(100))
+    path = tmp_path / "video.mp4.part"
+    path.write_bytes(data)
+    manifest = make_manifest(
+        CompletedRange(0, 50, checksum(data[:50])),
+        CompletedRange(50, 100, checksum(b"something else")),
+        CompletedRange(100, 120, checksum(b"")),
+    )
+    manifest.verify(str(path))
+    assert manifest.ranges == [CompletedRange(0, 50, checksum(data[:50]))]
+    assert manifest.missing_ranges() == [(50, 100)]
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "video.mp4.part.json")
+    manifest = make_manifest(CompletedRange(0, 50, "abc"))
+    manifest.save(path)
+    loaded = DownloadManifest.load(path)
+    assert loaded == manifest
+    assert loaded.matches(make_manifest())
+    assert not loaded.matches(make_manifest(filesize=101))
+    assert DownloadManifest.load(str(tmp_path / "missing.json")) is None
@@ -0,0 +1,47 @@
+import os
+import pstats
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from youtube_downloader.core.metrics import MetricsRecorder
+
+
+def hash_in_executor() -> int:
+    return sum(index * index for index in range(10_000))
+
+
+def test_overlapping_jobs_share_one_profile_of_every_thread(tmp_path):
+    metrics = MetricsRecorder(str(tmp_path), profile=True)
+    executor = ThreadPoolExecutor(max_workers=1)
+    first_started, second_done = threading.Event(), threading.Event()
+
+    def first() -> None:
+        with metrics.profile("first"):
+            first_started.set()
+            second_done.wait(5)
+            executor.submit(hash_in_executor).result()
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    first_started.wait(5)
+    with metrics.profile("second"):
+        pass
+    second_done.set()
+    thread.join(5)
+    executor.shutdown()
+
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 3
+    name = names[0].split(".")[0]
+    assert names == [f"{name}.jobs.txt", f"{name}.memory.txt", f"{name}.prof"]
+    assert (tmp_path / f"{name}.jobs.txt").read_text() == "first\nsecond\n"
+    functions = pstats.Stats(str(tmp_path / f"{name}.prof")).stats
+    assert any(function == "hash_in_executor" for _, _, function in functions)
+
+
+def test_jobs_after_a_session_start_another_one(tmp_path):
+    metrics = MetricsRecorder(str(tmp_path), profile=True)
+    for job in ("first", "second"):
+        with metrics.profile(job):
+            pass
+    reports = sorted(name for name in os.listdir(tmp_path) if name.endswith(".jobs.txt"))
+    assert [(tmp_path / name).read_text() for name in reports] == ["first\n", "second\n"]
@@ -0,0 +1,28 @@
+import pytest
+from youtube_downloader.core.engine import get_engine
+from youtube_downloader.core.pipe import ChunkPipe
+
+
+def test_async_write_waits_for_the_reader():
+    pipe = ChunkPipe(max_chunks=1)
+    pipe.write(b"first")
+    future = get_engine().submit(pipe.write_async(b"second"))
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0.2)
+    assert pipe.read() == b"first"
+    assert future.result(timeout=1) == len(b"second")
+    assert pipe.read() == b"second"
+    get_engine().submit(pipe.close_async()).result(timeout=1)
+    assert pipe.read() == b""
+
+
+def test_abort_fails_a_waiting_async_write():
+    pipe = ChunkPipe(max_chunks=1)
+    pipe.write(b"first")
+    future = get_engine().submit(pipe.write_async(b"second"))
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0.2)
+    pipe.abort()
+    with pytest.raises(BrokenPipeError):
+        future.result(timeout=1)
+    assert pipe.read() == b""
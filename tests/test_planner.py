@@ -0,0 +1,58 @@
+from youtube_downloader.core.constants import Formats, TRANSCODE_SLOTS, TRANSCODE_VIDEO_THREADS
+from youtube_downloader.core.planner import parse_ffmpeg_args, plan_conversion
+from youtube_downloader.models.video_info import StreamInfo
+
+
+def stream(mime_type: str, video_codec: str | None = None, audio_codec: str | None = None) -> StreamInfo:
+    return StreamInfo(1, "https://example.com/videoplayback", mime_type, False, video_codec, audio_codec, filesize=1)
+
+
+def test_parse_ffmpeg_args():
+    assert parse_ffmpeg_args("-c:v libx264 -vn -c:a aac") == {"c:v": "libx264", "vn": None, "c:a": "aac"}
+
+
+def test_matching_codecs_are_copied():
+    plan = plan_conversion([stream("video/mp4", video_codec="avc1.640028"), stream("audio/mp4", audio_codec="mp4a.40.2")], Formats.MP4.value)
+    assert plan.is_remux
+    assert not plan.encodes_video
+    assert plan.threads == 0
+    assert plan.ffmpeg_options() == {"c:a": "copy", "c:v": "copy"}
+
+
+def test_other_codecs_are_encoded():
+    plan = plan_conversion([stream("video/webm", video_codec="vp9"), stream("audio/webm", audio_codec="opus")], Formats.MP4.value)
+    threads = min(TRANSCODE_VIDEO_THREADS, TRANSCODE_SLOTS)
+    assert plan.encodes_video
+    assert plan.threads == threads
+    expected = {"c:v": "libx264", "c:a": "aac"}
+    if threads > 1:
+        expected["threads"] = str(threads)
+    assert plan.ffmpeg_options() == expected
+
+
+def test_only_the_tracks_that_differ_are_encoded():
+    plan = plan_conversion([stream("video/mp4", video_codec="avc1.640028"), stream("audio/webm", audio_codec="opus")], Formats.MP4.value)
+    assert not plan.is_remux
+    assert not plan.encodes_video
+    assert plan.ffmpeg_options() == {"c:a": "aac", "c:v": "copy"}
+
+
+def test_audio_formats_drop_the_video():
+    plan = plan_conversion([stream("video/mp4", video_codec="avc1.42001E", audio_codec="mp4a.40.2")], Formats.MP3.value)
+    assert plan.drop_video
+    assert plan.video_tracks == 0
+    assert plan.ffmpeg_options() == {"c:a": "libmp3lame", "vn": None}
+
+
+def test_track_options_split_the_video_and_the_audio():
+    plan = plan_conversion([stream("video/webm", video_codec="vp9"), stream("audio/webm", audio_codec="opus")], Formats.MP4.value)
+    assert plan.track_options("a") == {"c:a": "aac"}
+    video = plan.track_options("v")
+    assert video["c:v"] == "libx264"
+    assert "c:a" not in video
+
+
+def test_unknown_codecs_are_encoded_with_the_format_arguments():
+    plan = plan_conversion([], Formats.AVI.value)
+    assert plan.video_tracks == 1
+    assert plan.ffmpeg_options() == {"c:v": "libxvid", "c:a": "mp3"}
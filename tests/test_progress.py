@@ -0,0 +1,64 @@
+import pytest
+from youtube_downloader.core import progress
+from youtube_downloader.core.progress import ProgressTracker, format_eta, format_speed
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(progress, "time", clock)
+    return clock
+
+
+def test_reports_are_coalesced(clock):
+    reports = []
+    tracker = ProgressTracker(reports.append, max_rate=2, window=10)
+    tracker.reset()
+    assert reports[-1].progress == 0
+    for done in range(1, 8):
+        clock.now += 0.125
+        tracker.update(done * 100, 1000)
+    # Updated 7 times in less than a second, at most 2 reports per second
+    assert [report.progress for report in reports] == [0, 40]
+    clock.now += 0.125
+    tracker.update(1000, 1000)
+    assert reports[-1].progress == 100  # The last update is always reported
+
+
+def test_speed_and_eta(clock):
+    reports = []
+    tracker = ProgressTracker(reports.append, max_rate=1, window=10)
+    tracker.reset()
+    tracker.update(0, 1000)
+    clock.now += 2
+    tracker.update(400, 1000)
+    report = reports[-1]
+    assert report.speed == pytest.approx(200)
+    assert report.eta == pytest.approx(3)
+    assert report.remaining == 600
+
+
+def test_steps_not_in_bytes_report_no_speed(clock):
+    reports = []
+    tracker = ProgressTracker(reports.append, max_rate=1, window=10)
+    tracker.reset(in_bytes=False)
+    tracker.update(0, 60)
+    clock.now += 2
+    tracker.update(30, 60)
+    assert (reports[-1].progress, reports[-1].speed, reports[-1].remaining) == (50, 0.0, 0)
+    assert reports[-1].eta == pytest.approx(2)
+
+
+def test_formatting():
+    assert format_speed(512) == "512.0 B/s"
+    assert format_speed(1536 * 1024) == "1.5 MB/s"
+    assert format_eta(75) == "1:15"
+    assert format_eta(3725) == "1:02:05"
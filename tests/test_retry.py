@@ -0,0 +1,19 @@
+import pytest
+from youtube_downloader.core.retry import ThroughputWindow
+
+
+def test_no_rate_until_the_window_is_filled():
+    window = ThroughputWindow(2.0)
+    window.add(1000, 1.0)
+    assert window.rate is None
+    window.add(1000, 1.0)
+    assert window.rate == pytest.approx(1000)
+
+
+def test_old_samples_leave_the_window():
+    window = ThroughputWindow(2.0)
+    for _ in range(4):
+        window.add(4000, 1.0)
+    window.add(100, 1.0)
+    window.add(100, 1.0)
+    assert window.rate == pytest.approx(100)
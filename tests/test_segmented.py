@@ -0,0 +1,32 @@
+import pytest
+from youtube_downloader.core.constants import SEGMENT_MIN_DURATION, SEGMENTS_PER_WORKER
+from youtube_downloader.core.segmented import Segment, concat_list, read_segments, segment_duration
+
+
+def test_segment_duration():
+    assert segment_duration(3600, 2) == pytest.approx(3600 / (2 * SEGMENTS_PER_WORKER))
+    assert segment_duration(30, 4) == SEGMENT_MIN_DURATION
+    assert segment_duration(3600, 0) == segment_duration(3600, 1)
+
+
+def test_read_segments(tmp_path):
+    list_path = tmp_path / "segments.csv"
+    list_path.write_text("segment-000.nut,0.000000,10.010000\nsegment-001.nut,10.010000,19.986000\n")
+    segments = read_segments(str(list_path))
+    assert segments == [
+        Segment(str(tmp_path / "segment-000.nut"), 0.0, 10.01),
+        Segment(str(tmp_path / "segment-001.nut"), 10.01, 19.986),
+    ]
+    assert segments[1].duration == pytest.approx(9.976)
+
+
+def test_concat_list():
+    segments = [Segment("a.nut", 0.0, 10.01), Segment("b.nut", 10.01, 19.986)]
+    script = concat_list(segments, ["/tmp/a.mp4", "/tmp/it's b.mp4"])
+    assert script == (
+        "ffconcat version 1.0\n"
+        "file '/tmp/a.mp4'\n"
+        "duration 10.010000\n"
+        "file '/tmp/it'\\''s b.mp4'\n"
+        "duration 9.976000\n"
+    )
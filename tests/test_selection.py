@@ -0,0 +1,61 @@
+import pytest
+from youtube_downloader.core.constants import Formats
+from youtube_downloader.core.selection import equivalent_streams, select_streams
+from youtube_downloader.models.video_info import StreamInfo, VideoInfo
+
+
+def make_video(*streams: StreamInfo) -> VideoInfo:
+    return VideoInfo("abcdefghijk", "Title", "Author", 60, "", "", list(streams))
+
+
+def video_stream(itag: int, extension: str, resolution: str, codec: str = "avc1.640028", bitrate: int = 1_000_000) -> StreamInfo:
+    return StreamInfo(itag, f"https://example.com/{itag}", f"video/{extension}", False, codec, None, resolution, None, bitrate, 1)
+
+
+def audio_stream(itag: int, extension: str, bitrate: int, codec: str = "mp4a.40.2") -> StreamInfo:
+    return StreamInfo(itag, f"https://example.com/{itag}", f"audio/{extension}", False, None, codec, None, None, bitrate, 1)
+
+
+PROGRESSIVE = StreamInfo(18, "https://example.com/18", "video/mp4", True, "avc1.42001E", "mp4a.40.2", "360p", None, 500_000, 1)
+VIDEO = make_video(
+    PROGRESSIVE,
+    video_stream(137, "mp4", "1080p"),
+    video_stream(299, "mp4", "1080p60", bitrate=2_000_000),
+    video_stream(401, "mp4", "2160p"),
+    video_stream(248, "webm", "1080p", codec="vp9"),
+    audio_stream(139, "mp4", 48_000),
+    audio_stream(140, "mp4", 128_000),
+    audio_stream(141, "mp4", 256_000),
+    audio_stream(251, "webm", 160_000, codec="opus"),
+)
+
+
+def test_video_formats_get_the_tallest_video_and_the_best_audio():
+    assert [stream.itag for stream in select_streams(VIDEO, Formats.MP4.value)] == [299, 141]
+
+
+def test_max_height_caps_the_video():
+    assert select_streams(VIDEO, Formats.MP4.value, max_height=720)[0].itag == 18
+
+
+def test_audio_formats_get_the_smallest_suitable_audio():
+    assert [stream.itag for stream in select_streams(VIDEO, Formats.MP3.value)] == [140]
+
+
+def test_audio_formats_prefer_their_source_container():
+    assert [stream.itag for stream in select_streams(VIDEO, Formats.OPUS.value)] == [251]
+
+
+def test_progressive_fallback():
+    assert select_streams(VIDEO, Formats.MP4.value, adaptive=False) == [PROGRESSIVE]
+    assert select_streams(make_video(PROGRESSIVE), Formats.MP3.value) == [PROGRESSIVE]
+
+
+def test_no_stream():
+    with pytest.raises(ValueError):
+        select_streams(make_video(), Formats.MP4.value)
+
+
+def test_equivalent_streams():
+    video = make_video(video_stream(137, "mp4", "1080p"), video_stream(1137, "mp4", "1080p", bitrate=3_000_000), video_stream(136, "mp4", "720p"))
+    assert [stream.itag for stream in equivalent_streams(video, video.streams[0])] == [1137]
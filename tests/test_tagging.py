@@ -0,0 +1,40 @@
+import base64
+import struct
+from youtube_downloader.core.tagging import MediaTags, image_size, image_type, picture_block
+
+PNG = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 480, 360) + b"\x08\x02\x00\x00\x00"
+
+
+def test_ffmetadata_escapes_the_special_characters():
+    tags = MediaTags("a=b; c#d", "back\\slash", "first line\nsecond line")
+    assert tags.ffmetadata() == (
+        ";FFMETADATA1\n"
+        "title=a\\=b\\; c\\#d\n"
+        "artist=back\\\\slash\n"
+        "comment=first line\\\nsecond line\n"
+    )
+
+
+def test_ffmetadata_skips_empty_tags():
+    assert MediaTags("Title", "").ffmetadata() == ";FFMETADATA1\ntitle=Title\n"
+
+
+def test_ffmetadata_picture():
+    tags = MediaTags("Title", "Artist", cover=PNG)
+    assert "METADATA_BLOCK_PICTURE" not in tags.ffmetadata()
+    line = tags.ffmetadata(picture=True).splitlines()[-1]
+    key, _, value = line.partition("=")
+    assert key == "METADATA_BLOCK_PICTURE"
+    assert base64.b64decode(value) == picture_block(PNG, "image/png")
+    webp = MediaTags("Title", "Artist", cover=b"RIFF\x00\x00\x00\x00WEBPVP8 ")
+    assert "METADATA_BLOCK_PICTURE" not in webp.ffmetadata(picture=True)
+
+
+def test_images():
+    assert image_type(PNG) == "image/png"
+    assert image_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert image_type(b"GIF89a") is None
+    assert image_size(PNG) == (480, 360)
+    jpeg = b"\xff\xd8" + b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 720, 1280) + b"\x00" * 12
+    assert image_size(jpeg) == (1280, 720)
+    assert image_size(b"nothing") == (0, 0)
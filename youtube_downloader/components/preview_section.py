@@ -3,6 +3,7 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PySide6.QtCore import Qt
 from PySide6.QtGui import QPixmap
 from ..core.constants import THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, STYLES
+from ..core.progress import format_eta
 from ..models.video_data import VideoPreviewData
 
 class PreviewSection(QWidget):
@@ -90,12 +91,8 @@ class PreviewSection(QWidget):
 		
 	def update_preview(self, data: VideoPreviewData):
 		self.title_text.setText(data.title)
-		self.duration_text.setText(data.duration)
+		self.duration_text.setText(format_eta(data.duration))
 		self.description_text.setText(data.description)
 		
-		pixmap = QPixmap()
-		pixmap.loadFromData(data.thumbnail_data)
-		self.thumbnail_image.setPixmap(
-			pixmap.scaled(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, 
-						Qt.AspectRatioMode.KeepAspectRatio)
-		)
\ No newline at end of file
+		# The worker already decoded and scaled the thumbnail
+		self.thumbnail_image.setPixmap(QPixmap.fromImage(data.thumbnail))
\ No newline at end of file
@@ -0,0 +1,29 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QListView, QAbstractItemView
+from PySide6.QtCore import QAbstractItemModel
+from typing import Optional
+from ..core.progress import format_eta, format_speed
+
+class QueueSection(QWidget):
+    def __init__(self, model: QAbstractItemModel, parent: Optional[QWidget] = None) -> None:
+        super().__init__(parent)
+        self.queue_label = QLabel("Queue:")
+        self.queue_view = QListView()
+        self.queue_view.setModel(model)
+        self.init_ui()
+
+    def init_ui(self) -> None:
+        layout = QVBoxLayout()
+        layout.addWidget(self.queue_label)
+        self.queue_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.queue_view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.queue_view.setMaximumHeight(120)
+        layout.addWidget(self.queue_view)
+        self.setLayout(layout)
+
+    def update_summary(self, downloading: int, speed: float, eta: Optional[float]) -> None:
+        text = "Queue:"
+        if downloading:
+            text += f" {downloading} downloading at {format_speed(speed)}"
+            if eta is not None:
+                text += f", {format_eta(eta)} left"
+        self.queue_label.setText(text)
@@ -0,0 +1,225 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from .constants import BANDWIDTH_BURST, BANDWIDTH_POLL_INTERVAL, INTERACTIVE_PRIORITY
+
+
+@dataclass
+class BandwidthRule:
+    """
+    Caps the bandwidth to `rate` bytes per second from `start` to `end`, local time,
+    wrapping past midnight when `end` is earlier than `start`. A rate of None lifts the cap.
+    """
+    start: datetime.time
+    end: datetime.time
+    rate: Optional[float]
+
+    def applies(self, moment: datetime.time) -> bool:
+        if self.start <= self.end:
+            return self.start <= moment < self.end
+        return moment >= self.start or moment < self.end
+
+
+class BandwidthShare:
+    """
+    The account of one job on a `BandwidthLimiter`. The chunks a job downloads
+    are charged to its share, whose priority decides how the cap is split.
+
+    Attributes
+    ----------
+    priority : int
+        The priority of the job. Shares of a higher priority get a proportionally
+        larger part of the bandwidth, and interactive ones are served before any other.
+    """
+    def __init__(self, limiter: "BandwidthLimiter", priority: int = 0) -> None:
+        self.priority = priority
+        self._limiter = limiter
+        self._finish = 0.0
+
+    @property
+    def weight(self) -> float:
+        return max(1, self.priority + 1)
+
+    @property
+    def interactive(self) -> bool:
+        return self.priority >= INTERACTIVE_PRIORITY
+
+    def consume(self, size: int) -> None:
+        """Charges `size` downloaded bytes to the share, blocking while they are over the cap."""
+        self._limiter.consume(self, size)
+
+    async def consume_async(self, size: int) -> None:
+        """Charges `size` downloaded bytes to the share, waiting asynchronously while they are over the cap."""
+        await self._limiter.consume_async(self, size)
+
+
+@dataclass(order=True)
+class _Waiter:
+    key: tuple
+    size: int = field(compare=False)
+    tag: float = field(compare=False)
+    # Wakes an asynchronous waiter, which the condition cannot reach
+    wake: Optional[Callable[[], None]] = field(default=None, compare=False)
+
+
+class BandwidthLimiter:
+    """
+    A process-wide token bucket capping the combined throughput of every download.
+
+    Downloads charge each chunk once it is read, so holding them back also stops
+    the socket from being read and TCP slows the sender down. While the cap is
+    reached, the chunks waiting are served by weighted fair queuing: each share
+    gets a part of the bandwidth proportional to its weight, except interactive
+    shares, which go before every other one.
+
+    Attributes
+    ----------
+    rate : Optional[float]
+        The cap in bytes per second outside of the schedule, None for no cap.
+    schedule : list[BandwidthRule]
+        Caps applying at given times of the day, the first matching rule wins.
+    burst : float
+        The seconds of bandwidth an idle limiter lets through at once.
+    """
+    def __init__(
+            self,
+            rate: Optional[float] = None,
+            schedule: Optional[list[BandwidthRule]] = None,
+            burst: float = BANDWIDTH_BURST
+            ) -> None:
+        self.rate = rate
+        self.schedule = list(schedule or [])
+        self.burst = burst
+        self.default_share = BandwidthShare(self)
+        self._condition = threading.Condition()
+        self._waiters: list[_Waiter] = []
+        self._order = itertools.count()
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._virtual_time = 0.0
+
+    def share(self, priority: int = 0) -> BandwidthShare:
+        """Returns a new share for a job of the given priority."""
+        return BandwidthShare(self, priority)
+
+    def set_rate(self, rate: Optional[float]) -> None:
+        """Changes the cap, taking effect for the chunks already waiting."""
+        with self._condition:
+            self.rate = rate
+            self._wake_all()
+
+    def set_schedule(self, schedule: list[BandwidthRule]) -> None:
+        with self._condition:
+            self.schedule = list(schedule)
+            self._wake_all()
+
+    def _wake_all(self) -> None:
+        self._condition.notify_all()
+        for waiter in self._waiters:
+            if waiter.wake is not None:
+                waiter.wake()
+
+    def current_rate(self) -> Optional[float]:
+        """The cap in force right now, following the schedule."""
+        if self.schedule:
+            now = datetime.datetime.now().time()
+            for rule in self.schedule:
+                if rule.applies(now):
+                    return rule.rate
+        return self.rate
+
+    def consume(self, share: BandwidthShare, size: int) -> None:
+        """Blocks until `size` bytes charged to `share` fit under the cap."""
+        if self.rate is None and not self.schedule:
+            return
+        with self._condition:
+            waiter = self._enqueue(share, size)
+            try:
+                while (timeout := self._wait_time(waiter)) is not None:
+                    self._condition.wait(timeout)
+                self._grant(waiter)
+            finally:
+                self._dequeue(waiter)
+
+    async def consume_async(self, share: BandwidthShare, size: int) -> None:
+        """Waits without blocking the event loop until `size` bytes charged to `share` fit under the cap."""
+        if self.rate is None and not self.schedule:
+            return
+        loop = asyncio.get_running_loop()
+        turn = asyncio.Event()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(turn.set)
+
+        with self._condition:
+            waiter = self._enqueue(share, size, wake)
+        try:
+            while True:
+                with self._condition:
+                    timeout = self._wait_time(waiter)
+                    if timeout is None:
+                        self._grant(waiter)
+                        return
+                    turn.clear()
+                try:
+                    await asyncio.wait_for(turn.wait(), timeout)
+                except TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._dequeue(waiter)
+
+    def _enqueue(self, share: BandwidthShare, size: int, wake: Optional[Callable[[], None]] = None) -> _Waiter:
+        tag = max(self._virtual_time, share._finish) + size / share.weight
+        share._finish = tag
+        waiter = _Waiter((not share.interactive, tag, next(self._order)), size, tag, wake)
+        heapq.heappush(self._waiters, waiter)
+        return waiter
+
+    def _wait_time(self, waiter: _Waiter) -> Optional[float]:
+        """Returns how long the waiter should wait before checking again, or None if its chunk may go now."""
+        rate = self.current_rate()
+        if rate is None or rate <= 0:
+            return None
+        self._refill(rate)
+        if self._waiters[0] is not waiter:
+            return BANDWIDTH_POLL_INTERVAL
+        if self._tokens >= 0:
+            return None
+        return min(-self._tokens / rate, BANDWIDTH_POLL_INTERVAL)
+
+    def _grant(self, waiter: _Waiter) -> None:
+        # Tokens may go negative, the debt of a large chunk delays the next one instead of being forgiven
+        self._tokens -= waiter.size
+        self._virtual_time = max(self._virtual_time, waiter.tag)
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        self._waiters.remove(waiter)
+        heapq.heapify(self._waiters)
+        self._condition.notify_all()
+        # Only the first waiter can go next, waking the asynchronous ones behind it would be wasted
+        if self._waiters and self._waiters[0].wake is not None:
+            self._waiters[0].wake()
+
+    def _refill(self, rate: float) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._tokens + (now - self._updated) * rate, rate * self.burst)
+        self._updated = now
+
+
+_limiter: BandwidthLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_bandwidth_limiter() -> BandwidthLimiter:
+    """Returns the process-wide bandwidth limiter, without a cap until one is set."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = BandwidthLimiter()
+        return _limiter
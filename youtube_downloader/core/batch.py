@@ -0,0 +1,59 @@
+import re
+from typing import Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+
+CHANNEL_PREFIXES = ("/@", "/channel/", "/c/", "/user/")
+VIDEO_PREFIXES = ("/shorts/", "/embed/", "/live/", "/v/")
+VIDEO_ID = re.compile(r"[0-9A-Za-z_-]{11}")
+
+
+def is_playlist_url(url: str) -> bool:
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    # A watch URL with a list parameter is a video played from a playlist, not the playlist itself
+    return "list" in query and (parsed.path.startswith("/playlist") or "v" not in query)
+
+
+def is_channel_url(url: str) -> bool:
+    return urlparse(url).path.startswith(CHANNEL_PREFIXES)
+
+
+def is_batch_url(url: str) -> bool:
+    return is_playlist_url(url) or is_channel_url(url)
+
+
+def find_video_id(url: str) -> Optional[str]:
+    """
+    Returns the id of the video a URL points to, or None if it points to no single
+    video, such as a playlist or a URL still being typed. Unlike `video_id_of` it
+    does not need pytubefix, so it is cheap enough to run on every keystroke.
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").removeprefix("www.").removeprefix("m.").removeprefix("music.")
+    if host == "youtu.be":
+        candidate = parsed.path[1:]
+    elif host == "youtube.com" and not is_batch_url(url):
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [""])[0]
+        elif parsed.path.startswith(VIDEO_PREFIXES):
+            candidate = parsed.path.split("/")[2]
+        else:
+            candidate = ""
+    else:
+        return None
+    return candidate if VIDEO_ID.fullmatch(candidate) else None
+
+
+def iter_video_urls(url: str) -> Iterator[str]:
+    """
+    Yields the video URLs behind a playlist or channel URL, page by page as they
+    are fetched, or the URL itself if it points to a single video.
+    """
+    # pytubefix is slow to import, checking a URL with `is_batch_url` does not need it
+    from pytubefix import Channel, Playlist
+    if is_playlist_url(url):
+        yield from Playlist(url).video_urls
+    elif is_channel_url(url):
+        yield from Channel(url).video_urls
+    else:
+        yield url
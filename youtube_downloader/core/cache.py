@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Optional
+from .constants import VIDEO_CACHE_DISK_SIZE, VIDEO_CACHE_SIZE, VIDEO_CACHE_TTL
+from .files import atomic_write
+from ..models.video_info import StreamInfo, VideoInfo
+
+
+class VideoCache:
+    """
+    A thread-safe LRU cache of resolved videos keyed by video id, with an optional
+    persistent tier on disk so lookups survive restarts.
+
+    Entries older than `ttl` seconds are treated as missing. Whether their stream
+    URLs are still usable is up to the caller, see `VideoInfo.streams_expired`.
+
+    Attributes
+    ----------
+    max_entries : int
+        The maximum number of videos kept in memory.
+    ttl : float
+        The number of seconds a resolved video stays valid.
+    directory : Optional[str]
+        The directory of the disk tier, or None to keep the cache in memory only.
+    max_disk_entries : int
+        The maximum number of videos kept on disk.
+    """
+    def __init__(
+            self,
+            max_entries: int = VIDEO_CACHE_SIZE,
+            ttl: float = VIDEO_CACHE_TTL,
+            directory: Optional[str] = None,
+            max_disk_entries: int = VIDEO_CACHE_DISK_SIZE
+            ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._entries: OrderedDict[str, VideoInfo] = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, video_id: str) -> Optional[VideoInfo]:
+        with self._lock:
+            info = self._entries.get(video_id)
+            if info is not None:
+                self._entries.move_to_end(video_id)
+        if info is None:
+            info = self._load(video_id)
+            if info is not None:
+                self._remember(info)
+        if info is None or time.time() - info.resolved_at > self.ttl:
+            return None
+        return info
+
+    def put(self, info: VideoInfo) -> None:
+        self._remember(info)
+        self._store(info)
+
+    def invalidate(self, video_id: str) -> None:
+        with self._lock:
+            self._entries.pop(video_id, None)
+        if self.directory is not None:
+            try:
+                os.remove(self._path(video_id))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, info: VideoInfo) -> None:
+        with self._lock:
+            self._entries[info.video_id] = info
+            self._entries.move_to_end(info.video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory or "", f"{video_id}.json")
+
+    def _load(self, video_id: str) -> Optional[VideoInfo]:
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(video_id), "r", encoding="utf-8") as file:
+                data = json.load(file)
+            data["streams"] = [StreamInfo(**stream) for stream in data["streams"]]
+            return VideoInfo(**data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def _store(self, info: VideoInfo) -> None:
+        if self.directory is None:
+            return
+        try:
+            with atomic_write(self._path(info.video_id)) as file:
+                file.write(json.dumps(asdict(info)).encode("utf-8"))
+            self._prune()
+        except OSError:
+            pass  # The disk tier is an optimization, never fail a lookup over it
+
+    def _prune(self) -> None:
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
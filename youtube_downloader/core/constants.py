@@ -1,3 +1,4 @@
+import os
 from enum import Enum
 from ..models.format import Format
 
@@ -5,14 +6,61 @@ THUMBNAIL_WIDTH = 300
 THUMBNAIL_HEIGHT = 210
 DESCRIPTION_MAX_LENGTH = 100
 DEFAULT_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+PREVIEW_DEBOUNCE = 0.3  # Seconds the URL must stay unchanged before its preview is loaded ahead of a click
+MAX_CONCURRENT_DOWNLOADS = 3  # Jobs using the network at the same time, more only split the bandwidth
+INTERACTIVE_PRIORITY = 100  # Jobs of this priority or above start at once and are served before any other bandwidth
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "youtube_downloader")
+VIDEO_CACHE_SIZE = 256  # Resolved videos kept in memory
+VIDEO_CACHE_DISK_SIZE = 4096  # Resolved videos kept on disk
+VIDEO_CACHE_TTL = 24 * 3600  # Seconds before resolved metadata is looked up again
+STREAM_URL_MARGIN = 10 * 60  # Stream URLs expiring sooner than this are refreshed before a download
+THUMBNAIL_CACHE_SIZE = 64 * 1024 * 1024  # Bytes of scaled thumbnails kept on disk
+THUMBNAIL_MEMORY_CACHE_SIZE = 8 * 1024 * 1024  # Bytes of scaled thumbnails kept in memory
+LIBRARY_SIZE = 8 * 1024 * 1024 * 1024  # Bytes of downloaded streams kept to convert them again without the network
+METADATA_PREFETCH = 8  # Queued videos whose metadata is resolved ahead of their download
+BATCH_SIZE = 50  # Playlist entries handed to the queue at once while the playlist is enumerated
+DOWNLOAD_CHUNK_SIZE = 256 * 1024  # Bytes held in memory at once while streaming to disk
+DOWNLOAD_RANGE_SIZE = 9 * 1024 * 1024  # Bytes requested per HTTP range, YouTube throttles larger ones
+DOWNLOAD_CONNECTIONS = 4  # Parallel connections used to fetch a single stream
+DOWNLOAD_SEGMENT_SIZE = DOWNLOAD_RANGE_SIZE  # Bytes fetched by one connection before it picks the next segment
+ASYNC_MAX_CONNECTIONS = 64  # HTTP requests in flight at once across every download, which bounds sockets and buffers
+THROTTLE_MIN_RATE = 64 * 1024  # Bytes per second under which a connection is considered throttled and reopened
+THROTTLE_WINDOW = 10.0  # Seconds of transfer the throughput of a connection is estimated over
+TRANSFER_RETRIES = 5  # Retries of a failing request, with no byte received in between, before the transfer fails
+RETRY_BACKOFF = 0.5  # Seconds the first retry waits at most, doubled on each further failure, with random jitter
+RETRY_MAX_BACKOFF = 30.0  # Seconds a retry waits at most, however many failures came before
+BANDWIDTH_BURST = 0.25  # Seconds of the bandwidth cap an idle limiter lets through at once
+BANDWIDTH_POLL_INTERVAL = 1.0  # Seconds between checks of the schedule by downloads held back by the cap
+MAX_VIDEO_HEIGHT = 1080  # Tallest adaptive video stream picked for video formats
+AUDIO_MIN_BITRATE = 64_000  # Bits per second below which an audio-only stream is not considered suitable
+PIPE_MAX_CHUNKS = 16  # Chunks queued between the download and FFmpeg before the download waits
+PROGRESS_MAX_RATE = 10  # Progress updates per second reported for a job, at most
+PROGRESS_WINDOW = 5.0  # Seconds of progress samples the speed and ETA are computed over
+EVENT_QUEUE_SIZE = 1024  # Events queued for a subscriber before the overflow policy applies
+METRICS_DIR_ENV = "YOUTUBE_DOWNLOADER_METRICS"  # Environment variable naming the directory metrics are written to
+PROFILE_ENV = "YOUTUBE_DOWNLOADER_PROFILE"  # Environment variable enabling the profiles of the jobs, given metrics are on
+TRANSCODE_SLOTS = os.cpu_count() or 1  # CPU threads shared by every FFmpeg encode running at once
+TRANSCODE_VIDEO_THREADS = 4  # Threads given to a video encode, audio encoders only use one
+TRANSCODE_BACKLOG = 4  # Downloaded files waiting for the CPU before new downloads are held back
+SEGMENTED_MIN_LENGTH = 10 * 60  # Seconds of media from which a video is encoded in segments, when segmented conversions are on
+SEGMENT_MIN_DURATION = 10.0  # Seconds of video per segment at least, shorter ones spend more time starting FFmpeg than encoding
+SEGMENTS_PER_WORKER = 4  # Segments cut per parallel encoder, so the encoders finishing early pick up the remaining ones
+ENGINE_THREADS = TRANSCODE_SLOTS + 4  # Threads running the blocking steps of downloads, FFmpeg runs among them
+DISK_THREADS = 4  # Threads writing every download to disk, however many run at once
 
 class Formats(Enum):
-    MP4 = Format("MP4", "mp4", "-c:v libx264 -c:a aac")
+    MP4 = Format(
+        "MP4", "mp4", "-c:v libx264 -c:a aac",
+        source_extension="mp4", copy_codecs=("avc1", "av01", "mp4a"), cover_art="attached_pic"
+    )
     AVI = Format("AVI", "avi", "-c:v libxvid -c:a mp3")
-    MOV = Format("MOV", "mov", "-c:v libx264 -c:a aac")
-    MP3 = Format("MP3", "mp3", "-c:a libmp3lame")
-    OGG = Format("OGG", "ogg", "-c:a libvorbis")
-    OPUS = Format("OPUS", "opus", "-c:a libopus")
+    MOV = Format("MOV", "mov", "-c:v libx264 -c:a aac", source_extension="mp4", copy_codecs=("avc1", "mp4a"))
+    MP3 = Format("MP3", "mp3", "-c:a libmp3lame", audio_only=True, cover_art="attached_pic")
+    OGG = Format("OGG", "ogg", "-c:a libvorbis", audio_only=True, copy_codecs=("vorbis",), cover_art="picture_block")
+    OPUS = Format(
+        "OPUS", "opus", "-c:a libopus",
+        audio_only=True, source_extension="webm", copy_codecs=("opus",), cover_art="picture_block"
+    )
 
 STYLES = {
     "scroll_area": """
@@ -0,0 +1,795 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Awaitable, BinaryIO, Callable, Optional, Sequence
+from ffmpeg import Progress, FFmpeg  # type: ignore
+from .bandwidth import get_bandwidth_limiter
+from .constants import Formats, DOWNLOAD_CONNECTIONS, DOWNLOAD_SEGMENT_SIZE, SEGMENTED_MIN_LENGTH, STREAM_URL_MARGIN
+from .engine import DownloadEngine, get_engine
+from .files import link_or_copy, safe_filename
+from .library import LibraryIndex, get_library
+from .metrics import StageRecord, get_metrics
+from .pipe import ChunkPipe
+from .planner import ConversionPlan, plan_conversion
+from .progress import ProgressTracker
+from .resolver import get_resolver, video_id_of
+from .retry import StreamThrottled
+from .segmented import SEGMENT_FORMAT, Segment, concat_list, read_segments, segment_duration, split_options
+from .selection import equivalent_streams, select_streams
+from .tagging import MediaTags, TagFiles, load_cover
+from .transcoder import TranscodePool, get_transcode_pool
+from .transfer import discard_partial, download_to_file, tee_to_file
+from ..models.format import Format
+from ..models.job import JobProgress, JobState
+from ..models.video_info import StreamInfo, VideoInfo
+
+logger = logging.getLogger(__name__)
+
+
+class Downloader:
+    """
+    Downloads a YouTube video and optionally converts it to a different format.
+
+    It does not depend on Qt: progress is reported through plain callbacks, which
+    are called on the thread of the `DownloadEngine` or on its helper threads.
+    The job itself is a coroutine of the engine, which `submit` starts from any
+    thread and `cancel` stops at its next step.
+
+    Attributes
+    ----------
+    url : str
+        The URL of the YouTube video.
+    path : str
+        The path where the video will be saved.
+    format : Format
+        The format in which the video will be downloaded.
+    formats : list[Format]
+        Every format the video is saved in, `format` first. The source is fetched once
+        and a single FFmpeg run decodes it once for all of them.
+    pipelined : bool
+        Whether conversions read the stream while it downloads instead of waiting for the whole file.
+    connections : int
+        The number of parallel connections used when the stream is downloaded to a file.
+    segment_size : int
+        The size of the byte ranges fetched by each connection.
+    adaptive : bool
+        Whether separate audio and video streams may be fetched instead of a progressive one.
+    transcoder : TranscodePool
+        The pool whose CPU slots the conversions run on.
+    library : LibraryIndex
+        The index of the streams and files downloaded so far, which are reused instead of downloaded again.
+    bandwidth : BandwidthShare
+        The share of the process-wide bandwidth cap the download is charged to.
+    tag : bool
+        Whether the outputs get the title, channel, description and thumbnail of the video
+        as tags and cover art, written by the FFmpeg run that makes them.
+    segmented : bool
+        Whether the video encodes of long videos are split at keyframes and run on every
+        CPU slot at once, rather than as one FFmpeg run.
+    engine : DownloadEngine
+        The event loop running the job.
+    """
+    def __init__(
+            self,
+            url: str,
+            path: str,
+            file_format: Format,
+            pipelined: bool = True,
+            connections: int = DOWNLOAD_CONNECTIONS,
+            segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+            adaptive: bool = True,
+            transcoder: Optional[TranscodePool] = None,
+            library: Optional[LibraryIndex] = None,
+            priority: int = 0,
+            engine: Optional[DownloadEngine] = None,
+            extra_formats: Sequence[Format] = (),
+            tag: bool = True,
+            segmented: bool = False,
+            on_progress: Optional[Callable[[JobProgress], None]] = None,
+            on_status: Optional[Callable[[str], None]] = None,
+            on_state: Optional[Callable[[JobState], None]] = None,
+            on_title: Optional[Callable[[str], None]] = None
+            ) -> None:
+        """
+        Parameters
+        ----------
+        priority : int
+            The priority of the job, which weighs its share of the bandwidth when it is capped.
+        extra_formats : Sequence[Format]
+            Formats also made from the same download, besides `file_format`.
+        on_progress : Optional[Callable[[JobProgress], None]]
+            Called with the progress of the current step, a few times per second at most.
+        on_status : Optional[Callable[[str], None]]
+            Called with a description of the current step.
+        on_state : Optional[Callable[[JobState], None]]
+            Called when the download moves on to another state.
+        on_title : Optional[Callable[[str], None]]
+            Called with the title of the video once it is resolved.
+        """
+        self.url = url
+        self.path = path
+        self.format = file_format
+        self.formats = [file_format, *(extra for extra in extra_formats if extra.name != file_format.name)]
+        self.pipelined = pipelined
+        self.connections = connections
+        self.segment_size = segment_size
+        self.adaptive = adaptive
+        self.transcoder = transcoder if transcoder is not None else get_transcode_pool()
+        self.library = library if library is not None else get_library()
+        self.bandwidth = get_bandwidth_limiter().share(priority)
+        self.tag = tag
+        self.segmented = segmented
+        self.engine = engine if engine is not None else get_engine()
+        self._on_progress = on_progress
+        self._on_status = on_status
+        self._on_state = on_state
+        self._on_title = on_title
+        self._tracker = ProgressTracker(self._progress)
+        self._metrics = get_metrics()
+        self._write_lock = threading.Lock()
+        self._write_bytes = 0
+        self._write_seconds = 0.0
+        self._future: Optional[concurrent.futures.Future[str]] = None
+        # Fresh stream URLs by the stale URL they replace, shared by the connections that hit it
+        self._stream_urls: dict[str, asyncio.Future[str]] = {}
+        # The SHA-256 of the downloaded files by path, computed as they were written, for the library
+        self._hashes: dict[str, str] = {}
+        # The FFmpeg runs of the job, several at once when it encodes in segments
+        self._processes: set[FFmpeg] = set()
+        self._process_lock = threading.Lock()
+        self._cancelled = False
+
+    def _progress(self, progress: JobProgress) -> None:
+        if self._on_progress is not None:
+            self._on_progress(progress)
+
+    def _status(self, status: str) -> None:
+        if self._on_status is not None:
+            self._on_status(status)
+
+    def _state(self, state: JobState) -> None:
+        if self._on_state is not None:
+            self._on_state(state)
+
+    def _download_progress(self, downloaded: int, filesize: int) -> None:
+        self._tracker.update(downloaded, filesize)
+
+    def _on_write(self, size: int, seconds: float) -> None:
+        with self._write_lock:
+            self._write_bytes += size
+            self._write_seconds += seconds
+
+    def submit(self) -> concurrent.futures.Future[str]:
+        """Starts the job on the engine, returning a future of the path of the saved file."""
+        self._future = self.engine.submit(self.run_async())
+        return self._future
+
+    def run(self) -> str:
+        """
+        Downloads the video, converting it if needed, and blocks until it is done.
+
+        Returns
+        -------
+        str
+            The path of the file saved in `format`, the other formats are saved next to it.
+        """
+        try:
+            return self.submit().result()
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self) -> None:
+        """Stops the job: its transfers are cancelled and FFmpeg, if running, is terminated."""
+        with self._process_lock:
+            self._cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+        self._terminate()
+
+    def _terminate(self) -> None:
+        with self._process_lock:
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.terminate()
+            except Exception:
+                pass  # FFmpeg already exited
+
+    async def run_async(self) -> str:
+        """Downloads the video, converting it if needed, on the engine's event loop."""
+        with self._metrics.profile(self.url):
+            return await self._run()
+
+    async def _run(self) -> str:
+        metrics = self._metrics
+        video_id = video_id_of(self.url)
+        formats = [Formats[file_format.name].value for file_format in self.formats]
+        existing = [
+            await asyncio.to_thread(self.library.find_output, video_id, file_format.name, self.path)
+            for file_format in formats
+        ]
+        pending = [file_format for file_format, output in zip(formats, existing) if output is None]
+        if not pending:
+            if self._on_title is not None:
+                self._on_title(existing[0].title)  # type: ignore[union-attr]
+            self._status("Already downloaded")
+            return existing[0].path  # type: ignore[union-attr]
+        # A video format is served first, the audio formats can take the audio track of its streams
+        source_format = next((file_format for file_format in pending if not file_format.audio_only), pending[0])
+        with metrics.stage(self.url, "resolve"):
+            # Stream URLs are only needed for the streams that are not in the library yet
+            video = await asyncio.to_thread(get_resolver().resolve, self.url, False)
+        if self._on_title is not None:
+            self._on_title(video.title)
+        # Fetched while the streams download, it is only needed once FFmpeg starts
+        cover = asyncio.ensure_future(load_cover(video)) if self.tag else None
+        with metrics.stage(self.url, "select"):
+            streams = select_streams(video, source_format, self.adaptive)
+        found = await asyncio.to_thread(self._find_sources, video.video_id, streams)
+        if None in found and video.streams_expired(STREAM_URL_MARGIN):
+            with metrics.stage(self.url, "resolve"):
+                video = await asyncio.to_thread(get_resolver().resolve, self.url)
+            streams = select_streams(video, source_format, self.adaptive)
+            found = await asyncio.to_thread(self._find_sources, video.video_id, streams)
+        self._tracker.reset()
+        # The title may hold path separators or characters Windows rejects
+        name = safe_filename(video.title)
+        output_paths = [os.path.join(self.path, f"{name}.{file_format.extension}") for file_format in pending]
+        saved_path = existing[0].path if existing[0] is not None else output_paths[0]
+        # Tags are written by FFmpeg, a stream saved as it is would need a second pass over the file to get them
+        if not self.tag and len(pending) == 1 and len(streams) == 1 and streams[0].extension == pending[0].extension:
+            source = found[0]
+            if source is not None:
+                await asyncio.to_thread(link_or_copy, source, output_paths[0])
+            else:
+                with metrics.stage(self.url, "download") as timer:
+                    stream = await self.download_stream(video, streams[0], output_paths[0])
+                    timer.bytes = stream.filesize
+                self._record_writes()
+                # The output is the stream itself, it is recorded where it is rather than copied into the library
+                source = await asyncio.to_thread(
+                    self.library.add_source, video.video_id, stream.itag, output_paths[0], False,
+                    self._hashes.pop(output_paths[0], None)
+                )
+            await asyncio.to_thread(
+                self.library.add_output, video.video_id, pending[0].name, video.title, output_paths[0], [source]
+            )
+            return saved_path
+        plans = [plan_conversion(streams, file_format) for file_format in pending]
+        # A long video encode is split to run on every slot at once, which needs the whole source first
+        segmented = (
+            self.segmented and video.length >= SEGMENTED_MIN_LENGTH and any(plan.encodes_video for plan in plans)
+        )
+        workers = self.transcoder.slots if segmented else 1
+        threads = workers if segmented else sum(plan.threads for plan in plans)
+        # Piping needs the CPU as soon as the download starts, only do it when a slot is free right away
+        sources: list[str]
+        if found == [None] and self.pipelined and not segmented and self.transcoder.try_acquire(threads):
+            try:
+                with metrics.stage(self.url, "pipeline") as timer:
+                    tags = MediaTags.of(video, await cover) if cover is not None else None
+                    sources = [await self.convert_stream(name, streams[0], plans, self.path, tags)]
+                    timer.bytes = sum(os.path.getsize(path) for path in output_paths)
+            finally:
+                self.transcoder.release(threads)
+        else:
+            missing = [stream for stream, path in zip(streams, found) if path is None]
+            if missing:
+                with metrics.stage(self.url, "download") as timer:
+                    downloaded = await self.download_streams(video, missing)
+                    timer.bytes = sum(stream.filesize for stream, _ in downloaded)
+                self._record_writes()
+                with metrics.stage(self.url, "library"):
+                    # A throttled stream may have been replaced by another itag, which is what gets recorded
+                    fetched = iter(downloaded)
+                    for index, path in enumerate(found):
+                        if path is None:
+                            stream, stream_path = next(fetched)
+                            found[index] = await asyncio.to_thread(
+                                self.library.add_source, video.video_id, stream.itag, stream_path, True,
+                                self._hashes.pop(stream_path, None)
+                            )
+            # Every source is in the library by now
+            sources = [path for path in found if path is not None]
+            # Leaving the downloading state frees the network slot before waiting for the CPU
+            self._state(JobState.CONVERTING)
+            self._status("Waiting for a free converter...")
+            with metrics.stage(self.url, "transcode_wait"):
+                await self.transcoder.acquire_async(threads)
+            try:
+                tags = MediaTags.of(video, await cover) if cover is not None else None
+                with metrics.stage(self.url, "convert") as timer:
+                    await self._convert(name, sources, plans, self.path, video.length, tags, workers)
+                    timer.bytes = sum(os.path.getsize(path) for path in output_paths)
+            finally:
+                self.transcoder.release(threads)
+        for file_format, output_path in zip(pending, output_paths):
+            await asyncio.to_thread(
+                self.library.add_output, video.video_id, file_format.name, video.title, output_path, sources
+            )
+        return saved_path
+
+    def _find_sources(self, video_id: str, streams: list[StreamInfo]) -> list[Optional[str]]:
+        return [self.library.find_source(video_id, stream.itag) for stream in streams]
+
+    def _record_writes(self) -> None:
+        """Records the time spent writing the downloaded bytes to the disk, as part of the download."""
+        if self._metrics.enabled:
+            with self._write_lock:
+                record = StageRecord(self.url, "write", time.time(), self._write_seconds, self._write_bytes)
+                self._write_bytes, self._write_seconds = 0, 0.0
+            self._metrics.record(record)
+
+    def _url_refresher(self, stream: StreamInfo) -> Callable[[str], Awaitable[str]]:
+        """
+        Returns a coroutine function that looks the video up again and returns the fresh
+        URL of `stream` in place of a stale one. The connections that hit the same stale
+        URL share a single lookup.
+        """
+        async def lookup() -> str:
+            video = await asyncio.to_thread(get_resolver().refresh, self.url)
+            fresh = next((candidate for candidate in video.streams if candidate.itag == stream.itag), None)
+            if fresh is None:
+                raise IOError(f"The stream {stream.itag} is no longer offered")
+            return fresh.url
+
+        async def refresh(stale: str) -> str:
+            if stale not in self._stream_urls:
+                self._stream_urls[stale] = asyncio.ensure_future(lookup())
+            # Shielded, a connection giving up must not cancel the lookup the others wait for
+            return await asyncio.shield(self._stream_urls[stale])
+        return refresh
+
+    async def _fetch_stream(
+            self,
+            video: VideoInfo,
+            stream: StreamInfo,
+            download: Callable[[StreamInfo, bool], Awaitable[None]]
+            ) -> StreamInfo:
+        """
+        Downloads `stream` with `download`, switching to an equivalent stream of another
+        itag when it stays throttled even from a refreshed URL.
+
+        `download` is called with the stream to fetch and whether it should raise
+        `StreamThrottled` rather than carry on slowly, which only the last candidate does not.
+
+        Returns
+        -------
+        StreamInfo
+            The stream that was downloaded.
+        """
+        candidates = [stream, *equivalent_streams(video, stream)]
+        for candidate, fallback in zip(candidates, candidates[1:]):
+            try:
+                await download(candidate, True)
+                return candidate
+            except StreamThrottled:
+                logger.warning(
+                    "Stream %d of %s is throttled, switching to stream %d", candidate.itag, video.video_id, fallback.itag
+                )
+                self._status("Download throttled, switching to another copy of the stream...")
+        await download(candidates[-1], False)
+        return candidates[-1]
+
+    async def download_stream(self, video: VideoInfo, stream: StreamInfo, destination: str) -> StreamInfo:
+        """
+        Downloads the stream to `destination` over `connections` parallel range requests,
+        resuming a previous partial download of the same stream if there is one.
+
+        Parameters
+        ----------
+        video : VideoInfo
+            The video the stream belongs to.
+        stream : StreamInfo
+            The stream to download.
+        destination : str
+            The path of the downloaded file.
+
+        Returns
+        -------
+        StreamInfo
+            The stream that was downloaded, an equivalent one if `stream` stayed throttled.
+        """
+        async def download(candidate: StreamInfo, raise_throttled: bool) -> None:
+            self._hashes[destination] = await download_to_file(
+                candidate.url,
+                candidate.filesize,
+                destination,
+                self._download_progress,
+                self.connections,
+                self.segment_size,
+                video.video_id,
+                candidate.itag,
+                self._on_write,
+                self.bandwidth,
+                refresh=self._url_refresher(candidate),
+                raise_throttled=raise_throttled
+            )
+        return await self._fetch_stream(video, stream, download)
+
+    async def download_streams(self, video: VideoInfo, streams: list[StreamInfo]) -> list[tuple[StreamInfo, str]]:
+        """
+        Downloads the streams concurrently next to the output, under names that let an
+        interrupted download resume on the next attempt.
+
+        Parameters
+        ----------
+        video : VideoInfo
+            The video the streams belong to.
+        streams : list[StreamInfo]
+            The streams to download.
+
+        Returns
+        -------
+        list[tuple[StreamInfo, str]]
+            The streams that were downloaded and the paths of their files, in the order of `streams`.
+            A stream that stayed throttled is replaced by an equivalent one, and the
+            partial files of the copies not downloaded in the end are removed.
+        """
+        sizes = [stream.filesize for stream in streams]
+        downloaded = [0] * len(streams)
+        def progress_of(index: int) -> Callable[[int, int], None]:
+            def on_progress(done: int, filesize: int) -> None:
+                downloaded[index], sizes[index] = done, filesize
+                self._download_progress(sum(downloaded), sum(sizes))
+            return on_progress
+
+        def path_of(stream: StreamInfo) -> str:
+            return os.path.join(self.path, f".{video.video_id}.{stream.itag}.{stream.extension}")
+
+        async def fetch(index: int, stream: StreamInfo) -> tuple[StreamInfo, str]:
+            async def download(candidate: StreamInfo, raise_throttled: bool) -> None:
+                self._hashes[path_of(candidate)] = await download_to_file(
+                    candidate.url,
+                    candidate.filesize,
+                    path_of(candidate),
+                    progress_of(index),
+                    self.connections,
+                    self.segment_size,
+                    video.video_id,
+                    candidate.itag,
+                    self._on_write,
+                    self.bandwidth,
+                    refresh=self._url_refresher(candidate),
+                    raise_throttled=raise_throttled
+                )
+            fetched = await self._fetch_stream(video, stream, download)
+            # Each copy of the stream has its own partial file, those of the copies given up on are of no use any more
+            for candidate in [stream, *equivalent_streams(video, stream)]:
+                if candidate.itag != fetched.itag:
+                    await asyncio.to_thread(discard_partial, path_of(candidate))
+            return fetched, path_of(fetched)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(fetch(index, stream)) for index, stream in enumerate(streams)]
+        except BaseExceptionGroup as errors:
+            raise errors.exceptions[0]
+        return [task.result() for task in tasks]
+
+    async def convert_stream(
+            self,
+            name: str,
+            stream: StreamInfo,
+            plans: list[ConversionPlan],
+            path: str,
+            tags: Optional[MediaTags] = None
+            ) -> str:
+        """
+        Downloads the stream and converts it at the same time, piping each chunk into FFmpeg as it arrives.
+
+        The download runs as a task of the engine and waits whenever FFmpeg falls
+        behind, so only a bounded number of chunks are ever held in memory. The
+        stream is also written to the library, so other formats can be made from it later.
+        It is saved as a partial file with a manifest, like `download_streams` does, so an
+        interrupted download resumes: FFmpeg is first fed the part already on disk.
+
+        Parameters
+        ----------
+        name : str
+            The name of the video file.
+        stream : StreamInfo
+            The stream to download.
+        plans : list[ConversionPlan]
+            The conversions to make, one output file each, see `convert_video`.
+        path : str
+            The directory where the converted files will be saved.
+        tags : Optional[MediaTags]
+            The tags and cover art written to the outputs, see `convert_video`.
+
+        Returns
+        -------
+        str
+            The path of the stream in the library.
+
+        Raises
+        ------
+        RuntimeError
+            If FFmpeg fails, or stops reading the stream before its end.
+        """
+        pipe = ChunkPipe()
+        copy_path = os.path.join(path, f".{video_id_of(self.url)}.{stream.itag}.{stream.extension}")
+        async def feed() -> None:
+            try:
+                with self._metrics.stage(self.url, "download") as timer:
+                    # Its bytes are already in FFmpeg, a throttled stream can be reopened or refreshed but not replaced
+                    self._hashes[copy_path] = await tee_to_file(
+                        stream.url,
+                        stream.filesize,
+                        copy_path,
+                        pipe.write_async,
+                        self._download_progress,
+                        self.segment_size,
+                        video_id_of(self.url),
+                        stream.itag,
+                        self._on_write,
+                        self.bandwidth,
+                        refresh=self._url_refresher(stream)
+                    )
+                    timer.bytes = stream.filesize
+            except BaseException:
+                # FFmpeg only exits once its stdin is closed, even when the download failed
+                pipe.abort()
+                raise
+            self._state(JobState.CONVERTING)
+            await pipe.close_async()
+        feeder = asyncio.create_task(feed())
+        try:
+            await self._convert(name, pipe, plans, path, 0, tags)
+        except BaseException:
+            feeder.cancel()
+            raise
+        finally:
+            pipe.abort()
+            (download_error,) = await asyncio.gather(feeder, return_exceptions=True)
+            # FFmpeg closing its stdin is no download error, its own error is the one reported
+            if isinstance(download_error, Exception) and not isinstance(download_error, BrokenPipeError):
+                # The conversion of a truncated input is worthless, the download error is the cause
+                for plan in plans:
+                    output_file = os.path.join(path, f"{name}.{plan.format.extension}")
+                    if os.path.exists(output_file):
+                        os.remove(output_file)
+                raise download_error
+        if isinstance(download_error, BrokenPipeError):
+            # FFmpeg exited without an error but before reading the whole stream, whose copy is incomplete
+            raise RuntimeError("Conversion failed: FFmpeg stopped reading the stream before its end") from download_error
+        return await asyncio.to_thread(
+            self.library.add_source, video_id_of(self.url), stream.itag, copy_path, True, self._hashes.pop(copy_path, None)
+        )
+
+    async def _convert(self, *args: object) -> None:
+        """Runs `convert_video` on one of the engine's threads, terminating FFmpeg if the job is cancelled."""
+        try:
+            await asyncio.to_thread(self.convert_video, *args)  # type: ignore[arg-type]
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def convert_video(
+            self,
+            name: str,
+            source: str | list[str] | BinaryIO | ChunkPipe,
+            plans: list[ConversionPlan],
+            path: str,
+            duration: float = 0,
+            tags: Optional[MediaTags] = None,
+            workers: int = 1
+            ) -> None:
+        """
+        Converts the video to one or more formats using a single FFmpeg run.
+
+        Every output is fed by the same decode of the source, so making several
+        formats at once costs one decode plus the encodes, instead of one decode each.
+
+        Parameters
+        ----------
+        name : str
+            The name of the video file.
+        source : str | list[str] | BinaryIO | ChunkPipe
+            The path of the downloaded video file, the paths of separate streams to mux together,
+            or a stream of its content piped to FFmpeg's stdin.
+        plans : list[ConversionPlan]
+            How each track is converted, one plan per output format. A plan without tracks
+            encodes every track with the format's FFmpeg arguments.
+        path : str
+            The directory where the converted files will be saved.
+        duration : float
+            The length of the video in seconds, which the progress of FFmpeg is measured against.
+        tags : Optional[MediaTags]
+            The tags and cover art written to every output, by this same FFmpeg run. The
+            outputs get whatever tags and streams FFmpeg copies from the source if None.
+        workers : int
+            The FFmpeg runs encoding video at once. Above one, the formats whose video is
+            encoded again are made by `convert_segmented` from a file source, and the
+            others by a single run.
+
+        Raises
+        ------
+        RuntimeError
+            If FFmpeg fails to convert the video.
+        """
+        if workers > 1 and isinstance(source, (str, list)):
+            for plan in plans:
+                if plan.encodes_video:
+                    self.convert_segmented(name, source, plan, path, duration, workers, tags)
+            plans = [plan for plan in plans if not plan.encodes_video]
+            if not plans:
+                return
+        self._status(f"Converting to {', '.join(str(plan.format) for plan in plans)}...")
+        self._tracker.reset(in_bytes=False)
+        tag_files = TagFiles(tags) if tags is not None else None
+        try:
+            sources: list[str]
+            if isinstance(source, str):
+                sources = [source]
+            elif isinstance(source, list):
+                sources = source
+            else:
+                sources = ["pipe:0"]
+            piped = not isinstance(source, (str, list))
+            inputs = list(sources)
+            outputs = []
+            for plan in plans:
+                options = plan.ffmpeg_options()
+                if len(sources) > 1 or tag_files is not None:
+                    # FFmpeg would otherwise keep a single track of each kind across all inputs, or take the cover as the video
+                    if plan.drop_video:
+                        # Mapped rather than dropped with -vn, which would drop the cover too
+                        options.pop("vn", None)
+                        options["map"] = [f"{index}:a?" for index in range(len(sources))]
+                    else:
+                        options["map"] = [str(index) for index in range(len(sources))]
+                if tag_files is not None:
+                    tag_files.apply(options, plan.format, plan.video_tracks, inputs)
+                outputs.append((os.path.join(path, f"{name}.{plan.format.extension}"), options))
+            process = FFmpeg().option("y")
+            for file in inputs:
+                process = process.input(file)
+            for output_path, options in outputs:
+                process = process.output(output_path, options)
+            if piped:
+                # Progress is reported by the download feeding the pipe
+                self._execute(process, source)  # type: ignore[arg-type]
+            else:
+                @process.on('progress')
+                def on_progress(progress: Progress) -> None:
+                    # The output size says nothing about an audio extraction, the position in the media does
+                    if duration > 0:
+                        self._tracker.update(min(progress.time.total_seconds(), duration), duration)
+                self._execute(process)
+        except Exception as e:
+            raise RuntimeError(f"Conversion failed: {str(e)}") from e
+        finally:
+            if tag_files is not None:
+                tag_files.close()
+
+    def convert_segmented(
+            self,
+            name: str,
+            source: str | list[str],
+            plan: ConversionPlan,
+            path: str,
+            duration: float,
+            workers: int,
+            tags: Optional[MediaTags] = None
+            ) -> None:
+        """
+        Converts the video to a format whose video is encoded again, splitting it at
+        keyframes and encoding the segments in `workers` FFmpeg runs at once.
+
+        Encoders such as libxvid keep little more than one core busy, so a single run
+        leaves the others idle for the whole length of a long video. The segments are
+        copied out of the source without decoding it, encoded in the container of the
+        output and joined without encoding them again, each lasting exactly as long as
+        the part of the source it comes from. The audio is encoded once, by the run
+        joining them, so it stays in sync and has no gap at the cuts.
+
+        Parameters
+        ----------
+        name : str
+            The name of the video file.
+        source : str | list[str]
+            The path of the downloaded video file, or the paths of the video and audio streams.
+        plan : ConversionPlan
+            How each track is converted.
+        path : str
+            The directory where the converted file will be saved.
+        duration : float
+            The length of the video in seconds, which sets the length of the segments.
+        workers : int
+            The segments encoded at once.
+        tags : Optional[MediaTags]
+            The tags and cover art written to the output, by the run joining the segments.
+
+        Raises
+        ------
+        RuntimeError
+            If FFmpeg fails to convert the video.
+        """
+        sources = [source] if isinstance(source, str) else source
+        self._status(f"Converting to {plan.format} in segments...")
+        self._tracker.reset(in_bytes=False)
+        tag_files = TagFiles(tags) if tags is not None else None
+        try:
+            # Next to the output rather than in /tmp, the segments take as much room as the video track
+            with tempfile.TemporaryDirectory(prefix=".segments-", dir=path) as directory:
+                list_path = os.path.join(directory, "segments.csv")
+                self._execute(
+                    FFmpeg().option("y").input(sources[0]).output(
+                        os.path.join(directory, f"source%05d.{SEGMENT_FORMAT}"),
+                        split_options(list_path, segment_duration(duration, workers))
+                    )
+                )
+                segments = read_segments(list_path)
+                # In the container of the output, whose time base the joined track keeps
+                encoded = [
+                    os.path.join(directory, f"encoded{index:05}.{plan.format.extension}")
+                    for index in range(len(segments))
+                ]
+                self._encode_segments(segments, encoded, plan, workers)
+                script = os.path.join(directory, "segments.ffconcat")
+                with open(script, "w", encoding="utf-8") as file:
+                    file.write(concat_list(segments, encoded))
+                # The audio comes from the last source, as `select_streams` orders them
+                inputs = [script, sources[-1]]
+                options = {"map": ["0:v:0", "1:a?"], "c:v": "copy", **plan.track_options("a")}
+                if tag_files is not None:
+                    tag_files.apply(options, plan.format, 1, inputs)
+                self._status(f"Joining the segments of {plan.format}...")
+                process = FFmpeg().option("y").input(script, f="concat", safe="0")
+                for file_path in inputs[1:]:
+                    process = process.input(file_path)
+                self._execute(process.output(os.path.join(path, f"{name}.{plan.format.extension}"), options))
+        except Exception as e:
+            raise RuntimeError(f"Conversion failed: {str(e)}") from e
+        finally:
+            if tag_files is not None:
+                tag_files.close()
+
+    def _encode_segments(self, segments: list[Segment], encoded: list[str], plan: ConversionPlan, workers: int) -> None:
+        """Encodes the video of `segments` to `encoded`, `workers` at a time, reporting their progress as one."""
+        options = {**plan.track_options("v"), "an": None}
+        # The runs share the slots of the conversion, one each unless there are fewer segments than slots
+        options["threads"] = str(max(1, workers // len(segments)))
+        total = sum(segment.duration for segment in segments)
+        done = [0.0] * len(segments)
+        lock = threading.Lock()
+
+        def encode(index: int) -> None:
+            process = FFmpeg().option("y").input(segments[index].path).output(encoded[index], options)
+
+            @process.on('progress')
+            def on_progress(progress: Progress) -> None:
+                with lock:
+                    done[index] = min(progress.time.total_seconds(), segments[index].duration)
+                    self._tracker.update(sum(done), total)
+
+            self._execute(process)
+
+        with concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="segment") as executor:
+            futures = [executor.submit(encode, index) for index in range(len(segments))]
+            finished, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+            failed = next((future for future in finished if future.exception() is not None), None)
+            if failed is not None:
+                # The output is lost either way, the other segments are not worth finishing
+                for future in futures:
+                    future.cancel()
+                self._terminate()
+                raise failed.exception()  # type: ignore[misc]
+
+    def _execute(self, process: FFmpeg, stdin: Optional[BinaryIO | ChunkPipe] = None) -> None:
+        """Runs FFmpeg, unless the job was cancelled, keeping hold of it so `cancel` can terminate it."""
+        with self._process_lock:
+            if self._cancelled:
+                raise RuntimeError("The download was cancelled")
+            self._processes.add(process)
+        try:
+            process.execute(stdin)
+        finally:
+            with self._process_lock:
+                self._processes.discard(process)
@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, TypeVar
+from .constants import ASYNC_MAX_CONNECTIONS, DISK_THREADS, ENGINE_THREADS
+from .http import AsyncConnectionPool
+
+T = TypeVar("T")
+
+
+class DownloadEngine:
+    """
+    Runs the network stage of every download on a single asyncio event loop.
+
+    Transfers are coroutines sharing one pool of kept-alive connections, so a
+    hundred downloads in flight cost a hundred sockets and tasks, not a hundred
+    threads. The steps that block, such as FFmpeg or hashing a file, run on a
+    small thread pool of the loop, whose size does not grow with the jobs.
+
+    Threads drive the engine through `submit` and `run`, and cancel a job by
+    cancelling its future, which cancels its coroutine at its next await.
+
+    Attributes
+    ----------
+    http : AsyncConnectionPool
+        The connections shared by every transfer.
+    executor : ThreadPoolExecutor
+        The threads running the blocking steps, the loop's default executor.
+    disk : ThreadPoolExecutor
+        The threads writing the downloads to disk, shared by every transfer.
+    """
+    def __init__(self, max_connections: int = ASYNC_MAX_CONNECTIONS, threads: int = ENGINE_THREADS) -> None:
+        self.http = AsyncConnectionPool(max_connections)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="engine-blocking")
+        self.disk = ThreadPoolExecutor(max_workers=DISK_THREADS, thread_name_prefix="engine-disk")
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self.executor)
+        self._thread = threading.Thread(target=self._run_loop, name="download-engine", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> concurrent.futures.Future[T]:
+        """Schedules a coroutine on the engine from any thread, returning a future of its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Runs a coroutine on the engine and blocks until it is done, cancelling it if the wait is interrupted."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("The engine cannot wait for itself, await the coroutine instead")
+        future = self.submit(coroutine)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+
+_engine: DownloadEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> DownloadEngine:
+    """Returns the process-wide download engine, starting its event loop on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DownloadEngine()
+        return _engine
@@ -1,20 +1,207 @@
-from typing import Callable, Dict, List
-from dataclasses import dataclass
+import collections
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from .constants import EVENT_QUEUE_SIZE
+
+# Runs a function on the consumer's thread, such as `loop.call_soon_threadsafe` for an asyncio loop
+Dispatcher = Callable[[Callable[[], None]], None]
+
 
 @dataclass
 class Event:
     name: str
     data: dict
+    # Events of the same name and key replace each other under the MERGE policy
+    key: Optional[Hashable] = None
+    published_at: float = field(default_factory=time.monotonic)
+
+
+class OverflowPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"  # A full queue forgets its oldest event
+    DROP_NEWEST = "drop_newest"  # A full queue refuses new events
+    MERGE = "merge"  # A new event replaces the pending one with the same key, for progress-like events
+
+
+@dataclass
+class EventStats:
+    """Counters of the events of one name, across its subscriptions."""
+    published: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    merged: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        """The mean time in seconds between the publication of an event and its delivery."""
+        return self.total_latency / self.delivered if self.delivered else 0.0
+
+
+class Subscription:
+    """
+    The queue of events waiting for one subscriber, delivered through its dispatcher.
+
+    A single delivery is scheduled at a time: events published meanwhile pile up
+    and are delivered together, so a burst costs one hop to the consumer's thread.
+    """
+    def __init__(
+            self,
+            bus: "EventBus",
+            event_name: str,
+            callback: Callable[[Any], None],
+            dispatcher: Optional[Dispatcher],
+            batch: bool,
+            policy: OverflowPolicy,
+            max_pending: int
+            ) -> None:
+        self.event_name = event_name
+        self.callback = callback
+        self.dispatcher = dispatcher
+        self.batch = batch
+        self.policy = policy
+        self.max_pending = max_pending
+        self._bus = bus
+        self._lock = threading.Lock()
+        self._pending: collections.OrderedDict[Hashable, Event] = collections.OrderedDict()
+        self._sequence = 0
+        self._scheduled = False
+        self.active = True
+
+    def offer(self, event: Event) -> None:
+        """Queues an event, applying the overflow policy, and schedules a delivery if none is pending."""
+        with self._lock:
+            if self.policy is OverflowPolicy.MERGE and event.key is not None:
+                key: Hashable = (event.key,)
+                if key in self._pending:
+                    # The merged event keeps the place and age of the one it replaces
+                    self._pending[key] = replace(event, published_at=self._pending[key].published_at)
+                    self._bus._count(event.name, merged=1)
+                    return
+            else:
+                key = self._sequence
+                self._sequence += 1
+            if len(self._pending) >= self.max_pending:
+                if self.policy is OverflowPolicy.DROP_NEWEST:
+                    self._bus._count(event.name, dropped=1)
+                    return
+                self._pending.popitem(last=False)
+                self._bus._count(event.name, dropped=1)
+            self._pending[key] = event
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            if self.dispatcher is None:
+                self.deliver()
+            else:
+                self.dispatcher(self.deliver)
+
+    def deliver(self) -> None:
+        """Hands the queued events to the callback, on the calling thread."""
+        with self._lock:
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._scheduled = False
+        if not events or not self.active:
+            return
+        now = time.monotonic()
+        self._bus._record_latency(events, now)
+        if self.batch:
+            self.callback([event.data for event in events])
+        else:
+            for event in events:
+                self.callback(event.data)
+
 
 class EventBus:
-    def __init__(self):
-        self._subscribers: Dict[str, List[Callable]] = {}
-    
-    def subscribe(self, event_name: str, callback: Callable):
-        if event_name not in self._subscribers:
-            self._subscribers[event_name] = []
-        self._subscribers[event_name].append(callback)
-    
+    """
+    A thread-safe publish/subscribe channel between the workers and their consumers.
+
+    Publishing never blocks on a consumer: each subscription has its own bounded
+    queue, delivered on the consumer's thread through its dispatcher, or straight
+    away on the publisher's thread when it has none.
+    """
+    def __init__(self, max_pending: int = EVENT_QUEUE_SIZE):
+        self.max_pending = max_pending
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._stats: Dict[str, EventStats] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(
+            self,
+            event_name: str,
+            callback: Callable[[Any], None],
+            dispatcher: Optional[Dispatcher] = None,
+            batch: bool = False,
+            policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+            max_pending: Optional[int] = None
+            ) -> Subscription:
+        """
+        Subscribes `callback` to the events named `event_name`.
+
+        Parameters
+        ----------
+        event_name : str
+            The name of the events.
+        callback : Callable[[Any], None]
+            Called with the data of each event, or with the list of the data of the
+            queued events when `batch` is True.
+        dispatcher : Optional[Dispatcher]
+            Runs the delivery on the consumer's thread. Without one, events are
+            delivered synchronously on the publisher's thread.
+        batch : bool
+            Whether the events queued since the last delivery are passed together.
+        policy : OverflowPolicy
+            What happens to events that do not fit in the queue.
+        max_pending : Optional[int]
+            The size of the queue, the bus default if None.
+        """
+        subscription = Subscription(
+            self,
+            event_name,
+            callback,
+            dispatcher,
+            batch,
+            policy,
+            max_pending if max_pending is not None else self.max_pending
+        )
+        with self._lock:
+            # Copied on write so publishers can iterate without holding the lock
+            self._subscribers[event_name] = [*self._subscribers.get(event_name, []), subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.active = False
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.event_name, [])
+            self._subscribers[subscription.event_name] = [item for item in subscribers if item is not subscription]
+
     def publish(self, event: Event):
-        for callback in self._subscribers.get(event.name, []):
-            callback(event.data)
\ No newline at end of file
+        self._count(event.name, published=1)
+        with self._lock:
+            subscribers = self._subscribers.get(event.name, [])
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def stats(self) -> Dict[str, EventStats]:
+        """A snapshot of the counters of every event name."""
+        with self._lock:
+            return {name: EventStats(**vars(stats)) for name, stats in self._stats.items()}
+
+    def _count(self, name: str, **counts: int) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(name, EventStats())
+            for counter, value in counts.items():
+                setattr(stats, counter, getattr(stats, counter) + value)
+
+    def _record_latency(self, events: List[Event], now: float) -> None:
+        with self._lock:
+            for event in events:
+                stats = self._stats.setdefault(event.name, EventStats())
+                latency = now - event.published_at
+                stats.delivered += 1
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+
+# Characters Windows does not allow in file names, the path separators of every platform among them
+RESERVED_CHARACTERS = '<>:"/\\|?*'
+# Names of devices on Windows, which no file can take whatever its extension
+RESERVED_NAMES = {"CON", "PRN", "AUX", "NUL", *(f"COM{n}" for n in range(1, 10)), *(f"LPT{n}" for n in range(1, 10))}
+# Bytes of a file name at most, most file systems allow 255 and room is left for the extension
+MAX_NAME_BYTES = 200
+
+
+def safe_filename(name: str) -> str:
+    """
+    Turns a video title into a file name valid on every platform: reserved and control
+    characters become `_`, trailing dots and spaces are dropped, device names get a `_`
+    in front and overlong names are shortened.
+    """
+    cleaned = "".join("_" if character in RESERVED_CHARACTERS or ord(character) < 32 else character for character in name)
+    cleaned = cleaned.encode("utf-8")[:MAX_NAME_BYTES].decode("utf-8", "ignore").strip().rstrip(". ")
+    if cleaned.split(".")[0].upper() in RESERVED_NAMES:
+        cleaned = "_" + cleaned
+    return cleaned or "_"
+
+
+@contextmanager
+def atomic_write(destination: str) -> Iterator[BinaryIO]:
+    """
+    Opens a temporary file next to `destination` and renames it over
+    `destination` once the block exits without error.
+
+    A failed or interrupted write never leaves a truncated file at `destination`,
+    the partial temporary file is removed instead.
+
+    Parameters
+    ----------
+    destination : str
+        The final path of the file.
+
+    Yields
+    ------
+    BinaryIO
+        The temporary file opened for binary writing.
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            yield file
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def link_or_copy(source: str, destination: str) -> None:
+    """
+    Makes `destination` a hard link to `source`, or a copy of it when the two are
+    on different file systems, replacing `destination` atomically if it exists.
+    """
+    directory = os.path.dirname(os.path.abspath(destination))
+    temp_path = os.path.join(directory, f".{os.path.basename(destination)}.link")
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
@@ -0,0 +1,230 @@
+import asyncio
+import base64
+import ssl
+import urllib.request
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit
+from .constants import ASYNC_MAX_CONNECTIONS, DOWNLOAD_CONNECTIONS
+
+HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+REQUEST_TIMEOUT = 30
+POOL_SIZE = DOWNLOAD_CONNECTIONS * 4
+MAX_REDIRECTS = 5
+
+
+class HttpStatusError(IOError):
+    """Raised when a server answers with an error status."""
+    def __init__(self, status: int, url: str) -> None:
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+
+
+@dataclass
+class _Connection:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    reused: bool = False
+    reusable: bool = False
+    # The headers for the proxy a plain HTTP request is sent through, which then names the full URL.
+    # None for a direct connection or a tunnel.
+    proxy_headers: Optional[dict[str, str]] = None
+
+
+def _default_port(scheme: str) -> int:
+    return 443 if scheme == "https" else 80
+
+
+def _proxy_headers(proxy: SplitResult) -> dict[str, str]:
+    if proxy.username is None:
+        return {}
+    credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")}
+
+
+async def _read_head(reader: asyncio.StreamReader) -> tuple[int, dict[str, str]]:
+    """Reads the status line and the headers of a response."""
+    status_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+    if not status_line:
+        raise ConnectionResetError("The connection was closed before the response")
+    status = int(status_line.split()[1])
+    headers = {}
+    while (line := await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+class AsyncConnectionPool:
+    """
+    An HTTP/1.1 client on asyncio streams whose connections are kept alive and
+    reused across requests to the same host.
+
+    At most `max_connections` requests are in flight at once, whatever the number
+    of downloads waiting for one, which bounds the sockets and buffers in use.
+    The pool belongs to the event loop it is first used on.
+
+    Proxies are honoured like urllib does, from the `HTTP_PROXY`, `HTTPS_PROXY` and
+    `NO_PROXY` variables or the system settings: HTTPS requests go through a CONNECT
+    tunnel and plain HTTP ones are forwarded by the proxy.
+
+    Attributes
+    ----------
+    max_connections : int
+        The maximum number of requests in flight.
+    max_idle : int
+        The maximum number of idle connections kept per host.
+    proxies : dict[str, str]
+        The proxy URL of each scheme, with the hosts to reach directly under `no`.
+        Those of `urllib.request.getproxies` if not given.
+    """
+    def __init__(
+            self,
+            max_connections: int = ASYNC_MAX_CONNECTIONS,
+            max_idle: int = POOL_SIZE,
+            proxies: Optional[dict[str, str]] = None
+            ) -> None:
+        self.max_connections = max_connections
+        self.max_idle = max_idle
+        self._system_proxies = proxies is None
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self._idle: dict[tuple[str, str, int], list[_Connection]] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+        self._ssl = ssl.create_default_context()
+
+    @asynccontextmanager
+    async def _connection(self, scheme: str, host: str, port: int, fresh: bool) -> AsyncIterator[_Connection]:
+        key = (scheme, host, port)
+        idle = self._idle.setdefault(key, [])
+        connection = None
+        while idle and not fresh:
+            candidate = idle.pop()
+            if not candidate.writer.is_closing() and not candidate.reader.at_eof():
+                connection = candidate
+                connection.reused = True
+                break
+            candidate.writer.close()
+        if connection is None:
+            connection = await asyncio.wait_for(self._open(scheme, host, port), REQUEST_TIMEOUT)
+        connection.reusable = False
+        try:
+            yield connection
+        finally:
+            if connection.reusable and len(idle) < self.max_idle:
+                idle.append(connection)
+            else:
+                connection.writer.close()
+
+    def _proxy_for(self, scheme: str, host: str) -> Optional[SplitResult]:
+        proxy = self.proxies.get(scheme)
+        if not proxy:
+            return None
+        if self._system_proxies:
+            bypass = urllib.request.proxy_bypass(host)
+        else:
+            # Missing from typeshed, it is what proxy_bypass runs on the environment's NO_PROXY
+            bypass = urllib.request.proxy_bypass_environment(host, self.proxies)  # type: ignore[attr-defined]
+        if bypass:
+            return None
+        return urlsplit(proxy if "://" in proxy else "http://" + proxy)
+
+    async def _open(self, scheme: str, host: str, port: int) -> _Connection:
+        proxy = self._proxy_for(scheme, host)
+        if proxy is None:
+            reader, writer = await asyncio.open_connection(host, port, ssl=self._ssl if scheme == "https" else None)
+            return _Connection(reader, writer)
+        reader, writer = await asyncio.open_connection(
+            proxy.hostname,
+            proxy.port or _default_port(proxy.scheme),
+            ssl=self._ssl if proxy.scheme == "https" else None
+        )
+        if scheme != "https":
+            return _Connection(reader, writer, proxy_headers=_proxy_headers(proxy))
+        try:
+            lines = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+            lines += [f"{name}: {value}" for name, value in _proxy_headers(proxy).items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            status, _ = await _read_head(reader)
+            if status != 200:
+                raise HttpStatusError(status, f"{proxy.scheme}://{proxy.hostname} (CONNECT {host}:{port})")
+            await writer.start_tls(self._ssl, server_hostname=host)
+        except BaseException:
+            writer.close()
+            raise
+        return _Connection(reader, writer)
+
+    @asynccontextmanager
+    async def get(self, url: str, chunk_size: int = 64 * 1024) -> AsyncIterator[AsyncIterator[bytes]]:
+        """
+        Sends a GET request and yields an iterator over the chunks of the response
+        body, following redirects. The connection goes back to the pool once the
+        body has been read in full.
+
+        Raises
+        ------
+        HttpStatusError
+            If the server answers with a status of 400 or above.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        async with self._semaphore:
+            for _ in range(MAX_REDIRECTS + 1):
+                for fresh in (False, True):
+                    parsed = urlsplit(url)
+                    port = parsed.port or _default_port(parsed.scheme)
+                    async with self._connection(parsed.scheme, parsed.hostname or "", port, fresh) as connection:
+                        try:
+                            status, headers = await self._request(connection, parsed)
+                        except (ConnectionError, asyncio.IncompleteReadError):
+                            # The server may have closed a kept-alive connection meanwhile, retry once on a new one
+                            if connection.reused and not fresh:
+                                continue
+                            raise
+                        if status in (301, 302, 303, 307, 308) and "location" in headers:
+                            async for _ in self._body(connection, headers, chunk_size):
+                                pass
+                            url = urljoin(url, headers["location"])
+                            break
+                        if status >= 400:
+                            raise HttpStatusError(status, url)
+                        yield self._body(connection, headers, chunk_size)
+                        return
+            raise IOError(f"Too many redirects for {url}")
+
+    async def _request(self, connection: _Connection, url: SplitResult) -> tuple[int, dict[str, str]]:
+        target = url.path or "/"
+        if url.query:
+            target += "?" + url.query
+        headers = dict(HEADERS)
+        if connection.proxy_headers is not None:
+            target = f"{url.scheme}://{url.netloc}{target}"
+            headers.update(connection.proxy_headers)
+        lines = [f"GET {target} HTTP/1.1", f"Host: {url.netloc}", "Connection: keep-alive", "Accept-Encoding: identity"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        connection.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await connection.writer.drain()
+        return await _read_head(connection.reader)
+
+    async def _body(self, connection: _Connection, headers: dict[str, str], chunk_size: int) -> AsyncIterator[bytes]:
+        reader = connection.reader
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while size := int((await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)).split(b";")[0], 16):
+                for offset in range(0, size, chunk_size):
+                    yield await asyncio.wait_for(reader.readexactly(min(chunk_size, size - offset)), REQUEST_TIMEOUT)
+                await reader.readline()
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+                pass
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                chunk = await asyncio.wait_for(reader.readexactly(min(chunk_size, remaining)), REQUEST_TIMEOUT)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            # Without a length the body ends with the connection, which cannot be reused
+            while chunk := await asyncio.wait_for(reader.read(chunk_size), REQUEST_TIMEOUT):
+                yield chunk
+            return
+        connection.reusable = headers.get("connection", "").lower() != "close"
@@ -0,0 +1,245 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from .constants import CACHE_DIR, LIBRARY_SIZE
+from .files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    video_id TEXT NOT NULL,
+    itag INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    stored INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (video_id, itag)
+);
+CREATE INDEX IF NOT EXISTS sources_by_hash ON sources (sha256);
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    format TEXT NOT NULL,
+    directory TEXT NOT NULL,
+    title TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sources TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_by_video ON outputs (video_id, format, directory);
+"""
+
+
+@dataclass
+class LibraryOutput:
+    """A converted file recorded in the library."""
+    path: str
+    title: str
+
+
+def file_hash(path: str) -> str:
+    """Returns the SHA-256 of the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _matches(path: str, size: int, mtime_ns: int) -> bool:
+    """Whether the file at `path` is still the one that was recorded, going by its size and modification time."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+
+class LibraryIndex:
+    """
+    A SQLite index of the streams downloaded so far and of the files converted
+    from them, so a video is never fetched twice.
+
+    Sources are keyed by video id and itag and stored under the SHA-256 of their
+    content, which also deduplicates identical streams. Outputs remember the
+    sources they were made from. An entry whose file was deleted or modified
+    since it was recorded is forgotten the next time it is looked up.
+
+    Attributes
+    ----------
+    directory : str
+        The directory of the database and of the stored sources.
+    max_bytes : int
+        The size budget of the stored sources, the least recently used ones are evicted beyond it.
+    """
+    def __init__(self, directory: str, max_bytes: int = LIBRARY_SIZE) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sources_directory = os.path.join(directory, "sources")
+        os.makedirs(self.sources_directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # One connection shared by every thread, serialized by the lock
+        self._connection = sqlite3.connect(
+            os.path.join(directory, "library.sqlite3"), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def find_source(self, video_id: str, itag: int) -> Optional[str]:
+        """Returns the path of the downloaded stream, or None if it is not in the library."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT path, size, mtime_ns FROM sources WHERE video_id = ? AND itag = ?", (video_id, itag)
+            ).fetchone()
+            if row is None:
+                return None
+            path, size, mtime_ns = row
+            if not _matches(path, size, mtime_ns):
+                self._connection.execute("DELETE FROM sources WHERE video_id = ? AND itag = ?", (video_id, itag))
+                return None
+            self._connection.execute(
+                "UPDATE sources SET last_used = ? WHERE video_id = ? AND itag = ?", (time.time(), video_id, itag)
+            )
+            return path
+
+    def add_source(
+            self, video_id: str, itag: int, path: str, store: bool = True, sha256: Optional[str] = None
+            ) -> str:
+        """
+        Records a downloaded stream.
+
+        Parameters
+        ----------
+        video_id : str
+            The id of the video the stream belongs to.
+        itag : int
+            The itag of the stream.
+        path : str
+            The path of the downloaded file.
+        store : bool
+            Whether the file is moved into the library, or recorded where it is, e.g.
+            when the stream is itself the output. A file on another file system than the
+            library is copied into it, then removed.
+        sha256 : Optional[str]
+            The SHA-256 of the file if it is already known, e.g. computed while it was
+            downloaded, otherwise it is read to compute it.
+
+        Returns
+        -------
+        str
+            The path of the file from now on.
+        """
+        if sha256 is None:
+            sha256 = file_hash(path)
+        if store:
+            stored_path = os.path.join(self.sources_directory, sha256 + os.path.splitext(path)[1])
+            if os.path.exists(stored_path):
+                os.remove(path)  # The same content is already in the library
+                path = stored_path
+            else:
+                try:
+                    os.rename(path, stored_path)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    with open(path, "rb") as source, atomic_write(stored_path) as copy:
+                        shutil.copyfileobj(source, copy, HASH_BLOCK_SIZE)
+                    os.remove(path)
+                path = stored_path
+        stat = os.stat(path)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, itag, sha256, path, stat.st_size, stat.st_mtime_ns, store, time.time())
+            )
+            if store:
+                self._prune(keep=path)
+        return path
+
+    def find_output(self, video_id: str, format_name: str, directory: str) -> Optional[LibraryOutput]:
+        """Returns the file the video was already converted to in this format and directory, if it is still there."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT path, title, size, mtime_ns FROM outputs WHERE video_id = ? AND format = ? AND directory = ?",
+                (video_id, format_name, os.path.abspath(directory))
+            ).fetchall()
+            for path, title, size, mtime_ns in rows:
+                if _matches(path, size, mtime_ns):
+                    return LibraryOutput(path, title)
+                self._connection.execute("DELETE FROM outputs WHERE path = ?", (path,))
+        return None
+
+    def add_output(self, video_id: str, format_name: str, title: str, path: str, sources: list[str]) -> None:
+        """Records the file a video was converted to, and the paths of the sources it was made from."""
+        stat = os.stat(path)
+        with self._lock:
+            hashes = [
+                row[0] for source in sources
+                if (row := self._connection.execute("SELECT sha256 FROM sources WHERE path = ?", (source,)).fetchone())
+            ]
+            self._connection.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    os.path.abspath(path),
+                    video_id,
+                    format_name,
+                    os.path.dirname(os.path.abspath(path)),
+                    title,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    ",".join(hashes),
+                    time.time()
+                )
+            )
+
+    def _prune(self, keep: str) -> None:
+        rows = self._connection.execute(
+            "SELECT path, size FROM sources WHERE stored ORDER BY last_used"
+        ).fetchall()
+        sizes = dict(rows)  # Sources sharing a stored file count once
+        total = sum(sizes.values())
+        for path, size in rows:
+            if total <= self.max_bytes:
+                break
+            if path == keep or path not in sizes:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                logger.debug("Could not evict %s", path, exc_info=True)
+            self._connection.execute("DELETE FROM sources WHERE path = ?", (path,))
+            total -= sizes.pop(path)
+
+
+_library: LibraryIndex | None = None
+_library_lock = threading.Lock()
+
+
+def configure_library(directory: str, max_bytes: int = LIBRARY_SIZE) -> LibraryIndex:
+    """Replaces the process-wide library with one stored in `directory`."""
+    global _library
+    with _library_lock:
+        _library = LibraryIndex(directory, max_bytes)
+        return _library
+
+
+def get_library() -> LibraryIndex:
+    """Returns the process-wide library, stored under `CACHE_DIR`."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = LibraryIndex(os.path.join(CACHE_DIR, "library"))
+        return _library
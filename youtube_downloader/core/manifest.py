@@ -0,0 +1,116 @@
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from typing import Optional, Self
+from urllib.parse import parse_qs, urlparse
+from .files import atomic_write
+
+PARTIAL_SUFFIX = ".part"
+MANIFEST_SUFFIX = ".json"
+# Query parameters of a stream URL that identify the media itself, the others
+# (signature, expiry, client ip...) change every time the URL is resolved.
+SOURCE_PARAMETERS = ("id", "itag", "clen", "lmt")
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def stream_source(url: str) -> str:
+    """
+    Returns an identifier of the media behind a signed stream URL, stable across
+    URL refreshes but different once the media itself changed.
+
+    The host is ignored since a refreshed URL may point to another CDN node.
+    """
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    parameters = "&".join(f"{key}={query[key][0]}" for key in SOURCE_PARAMETERS if key in query)
+    return f"{parsed.path}?{parameters}"
+
+
+def file_checksum(path: str, start: int, end: int) -> str:
+    """Returns the SHA-256 hex digest of the bytes `start` to `end` (exclusive) of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(_HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class CompletedRange:
+    start: int
+    end: int
+    sha256: str
+
+
+@dataclass
+class DownloadManifest:
+    """
+    The sidecar file describing which parts of a partial download are already on disk.
+
+    Attributes
+    ----------
+    video_id : str
+        The id of the downloaded video.
+    itag : int
+        The itag of the downloaded stream.
+    filesize : int
+        The expected size of the complete file.
+    source : str
+        The identity of the stream media, see `stream_source`.
+    ranges : list[CompletedRange]
+        The byte ranges already written, with the checksum of their content.
+    """
+    video_id: str
+    itag: int
+    filesize: int
+    source: str
+    ranges: list[CompletedRange] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: str) -> Optional[Self]:
+        """Reads a manifest, returning None if it is missing or unreadable."""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            data["ranges"] = [CompletedRange(**item) for item in data.get("ranges", [])]
+            return cls(**data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def save(self, path: str) -> None:
+        with atomic_write(path) as file:
+            file.write(json.dumps(asdict(self)).encode("utf-8"))
+
+    def matches(self, other: "DownloadManifest") -> bool:
+        """Whether both manifests describe the same stream, ignoring their progress."""
+        return (self.video_id, self.itag, self.filesize, self.source) == \
+            (other.video_id, other.itag, other.filesize, other.source)
+
+    def verify(self, partial_path: str) -> None:
+        """Drops the ranges whose content in `partial_path` no longer matches their checksum."""
+        self.ranges = [
+            completed for completed in self.ranges
+            if completed.end <= self.filesize
+            and file_checksum(partial_path, completed.start, completed.end) == completed.sha256
+        ]
+
+    def completed_bytes(self) -> int:
+        return sum(completed.end - completed.start for completed in self.ranges)
+
+    def missing_ranges(self) -> list[tuple[int, int]]:
+        """Returns the `(start, end)` ranges, `end` being exclusive, that still have to be downloaded."""
+        missing = []
+        offset = 0
+        for completed in sorted(self.ranges, key=lambda item: item.start):
+            if completed.start > offset:
+                missing.append((offset, completed.start))
+            offset = max(offset, completed.end)
+        if offset < self.filesize:
+            missing.append((offset, self.filesize))
+        return missing
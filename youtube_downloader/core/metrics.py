@@ -0,0 +1,228 @@
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional
+from .constants import METRICS_DIR_ENV, PROFILE_ENV
+from .files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+METRICS_LOG = "metrics.jsonl"
+METRICS_TEXTFILE = "youtube_downloader.prom"
+
+
+@dataclass
+class StageRecord:
+    """The timing of one stage of one job, as written to the JSON lines log."""
+    job: str
+    stage: str
+    started_at: float
+    duration: float
+    bytes: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """The bytes moved per second of the stage."""
+        return self.bytes / self.duration if self.duration > 0 else 0.0
+
+
+class StageTimer:
+    """Handed to the block timed by `MetricsRecorder.stage`, which sets the bytes it moved."""
+    def __init__(self) -> None:
+        self.bytes = 0
+
+
+@dataclass
+class _StageTotals:
+    runs: int = 0
+    seconds: float = 0.0
+    bytes: int = 0
+
+
+@dataclass
+class _ProfileSession:
+    """A profile of the engine, shared by every job running while it is recorded."""
+    name: str
+    profiler: cProfile.Profile
+    tracing: bool  # Whether tracemalloc was already on before the session, and stays on after it
+    jobs: list[str]
+    running: int = 0
+
+
+class MetricsRecorder:
+    """
+    Times the stages of every job and records the bytes each of them moved.
+
+    Every stage is appended to a JSON lines log, and the totals per stage are
+    rewritten to a Prometheus textfile after each of them. A recorder without a
+    directory is disabled and costs next to nothing.
+
+    Attributes
+    ----------
+    directory : Optional[str]
+        The directory of the log, the textfile and the profiles, or None to disable the recorder.
+    profile_jobs : bool
+        Whether `profile` records cProfile and tracemalloc reports of the jobs.
+    """
+    def __init__(self, directory: Optional[str] = None, profile: bool = False) -> None:
+        self.directory = directory
+        self.profile_jobs = profile
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._profile: Optional[_ProfileSession] = None
+        self._profiles = 0
+        self._totals: dict[str, _StageTotals] = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    @contextmanager
+    def stage(self, job: str, name: str) -> Iterator[StageTimer]:
+        """Times the block as the `name` stage of `job`, recording it even if the block fails."""
+        timer = StageTimer()
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            if self.enabled:
+                self.record(StageRecord(job, name, started_at, time.perf_counter() - start, timer.bytes))
+
+    def record(self, record: StageRecord) -> None:
+        if self.directory is None:
+            return
+        line = json.dumps({**asdict(record), "throughput": record.throughput})
+        with self._lock:
+            totals = self._totals.setdefault(record.stage, _StageTotals())
+            totals.runs += 1
+            totals.seconds += record.duration
+            totals.bytes += record.bytes
+            try:
+                with open(os.path.join(self.directory, METRICS_LOG), "a", encoding="utf-8") as file:
+                    file.write(line + "\n")
+                self._write_textfile()
+            except OSError:
+                logger.warning("Could not write the metrics to %s", self.directory, exc_info=True)
+
+    def _write_textfile(self) -> None:
+        lines = [
+            "# HELP youtube_downloader_stage_runs_total Stages run, by stage.",
+            "# TYPE youtube_downloader_stage_runs_total counter",
+            *(f'youtube_downloader_stage_runs_total{{stage="{stage}"}} {totals.runs}' for stage, totals in self._totals.items()),
+            "# HELP youtube_downloader_stage_seconds_total Time spent in each stage.",
+            "# TYPE youtube_downloader_stage_seconds_total counter",
+            *(f'youtube_downloader_stage_seconds_total{{stage="{stage}"}} {totals.seconds:.6f}' for stage, totals in self._totals.items()),
+            "# HELP youtube_downloader_stage_bytes_total Bytes moved by each stage.",
+            "# TYPE youtube_downloader_stage_bytes_total counter",
+            *(f'youtube_downloader_stage_bytes_total{{stage="{stage}"}} {totals.bytes}' for stage, totals in self._totals.items()),
+        ]
+        # Written atomically, the textfile collector must never read a half-written snapshot
+        with atomic_write(os.path.join(self.directory or "", METRICS_TEXTFILE)) as file:
+            file.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+    @contextmanager
+    def profile(self, job: str) -> Iterator[None]:
+        """
+        Profiles the block with cProfile and tracemalloc when profiling is enabled.
+
+        Jobs share the engine's threads, so the work of one cannot be told apart from
+        the others running at the same time. A profile is therefore recorded for the
+        engine as a whole, from the moment a job starts with no other one profiled to
+        the moment no profiled job is left running, and every job started in between
+        joins it. cProfile follows every thread of the process, the loop's and those
+        of its executors, FFmpeg and hashing among them.
+
+        Each session writes `<name>.prof`, `<name>.memory.txt` and `<name>.jobs.txt`,
+        which lists the jobs it covered, to the metrics directory.
+        """
+        if self.directory is None or not self.profile_jobs:
+            yield
+            return
+        with self._profile_lock:
+            session = self._profile
+            if session is None:
+                session = self._start_profile()
+            if session is not None:
+                session.jobs.append(job)
+                session.running += 1
+        if session is None:
+            yield
+            return
+        logger.info("Profiling %s in %s", job, session.name)
+        try:
+            yield
+        finally:
+            with self._profile_lock:
+                session.running -= 1
+                finished = session.running == 0
+                if finished:
+                    # Stopped under the lock, a job starting now begins the next session
+                    session.profiler.disable()
+                    self._profile = None
+                    _, peak = tracemalloc.get_traced_memory()
+                    statistics = tracemalloc.take_snapshot().statistics("lineno")[:25]
+                    if not session.tracing:
+                        tracemalloc.stop()
+            if finished:
+                self._write_profile(session, peak, statistics)
+
+    def _start_profile(self) -> Optional[_ProfileSession]:
+        """Starts a profile of the engine, or returns None if another profiler already runs in the process."""
+        self._profiles += 1
+        name = time.strftime("profile-%Y%m%d-%H%M%S") + f"-{self._profiles}"
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            logger.warning("Another profiler is running, jobs are not profiled until it stops", exc_info=True)
+            return None
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._profile = _ProfileSession(name, profiler, tracing, [])
+        return self._profile
+
+    def _write_profile(self, session: _ProfileSession, peak: int, statistics: list[tracemalloc.Statistic]) -> None:
+        path = os.path.join(self.directory or "", session.name)
+        try:
+            session.profiler.dump_stats(path + ".prof")
+            with open(path + ".memory.txt", "w", encoding="utf-8") as file:
+                file.write(f"Peak traced memory: {peak} bytes\n")
+                file.writelines(f"{statistic}\n" for statistic in statistics)
+            with open(path + ".jobs.txt", "w", encoding="utf-8") as file:
+                file.writelines(f"{job}\n" for job in session.jobs)
+        except OSError:
+            logger.warning("Could not write the profile %s", session.name, exc_info=True)
+
+_metrics: MetricsRecorder | None = None
+_metrics_lock = threading.Lock()
+
+
+def configure_metrics(directory: Optional[str], profile: bool = False) -> MetricsRecorder:
+    """Replaces the process-wide recorder, enabling it when `directory` is given."""
+    global _metrics
+    with _metrics_lock:
+        _metrics = MetricsRecorder(directory, profile)
+        return _metrics
+
+
+def get_metrics() -> MetricsRecorder:
+    """
+    Returns the process-wide recorder. Unless configured otherwise, it is enabled
+    by the METRICS_DIR_ENV environment variable and profiles jobs when PROFILE_ENV is set.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRecorder(os.environ.get(METRICS_DIR_ENV) or None, bool(os.environ.get(PROFILE_ENV)))
+        return _metrics
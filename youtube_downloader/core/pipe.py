@@ -0,0 +1,143 @@
+import asyncio
+import queue
+import threading
+from typing import Callable
+from .constants import PIPE_MAX_CHUNKS
+
+_EOF = object()
+_POLL_INTERVAL = 0.1
+
+
+class ChunkPipe:
+    """
+    A bounded, thread-safe pipe between a producer writing chunks and a consumer
+    reading bytes, e.g. a download feeding FFmpeg's stdin.
+
+    Writes block once `max_chunks` chunks are waiting, so a fast producer is held
+    back by a slow consumer instead of accumulating the payload in memory.
+
+    Attributes
+    ----------
+    max_chunks : int
+        The maximum number of chunks waiting to be read.
+    """
+    def __init__(self, max_chunks: int = PIPE_MAX_CHUNKS) -> None:
+        self.max_chunks = max_chunks
+        self._queue: queue.Queue = queue.Queue(maxsize=max_chunks)
+        self._pending = memoryview(b"")
+        self._eof = False
+        self._aborted = threading.Event()
+        # Wake the asynchronous writers waiting for room, which the queue cannot reach
+        self._wakers: list[Callable[[], None]] = []
+        self._wakers_lock = threading.Lock()
+
+    def _put(self, item: object) -> None:
+        while True:
+            if self._aborted.is_set():
+                raise BrokenPipeError("The reading end of the pipe was closed")
+            try:
+                self._queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, chunk: bytes) -> int:
+        """
+        Queues a chunk, blocking while the pipe is full.
+
+        Raises
+        ------
+        BrokenPipeError
+            If the reader aborted the pipe.
+        """
+        if chunk:
+            self._put(bytes(chunk))
+        return len(chunk)
+
+    async def _put_async(self, item: object) -> None:
+        loop = asyncio.get_running_loop()
+        room = asyncio.Event()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(room.set)
+
+        with self._wakers_lock:
+            self._wakers.append(wake)
+        try:
+            while True:
+                if self._aborted.is_set():
+                    raise BrokenPipeError("The reading end of the pipe was closed")
+                # Cleared before trying, so a chunk read in between still wakes the wait
+                room.clear()
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    await room.wait()
+        finally:
+            with self._wakers_lock:
+                self._wakers.remove(wake)
+
+    def _wake_writers(self) -> None:
+        with self._wakers_lock:
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake()
+
+    async def write_async(self, chunk: bytes) -> int:
+        """Queues a chunk like `write`, waiting without blocking the event loop while the pipe is full."""
+        if chunk:
+            await self._put_async(bytes(chunk))
+        return len(chunk)
+
+    def close(self) -> None:
+        """Signals the end of the data to the reader."""
+        try:
+            self._put(_EOF)
+        except BrokenPipeError:
+            pass
+
+    async def close_async(self) -> None:
+        """Signals the end of the data like `close`, without blocking the event loop."""
+        try:
+            await self._put_async(_EOF)
+        except BrokenPipeError:
+            pass
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Reads up to `size` bytes, blocking until data is available.
+        Returns an empty bytes object at the end of the stream.
+        """
+        if not self._pending:
+            if self._eof:
+                return b""
+            item = self._queue.get()
+            self._wake_writers()
+            if item is _EOF:
+                self._eof = True
+                return b""
+            self._pending = memoryview(item)
+        if size < 0 or size >= len(self._pending):
+            data, self._pending = self._pending, memoryview(b"")
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data.tobytes()
+
+    def abort(self) -> None:
+        """
+        Closes the reading end, making any blocked or later write fail, and ends the
+        data of a reader still waiting, e.g. FFmpeg when its input was cancelled.
+        """
+        self._aborted.set()
+        self._wake_writers()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            self._queue.put_nowait(_EOF)
+        except queue.Full:
+            pass
+
@@ -0,0 +1,141 @@
+import logging
+import shlex
+from dataclasses import dataclass, field
+from typing import Optional
+from .constants import TRANSCODE_SLOTS, TRANSCODE_VIDEO_THREADS
+from ..models.format import Format
+from ..models.video_info import StreamInfo
+
+logger = logging.getLogger(__name__)
+
+FFmpegOptions = dict[str, Optional[str | list[str]]]
+
+
+def parse_ffmpeg_args(args: str) -> FFmpegOptions:
+    """Turns a command line fragment such as `-c:v libx264 -c:a aac` into FFmpeg options."""
+    options: FFmpegOptions = {}
+    tokens = shlex.split(args)
+    for index, token in enumerate(tokens):
+        if not token.startswith("-"):
+            continue
+        value = tokens[index + 1] if index + 1 < len(tokens) and not tokens[index + 1].startswith("-") else None
+        options[token[1:]] = value
+    return options
+
+
+def _track_kind(option: str) -> Optional[str]:
+    """The kind of track an option applies to, from its stream specifier: `c:v` gives `v`."""
+    _, _, specifier = option.partition(":")
+    return specifier[:1] or None
+
+
+@dataclass
+class TrackPlan:
+    """What happens to one track of the source: `kind` is `v` or `a`, as in FFmpeg's stream specifiers."""
+    kind: str
+    codec: str
+    copy: bool
+
+
+@dataclass
+class ConversionPlan:
+    """
+    How a source is turned into a format, decided per track: tracks whose codec
+    the format can hold are copied as they are, the others are encoded with the
+    format's FFmpeg arguments.
+
+    Attributes
+    ----------
+    format : Format
+        The output format.
+    tracks : list[TrackPlan]
+        The tracks kept in the output.
+    drop_video : bool
+        Whether the source has a video track the format cannot hold.
+    """
+    format: Format
+    tracks: list[TrackPlan] = field(default_factory=list)
+    drop_video: bool = False
+
+    @property
+    def is_remux(self) -> bool:
+        """Whether every track is copied, which only rewrites the container."""
+        return bool(self.tracks) and all(track.copy for track in self.tracks)
+
+    @property
+    def encodes_video(self) -> bool:
+        """Whether a video track is encoded again, by far the costliest step of a conversion."""
+        return any(track.kind == "v" and not track.copy for track in self.tracks)
+
+    @property
+    def threads(self) -> int:
+        """The CPU threads the conversion keeps busy: none for a remux, one per audio encode."""
+        if self.encodes_video:
+            return min(TRANSCODE_VIDEO_THREADS, TRANSCODE_SLOTS)
+        return 0 if self.is_remux else 1
+
+    @property
+    def video_tracks(self) -> int:
+        """The video tracks of the output, assumed to be one for a video format when the source's codecs are unknown."""
+        if not self.tracks:
+            return 0 if self.format.audio_only else 1
+        return sum(track.kind == "v" for track in self.tracks)
+
+    def ffmpeg_options(self) -> FFmpegOptions:
+        """The output options implementing the plan."""
+        encoder = parse_ffmpeg_args(self.format.ffmpeg_args)
+        copied = {track.kind for track in self.tracks if track.copy}
+        options: FFmpegOptions = {}
+        for option, value in encoder.items():
+            kind = _track_kind(option)
+            if kind is None and self.is_remux:
+                continue
+            if kind in copied or (kind == "v" and self.drop_video):
+                continue
+            options[option] = value
+        for kind in sorted(copied):
+            options[f"c:{kind}"] = "copy"
+        if self.drop_video:
+            options["vn"] = None
+        if self.threads > 1:
+            # Encoders default to every core, which oversubscribes them when several encodes run
+            options["threads"] = str(self.threads)
+        return options
+
+    def track_options(self, kind: str) -> FFmpegOptions:
+        """
+        The options of the plan for the `kind` tracks alone, `v` or `a`, for runs writing
+        the video and the audio separately. Options applying to every track go with the video.
+        """
+        return {
+            option: value for option, value in self.ffmpeg_options().items()
+            if option != "vn" and (_track_kind(option) == kind or (_track_kind(option) is None and kind == "v"))
+        }
+
+    def __str__(self) -> str:
+        steps = [f"{track.kind}:{track.codec} {'copy' if track.copy else 'transcode'}" for track in self.tracks]
+        if self.drop_video:
+            steps.append("drop video")
+        return ", ".join(steps) or "transcode"
+
+
+def plan_conversion(streams: list[StreamInfo], file_format: Format) -> ConversionPlan:
+    """
+    Plans the conversion of `streams` to `file_format`.
+
+    The codecs come from the manifest YouTube sends along with the streams, the same
+    information a probe of the downloaded file would give, without running one.
+    """
+    plan = ConversionPlan(file_format)
+    for stream in streams:
+        for kind, codec in (("v", stream.video_codec), ("a", stream.audio_codec)):
+            if codec is None:
+                continue
+            if kind == "v" and file_format.audio_only:
+                plan.drop_video = True
+                continue
+            # Manifest codecs carry a profile after the name, such as avc1.640028
+            name = codec.split(".")[0]
+            plan.tracks.append(TrackPlan(kind, name, name in file_format.copy_codecs))
+    logger.info("Conversion to %s: %s", file_format.name, plan)
+    return plan
@@ -0,0 +1,98 @@
+import collections
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from .constants import PROGRESS_MAX_RATE, PROGRESS_WINDOW
+from ..models.job import DownloadJob, JobProgress, JobState
+
+
+class ProgressTracker:
+    """
+    Turns the raw progress of a job into `JobProgress` reports, coalesced to at
+    most `max_rate` reports per second however often it is updated.
+
+    The speed and ETA are computed over the last `window` seconds, so they follow
+    changes of throughput without jumping around with every chunk.
+    """
+    def __init__(
+            self,
+            on_update: Callable[[JobProgress], None],
+            max_rate: float = PROGRESS_MAX_RATE,
+            window: float = PROGRESS_WINDOW
+            ) -> None:
+        self._on_update = on_update
+        self._interval = 1 / max_rate
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples: collections.deque[tuple[float, float]] = collections.deque()
+        self._in_bytes = True
+        self._last_report = 0.0
+
+    def reset(self, in_bytes: bool = True) -> None:
+        """
+        Starts a new step, reporting 0%.
+
+        Parameters
+        ----------
+        in_bytes : bool
+            Whether the step counts bytes, in which case the speed and the remaining
+            bytes are reported, or another unit such as seconds of media.
+        """
+        with self._lock:
+            self._samples.clear()
+            self._in_bytes = in_bytes
+            self._last_report = time.monotonic()
+        self._on_update(JobProgress(0))
+
+    def update(self, done: float, total: float) -> None:
+        """Records that `done` out of `total` units are processed, reporting it unless a report was made too recently."""
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, done))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= self._window:
+                self._samples.popleft()
+            finished = done >= total
+            if not finished and now - self._last_report < self._interval:
+                return
+            self._last_report = now
+            start_time, start_done = self._samples[0]
+            elapsed = now - start_time
+            rate = (done - start_done) / elapsed if elapsed > 0 else 0.0
+            in_bytes = self._in_bytes
+        remaining = max(total - done, 0)
+        self._on_update(JobProgress(
+            progress=int(done / total * 100) if total else 0,
+            speed=rate if in_bytes else 0.0,
+            eta=remaining / rate if rate > 0 else None,
+            remaining=int(remaining) if in_bytes else 0
+        ))
+
+
+def overall_progress(jobs: Iterable[DownloadJob]) -> tuple[int, float, Optional[float]]:
+    """
+    Sums up the downloading jobs.
+
+    Returns
+    -------
+    tuple[int, float, Optional[float]]
+        The number of downloading jobs, their combined speed in bytes per second,
+        and the time left until they are all downloaded, if it can be estimated.
+    """
+    downloading = [job for job in jobs if job.state is JobState.DOWNLOADING]
+    speed = sum(job.speed for job in downloading)
+    remaining = sum(job.remaining for job in downloading)
+    return len(downloading), speed, remaining / speed if speed > 0 else None
+
+
+def format_speed(bytes_per_second: float) -> str:
+    for unit in ("B/s", "KB/s", "MB/s"):
+        if bytes_per_second < 1024:
+            return f"{bytes_per_second:.1f} {unit}"
+        bytes_per_second /= 1024
+    return f"{bytes_per_second:.1f} GB/s"
+
+
+def format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
@@ -0,0 +1,149 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Optional
+from pytubefix import YouTube
+from pytubefix.exceptions import RegexMatchError
+from pytubefix.extract import video_id as extract_video_id
+from .cache import VideoCache
+from .constants import CACHE_DIR, METADATA_PREFETCH, STREAM_URL_MARGIN
+from ..models.video_info import StreamInfo, VideoInfo
+
+
+def resolve_video(url: str) -> VideoInfo:
+    """Looks up the metadata and stream manifest of a video with pytubefix."""
+    video = YouTube(url)
+    return VideoInfo(
+        video_id=video.video_id,
+        title=video.title,
+        author=video.author,
+        length=video.length,
+        description=video.description or "",
+        thumbnail_url=video.thumbnail_url,
+        streams=[
+            StreamInfo(
+                itag=stream.itag,
+                url=stream.url,
+                mime_type=stream.mime_type,
+                is_progressive=stream.is_progressive,
+                video_codec=stream.video_codec,
+                audio_codec=stream.audio_codec,
+                resolution=stream.resolution,
+                abr=stream.abr,
+                bitrate=stream.bitrate,
+                # The manifest's content length, or a HEAD request for the streams without one
+                filesize=stream.filesize
+            )
+            for stream in video.streams
+        ]
+    )
+
+
+def video_id_of(url: str) -> str:
+    """Returns the video id of a URL, or the URL itself if it has none."""
+    try:
+        return extract_video_id(url)
+    except RegexMatchError:
+        return url
+
+
+class MetadataResolver:
+    """
+    Resolves videos through a shared `VideoCache`, so the preview and the download
+    of a video cost a single lookup. Lookups run on a small thread pool and
+    concurrent requests for the same video share one lookup, which lets queued
+    videos be resolved ahead of their download.
+
+    A cached video whose stream URLs are about to expire is looked up again
+    before it is handed to a download.
+    """
+    def __init__(
+            self,
+            cache: Optional[VideoCache] = None,
+            max_workers: int = METADATA_PREFETCH,
+            url_margin: float = STREAM_URL_MARGIN
+            ) -> None:
+        self.cache = cache if cache is not None else VideoCache()
+        self.url_margin = url_margin
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metadata")
+        self._pending: dict[str, Future[VideoInfo]] = {}
+        # Reentrant since a lookup finishing early runs its done callback while the lock is held
+        self._lock = threading.RLock()
+
+    def _cached(self, video_id: str, streams: bool) -> Optional[VideoInfo]:
+        info = self.cache.get(video_id)
+        if info is None or (streams and info.streams_expired(self.url_margin)):
+            return None
+        return info
+
+    def _lookup(self, url: str) -> VideoInfo:
+        info = resolve_video(url)
+        self.cache.put(info)
+        return info
+
+    def _fetch(self, url: str, video_id: str) -> Future[VideoInfo]:
+        with self._lock:
+            future = self._pending.get(video_id)
+            if future is None:
+                future = self._executor.submit(self._lookup, url)
+                self._pending[video_id] = future
+                future.add_done_callback(lambda _: self._forget(video_id))
+            return future
+
+    def _forget(self, video_id: str) -> None:
+        with self._lock:
+            self._pending.pop(video_id, None)
+
+    def prefetch(self, urls: Iterable[str]) -> None:
+        """Starts resolving the given URLs in the background, skipping those already cached or in flight."""
+        for url in urls:
+            video_id = video_id_of(url)
+            if self._cached(video_id, streams=True) is None:
+                self._fetch(url, video_id)
+
+    def fetch(self, url: str, streams: bool = True) -> Future[VideoInfo]:
+        """
+        Returns a future of the resolved video, done at once if it is cached.
+        Callers asking for the same video while it is looked up share the lookup.
+        """
+        video_id = video_id_of(url)
+        info = self._cached(video_id, streams)
+        if info is not None:
+            future: Future[VideoInfo] = Future()
+            future.set_result(info)
+            return future
+        return self._fetch(url, video_id)
+
+    def refresh(self, url: str) -> VideoInfo:
+        """
+        Looks the video up again whatever the cache holds, for stream URLs that were
+        rejected or throttled. Concurrent refreshes of the same video share one lookup.
+        """
+        return self._fetch(url, video_id_of(url)).result()
+
+    def resolve(self, url: str, streams: bool = True) -> VideoInfo:
+        """
+        Returns the resolved video, from the cache if possible.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the video.
+        streams : bool
+            Whether the stream URLs are going to be used, in which case a cached
+            video whose URLs are about to expire is looked up again.
+        """
+        return self.fetch(url, streams).result()
+
+
+_resolver: MetadataResolver | None = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> MetadataResolver:
+    """Returns the process-wide metadata resolver, backed by the on-disk video cache."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = MetadataResolver(VideoCache(directory=os.path.join(CACHE_DIR, "videos")))
+        return _resolver
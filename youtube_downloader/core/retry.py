@@ -0,0 +1,105 @@
+import asyncio
+import collections
+import random
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from .constants import RETRY_BACKOFF, RETRY_MAX_BACKOFF, THROTTLE_MIN_RATE, THROTTLE_WINDOW, TRANSFER_RETRIES
+from .http import HttpStatusError
+
+# Statuses worth asking again for, the others will not change on a retry
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class StreamThrottled(IOError):
+    """Raised when a stream keeps arriving slower than the throttling threshold."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed request may succeed if it is simply sent again."""
+    if isinstance(error, HttpStatusError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, (OSError, asyncio.IncompleteReadError, TimeoutError))
+
+
+@dataclass
+class TransferPolicy:
+    """
+    How transfers react to slow connections and failed requests.
+
+    Attributes
+    ----------
+    min_rate : Optional[float]
+        The bytes per second under which a connection is considered throttled, None to never consider it so.
+    window : float
+        The seconds of transfer the throughput of a connection is measured over.
+    retries : int
+        How many times a failing request is retried, as long as no byte arrives in between.
+    backoff : float
+        The longest wait before the first retry, doubled for each further one.
+    max_backoff : float
+        The longest wait before any retry.
+    """
+    min_rate: Optional[float] = THROTTLE_MIN_RATE
+    window: float = THROTTLE_WINDOW
+    retries: int = TRANSFER_RETRIES
+    backoff: float = RETRY_BACKOFF
+    max_backoff: float = RETRY_MAX_BACKOFF
+
+    def retry_delay(self, attempt: int) -> float:
+        """
+        Returns the seconds to wait before the retry following `attempt` failures in a row.
+
+        The delay is drawn at random up to an exponentially growing bound, so the
+        connections of a download that failed together do not retry together.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** max(0, attempt - 1)))
+
+    def stall_timeout(self, chunk_size: int) -> float:
+        """Returns the seconds a single chunk may take before the connection is considered stalled."""
+        return max(self.window, 2 * chunk_size / self.min_rate) if self.min_rate else self.window
+
+
+class ThroughputWindow:
+    """
+    A sliding estimate of the throughput of a connection, over its last `window`
+    seconds of transfer.
+
+    Only the time spent waiting for the network is counted, so a connection is
+    not blamed for the consumer falling behind or for the bandwidth cap.
+    """
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._samples: collections.deque[tuple[int, float]] = collections.deque()
+        self._size = 0
+        self._seconds = 0.0
+
+    def add(self, size: int, seconds: float) -> None:
+        """Records `size` bytes received after waiting `seconds` for them."""
+        self._samples.append((size, seconds))
+        self._size += size
+        self._seconds += seconds
+        while self._samples and self._seconds - self._samples[0][1] >= self.window:
+            size, seconds = self._samples.popleft()
+            self._size -= size
+            self._seconds -= seconds
+
+    @property
+    def rate(self) -> Optional[float]:
+        """The bytes per second over the window, None until the connection has lasted that long."""
+        if self._seconds < self.window:
+            return None
+        return self._size / self._seconds
+
+
+_policy: TransferPolicy | None = None
+_policy_lock = threading.Lock()
+
+
+def get_transfer_policy() -> TransferPolicy:
+    """Returns the process-wide transfer policy, which every download follows unless it is given its own."""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = TransferPolicy()
+        return _policy
@@ -0,0 +1,155 @@
+import heapq
+import itertools
+import threading
+from typing import Callable, Optional
+from .constants import INTERACTIVE_PRIORITY, MAX_CONCURRENT_DOWNLOADS, METADATA_PREFETCH
+from .transcoder import TranscodePool
+from ..models.job import DownloadJob, JobState
+
+
+class DownloadScheduler:
+    """
+    Queues download jobs by priority and starts them while keeping at most
+    `max_concurrent` of them on the network. Interactive jobs, of
+    `INTERACTIVE_PRIORITY` or above, start at once even when every slot is taken.
+
+    A job only holds a network slot while it is downloading. Once it moves on to
+    converting, or finishes, the next queued job is started, so the link stays
+    busy without running so many transfers that they only split the bandwidth.
+    Downloads are also held back while the `TranscodePool` has a backlog, so the
+    files waiting for the CPU stay bounded, and resume as it drains.
+
+    Attributes
+    ----------
+    max_concurrent : int
+        The maximum number of jobs downloading at the same time.
+    jobs : list[DownloadJob]
+        Every submitted job, in submission order.
+    """
+    def __init__(
+            self,
+            start_job: Callable[[DownloadJob], None],
+            max_concurrent: int = MAX_CONCURRENT_DOWNLOADS,
+            on_change: Optional[Callable[[DownloadJob], None]] = None,
+            prefetch: Optional[Callable[[list[DownloadJob]], None]] = None,
+            prefetch_count: int = METADATA_PREFETCH,
+            transcoder: Optional[TranscodePool] = None
+            ) -> None:
+        """
+        Parameters
+        ----------
+        start_job : Callable[[DownloadJob], None]
+            Starts the work of a job. It must not block, and the job must then be
+            reported back through `update` as it progresses.
+        max_concurrent : int
+            The maximum number of jobs downloading at the same time.
+        on_change : Optional[Callable[[DownloadJob], None]]
+            Called, possibly from another thread, every time a job changes.
+        prefetch : Optional[Callable[[list[DownloadJob]], None]]
+            Called with the next `prefetch_count` queued jobs whenever the queue
+            moves, so their metadata can be resolved while earlier jobs download.
+        prefetch_count : int
+            The number of upcoming jobs passed to `prefetch`.
+        transcoder : Optional[TranscodePool]
+            The pool converting the downloads, whose backlog holds back new jobs.
+        """
+        self.max_concurrent = max_concurrent
+        self.jobs: list[DownloadJob] = []
+        self._start_job = start_job
+        self._on_change = on_change
+        self._prefetch = prefetch
+        self.prefetch_count = prefetch_count
+        self._lock = threading.Lock()
+        self._queue: list[tuple[int, int, DownloadJob]] = []
+        self._order = itertools.count()
+        self._active: set[int] = set()
+        self._transcoder = transcoder
+        if transcoder is not None:
+            transcoder.add_listener(self._dispatch)
+
+    @property
+    def active_count(self) -> int:
+        """The number of jobs currently holding a network slot."""
+        with self._lock:
+            return len(self._active)
+
+    @property
+    def pending_count(self) -> int:
+        """The number of jobs that are not finished yet."""
+        with self._lock:
+            return sum(not job.state.is_finished for job in self.jobs)
+
+    def submit(self, job: DownloadJob) -> DownloadJob:
+        return self.submit_many([job])[0]
+
+    def submit_many(self, jobs: list[DownloadJob]) -> list[DownloadJob]:
+        with self._lock:
+            for job in jobs:
+                job.state = JobState.QUEUED
+                self.jobs.append(job)
+                heapq.heappush(self._queue, (-job.priority, next(self._order), job))
+        for job in jobs:
+            self._notify(job)
+        self._dispatch()
+        return jobs
+
+    def upcoming(self, count: int) -> list[DownloadJob]:
+        """Returns the next `count` queued jobs, in the order they will start."""
+        with self._lock:
+            return [job for _, _, job in heapq.nsmallest(count, self._queue) if job.state is JobState.QUEUED]
+
+    def update(self, job: DownloadJob, **changes: object) -> None:
+        """
+        Applies `changes` to the attributes of a job, releasing its network slot
+        once it is no longer downloading. Safe to call from any thread.
+        """
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            released = job.state is not JobState.DOWNLOADING and job.id in self._active
+            if released:
+                self._active.discard(job.id)
+        self._notify(job)
+        if released:
+            self._dispatch()
+
+    def set_priority(self, job: DownloadJob, priority: int) -> None:
+        """Changes the priority of a job that has not started yet."""
+        with self._lock:
+            if job.state is not JobState.QUEUED:
+                return
+            job.priority = priority
+            self._queue = [(-item.priority, order, item) for _, order, item in self._queue]
+            heapq.heapify(self._queue)
+        self._notify(job)
+
+    def set_max_concurrent(self, max_concurrent: int) -> None:
+        with self._lock:
+            self.max_concurrent = max_concurrent
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        started = []
+        with self._lock:
+            while self._queue and (
+                    self._queue[0][0] <= -INTERACTIVE_PRIORITY
+                    or len(self._active) < self.max_concurrent and not self._transcoder_backlogged()
+                    ):
+                _, _, job = heapq.heappop(self._queue)
+                if job.state is not JobState.QUEUED:
+                    continue
+                job.state = JobState.DOWNLOADING
+                self._active.add(job.id)
+                started.append(job)
+        for job in started:
+            self._notify(job)
+            self._start_job(job)
+        if self._prefetch is not None:
+            self._prefetch(self.upcoming(self.prefetch_count))
+
+    def _transcoder_backlogged(self) -> bool:
+        return self._transcoder is not None and self._transcoder.is_backlogged
+
+    def _notify(self, job: DownloadJob) -> None:
+        if self._on_change is not None:
+            self._on_change(job)
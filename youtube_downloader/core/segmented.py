@@ -0,0 +1,86 @@
+import csv
+import os
+from dataclasses import dataclass
+from .constants import SEGMENT_MIN_DURATION, SEGMENTS_PER_WORKER
+from .planner import FFmpegOptions
+
+# Container of the segments cut from the source, which holds any codec and keeps the timestamps as they are
+SEGMENT_FORMAT = "nut"
+
+
+@dataclass
+class Segment:
+    """
+    A piece of the video track of a source, cut at a keyframe so that it decodes on its own.
+
+    Attributes
+    ----------
+    path : str
+        The file holding the piece, its timestamps starting from zero.
+    start : float
+        The position of the piece in the source, in seconds.
+    end : float
+        The position of the end of the piece in the source, in seconds.
+    """
+    path: str
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def segment_duration(length: float, workers: int) -> float:
+    """
+    The seconds of video per segment for `workers` parallel encoders: several segments
+    each, so the encoders finishing early pick up the remaining ones.
+    """
+    return max(SEGMENT_MIN_DURATION, length / (max(1, workers) * SEGMENTS_PER_WORKER))
+
+
+def split_options(list_path: str, duration: float) -> FFmpegOptions:
+    """
+    The output options copying the video track of a source into segments of about
+    `duration` seconds, cut at the first keyframe after each multiple of it, and listing
+    them in a CSV file at `list_path`.
+    """
+    return {
+        "map": "0:v:0",
+        "c": "copy",
+        # Shifting the timestamps would put the first segment off by the reordering delay of B-frames
+        "avoid_negative_ts": "disabled",
+        "f": "segment",
+        "segment_time": f"{duration:.3f}",
+        "segment_format": SEGMENT_FORMAT,
+        "segment_list": list_path,
+        "segment_list_type": "csv",
+        "reset_timestamps": "1",
+    }
+
+
+def read_segments(list_path: str) -> list[Segment]:
+    """Reads the segments listed by a split, whose rows are the file name, start and end."""
+    directory = os.path.dirname(list_path)
+    with open(list_path, newline="", encoding="utf-8") as file:
+        return [
+            Segment(os.path.join(directory, name), float(start), float(end))
+            for name, start, end in csv.reader(file)
+        ]
+
+
+def _quote(path: str) -> str:
+    return "'" + path.replace("'", "'\\''") + "'"
+
+
+def concat_list(segments: list[Segment], encoded: list[str]) -> str:
+    """
+    Returns the concat demuxer script joining the `encoded` segments. Each gets the
+    duration of the piece of the source it was made from, so the joined track keeps
+    the timing of the source whatever the encoder does at the cuts.
+    """
+    lines = ["ffconcat version 1.0"]
+    for segment, path in zip(segments, encoded):
+        lines.append(f"file {_quote(path)}")
+        lines.append(f"duration {segment.duration:.6f}")
+    return "\n".join(lines) + "\n"
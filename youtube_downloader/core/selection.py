@@ -0,0 +1,121 @@
+from typing import Optional
+from .constants import AUDIO_MIN_BITRATE, MAX_VIDEO_HEIGHT
+from ..models.format import Format
+from ..models.video_info import StreamInfo, VideoInfo
+
+
+def _bitrate(stream: StreamInfo) -> int:
+    return stream.bitrate or 0
+
+
+def _codec_family(codec: Optional[str]) -> Optional[str]:
+    """Returns the codec without its profile and level, e.g. `avc1` for `avc1.640028`."""
+    return codec.split(".")[0] if codec else codec
+
+
+def _preferred(streams: list[StreamInfo], extension: Optional[str]) -> list[StreamInfo]:
+    """Narrows `streams` down to those in the `extension` container, unless there are none."""
+    matching = [stream for stream in streams if stream.extension == extension]
+    return matching or streams
+
+
+def select_audio_stream(
+        video: VideoInfo,
+        file_format: Format,
+        min_bitrate: Optional[int] = AUDIO_MIN_BITRATE
+        ) -> Optional[StreamInfo]:
+    """
+    Returns the audio-only stream to fetch for `file_format`, preferring its source container.
+
+    With a `min_bitrate` this is the smallest stream of at least that bitrate,
+    or the best one if none is that good. Without one it is the best stream.
+    """
+    candidates = [stream for stream in video.streams if stream.includes_audio and not stream.includes_video]
+    candidates = _preferred(candidates, file_format.source_extension)
+    if min_bitrate is not None:
+        suitable = [stream for stream in candidates if _bitrate(stream) >= min_bitrate]
+        if suitable:
+            return min(suitable, key=_bitrate)
+    return max(candidates, key=_bitrate, default=None)
+
+
+def select_video_stream(
+        video: VideoInfo,
+        file_format: Format,
+        max_height: int = MAX_VIDEO_HEIGHT
+        ) -> Optional[StreamInfo]:
+    """Returns the tallest video-only stream no taller than `max_height`, preferring the source container of `file_format`."""
+    candidates = [
+        stream for stream in video.streams
+        if stream.includes_video and not stream.includes_audio and 0 < stream.height <= max_height
+    ]
+    candidates = _preferred(candidates, file_format.source_extension)
+    return max(candidates, key=lambda stream: (stream.height, _bitrate(stream)), default=None)
+
+
+def select_streams(
+        video: VideoInfo,
+        file_format: Format,
+        adaptive: bool = True,
+        max_height: int = MAX_VIDEO_HEIGHT,
+        min_audio_bitrate: int = AUDIO_MIN_BITRATE
+        ) -> list[StreamInfo]:
+    """
+    Picks the streams to download for `file_format`, in the order they are given to FFmpeg.
+
+    Audio formats get a single audio-only stream, so no video track is downloaded
+    only to be thrown away. Video formats get an adaptive video stream and the best
+    audio stream, to be muxed together, since progressive streams stop at low
+    resolutions. A progressive stream is the fallback when the adaptive ones are
+    missing or `adaptive` is False.
+
+    Parameters
+    ----------
+    video : VideoInfo
+        The resolved video.
+    file_format : Format
+        The format the download is converted to.
+    adaptive : bool
+        Whether adaptive streams may be picked.
+    max_height : int
+        The height of the tallest video stream that may be picked.
+    min_audio_bitrate : int
+        The lowest bitrate of an audio-only stream picked for an audio format.
+
+    Raises
+    ------
+    ValueError
+        If the video has no stream that can be downloaded.
+    """
+    if adaptive and file_format.audio_only:
+        audio = select_audio_stream(video, file_format, min_audio_bitrate)
+        if audio is not None:
+            return [audio]
+    elif adaptive:
+        video_stream = select_video_stream(video, file_format, max_height)
+        audio = select_audio_stream(video, file_format, min_bitrate=None)
+        if video_stream is not None and audio is not None:
+            return [video_stream, audio]
+    progressive = video.find_stream(progressive=True, extension="mp4") or video.find_stream(progressive=True)
+    if progressive is None:
+        raise ValueError("No downloadable stream found for this video")
+    return [progressive]
+
+
+def equivalent_streams(video: VideoInfo, stream: StreamInfo) -> list[StreamInfo]:
+    """
+    Returns the other streams of the video that can stand in for `stream`: the same
+    container and kind of tracks, codecs and height, best bitrate first.
+
+    They are fetched from another itag when `stream` itself keeps being throttled.
+    """
+    def key(candidate: StreamInfo) -> tuple:
+        return (
+            candidate.extension,
+            candidate.is_progressive,
+            _codec_family(candidate.video_codec),
+            _codec_family(candidate.audio_codec),
+            candidate.height
+        )
+    matching = [candidate for candidate in video.streams if candidate.itag != stream.itag and key(candidate) == key(stream)]
+    return sorted(matching, key=_bitrate, reverse=True)
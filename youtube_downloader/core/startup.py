@@ -0,0 +1,75 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+STARTUP_PROFILE_FLAG = "--profile-startup"
+
+
+@dataclass
+class StartupPhase:
+    name: str
+    seconds: float
+    depth: int = 0
+
+
+class StartupProfile:
+    """
+    Times the phases of the start of the application, from its first import to
+    the first paint of the window, and the work deferred after it.
+
+    Phases nest: a phase timed inside another one on the same thread is shown indented
+    below it, the work deferred to a background thread is not nested in the GUI's phases.
+    Recording costs a few clock reads, so it is always on and only the report is optional.
+
+    Attributes
+    ----------
+    started : float
+        The `time.perf_counter` reading everything is measured from.
+    phases : list[StartupPhase]
+        The phases timed so far, in the order they started.
+    """
+    def __init__(self, started: Optional[float] = None) -> None:
+        self.started = started if started is not None else time.perf_counter()
+        self.phases: list[StartupPhase] = []
+        self.first_paint: Optional[float] = None
+        self._local = threading.local()
+
+    @property
+    def _depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    @_depth.setter
+    def _depth(self, depth: int) -> None:
+        self._local.depth = depth
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        record = StartupPhase(name, 0.0, self._depth)
+        self.phases.append(record)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record.seconds = time.perf_counter() - start
+            self._depth -= 1
+
+    def add(self, name: str, seconds: float) -> None:
+        """Records a phase timed elsewhere, such as an import measured before the profile existed."""
+        self.phases.append(StartupPhase(name, seconds, self._depth))
+
+    def mark_first_paint(self) -> None:
+        if self.first_paint is None:
+            self.first_paint = time.perf_counter() - self.started
+
+    def report(self) -> str:
+        width = max((len(phase.name) + 2 * phase.depth for phase in self.phases), default=0) + 2
+        lines = ["Startup profile:"]
+        for phase in self.phases:
+            label = "  " * phase.depth + phase.name
+            lines.append(f"  {label:<{width}}{phase.seconds * 1000:8.1f} ms")
+        if self.first_paint is not None:
+            lines.append(f"  {'first paint':<{width}}{self.first_paint * 1000:8.1f} ms after the first import")
+        return "\n".join(lines)
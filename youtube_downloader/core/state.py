@@ -1,21 +1,121 @@
-from PySide6.QtCore import QObject, Signal
+from typing import Any, Callable
+from PySide6.QtCore import QObject, Signal, QAbstractListModel, QModelIndex, QPersistentModelIndex, Qt
 from dataclasses import dataclass
+from .events import Event, EventBus, OverflowPolicy
+from .progress import format_eta, format_speed
+from .scheduler import DownloadScheduler
+from .transcoder import get_transcode_pool
+from ..models.job import DownloadJob, JobState
+
+
+class JobQueueModel(QAbstractListModel):
+    """A list model of the download jobs, in submission order."""
+    JobRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._jobs: list[DownloadJob] = []
+        self._rows: dict[int, int] = {}
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._jobs)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or index.row() >= len(self._jobs):
+            return None
+        job = self._jobs[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            formats = ", ".join(file_format.name for file_format in job.formats)
+            text = f"{job.title or job.url} [{formats}] - {job.state.value}"
+            if job.state in (JobState.DOWNLOADING, JobState.CONVERTING):
+                text += f" {job.progress}%"
+                if job.speed > 0:
+                    text += f" at {format_speed(job.speed)}"
+                if job.eta is not None:
+                    text += f", {format_eta(job.eta)} left"
+            elif job.state is JobState.FAILED and job.error:
+                text += f": {job.error}"
+            return text
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return job.url
+        if role == self.JobRole:
+            return job
+        return None
+
+    def update_job(self, job: DownloadJob) -> None:
+        """Adds the job if it is new, or refreshes its row."""
+        row = self._rows.get(job.id)
+        if row is None:
+            row = len(self._jobs)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._jobs.append(job)
+            self._rows[job.id] = row
+            self.endInsertRows()
+        else:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class GuiDispatcher(QObject):
+    """An event bus dispatcher running the functions it is given, from any thread, on the GUI thread."""
+    _posted = Signal(object)
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._posted.connect(self._run, Qt.ConnectionType.QueuedConnection)
+
+    def _run(self, function: Callable[[], None]) -> None:
+        function()
+
+    def __call__(self, function: Callable[[], None]) -> None:
+        self._posted.emit(function)
+
+
+def _prefetch(jobs: list[DownloadJob]) -> None:
+    # The resolver pulls in pytubefix, which is only imported once there is something to resolve
+    from .resolver import get_resolver
+    get_resolver().prefetch(job.url for job in jobs)
+
 
 @dataclass
 class AppState(QObject):
     path: str
-    url: str = ""
     format: str = "MP4"
-    is_downloading: bool = False
-    
+
     state_changed = Signal()
+    job_changed = Signal(DownloadJob)
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, start_job: Callable[[DownloadJob], None]):
         super().__init__()  # Call QObject's __init__
         self.path = path
-        self.url = ""
         self.format = "MP4"
-        self.is_downloading = False
+        self.queue = JobQueueModel(self)
+        self.events = EventBus()
+        # Jobs change on worker threads, the bus hands them over to the GUI thread, a burst
+        # of progress reports becoming a single update per job
+        self.events.subscribe(
+            "job_changed",
+            self._jobs_changed,
+            GuiDispatcher(self),
+            batch=True,
+            policy=OverflowPolicy.MERGE
+        )
+        self.scheduler = DownloadScheduler(
+            start_job,
+            on_change=lambda job: self.events.publish(Event("job_changed", {"job": job}, key=job.id)),
+            prefetch=_prefetch,
+            transcoder=get_transcode_pool()
+        )
+        self.job_changed.connect(self.queue.update_job)
+        self.job_changed.connect(self.state_changed)
+
+    def _jobs_changed(self, batch: list[dict]) -> None:
+        for data in batch:
+            self.job_changed.emit(data["job"])
+
+    @property
+    def is_downloading(self) -> bool:
+        return self.scheduler.pending_count > 0
 
     def update(self, **kwargs):
         changed = False
@@ -24,4 +124,4 @@ class AppState(QObject):
                 setattr(self, key, value)
                 changed = True
         if changed:
-            self.state_changed.emit()
\ No newline at end of file
+            self.state_changed.emit()
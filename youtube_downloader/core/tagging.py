@@ -0,0 +1,189 @@
+import asyncio
+import base64
+import logging
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+from .engine import get_engine
+from .planner import FFmpegOptions
+from .thumbnails import IMAGE_EXTENSIONS, get_thumbnail_cache, image_type, original_key
+from ..models.format import Format
+from ..models.video_info import VideoInfo
+
+logger = logging.getLogger(__name__)
+
+# Image types embedded as they are, attached pictures of other types are encoded to JPEG and picture comments skipped
+COVER_COPY_TYPES = ("image/jpeg", "image/png")
+# The FLAC picture type of a front cover
+FRONT_COVER = 3
+
+
+def image_size(data: bytes) -> tuple[int, int]:
+    """Returns the width and height of a PNG or JPEG image, 0 by 0 if they cannot be read."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    offset = 2
+    while data.startswith(b"\xff\xd8") and offset + 9 <= len(data) and data[offset] == 0xFF:
+        marker = data[offset + 1]
+        length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+        # The start of frame markers, except the DHT, JPG and DAC ones sharing their range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+    return 0, 0
+
+
+def picture_block(data: bytes, mime_type: str) -> bytes:
+    """Encodes an image as a FLAC picture block, the way Vorbis comments carry cover art."""
+    width, height = image_size(data)
+    mime = mime_type.encode("ascii")
+    return (
+        struct.pack(">II", FRONT_COVER, len(mime)) + mime
+        + struct.pack(">I", 0)  # No description
+        + struct.pack(">IIIII", width, height, 24, 0, len(data)) + data
+    )
+
+
+def _escape(value: str) -> str:
+    for character in "\\=;#\n":
+        value = value.replace(character, "\\" + character)
+    return value
+
+
+@dataclass
+class MediaTags:
+    """
+    The tags written to the outputs of a video, and the cover art attached to them.
+
+    Attributes
+    ----------
+    title : str
+        The title of the video.
+    artist : str
+        The channel that uploaded the video.
+    comment : str
+        The description of the video.
+    cover : Optional[bytes]
+        The encoded thumbnail of the video, None if it has none.
+    """
+    title: str
+    artist: str
+    comment: str = ""
+    cover: Optional[bytes] = None
+
+    @classmethod
+    def of(cls, video: VideoInfo, cover: Optional[bytes] = None) -> "MediaTags":
+        return cls(video.title, video.author, video.description, cover)
+
+    @property
+    def cover_type(self) -> Optional[str]:
+        return image_type(self.cover) if self.cover else None
+
+    def ffmetadata(self, picture: bool = False) -> str:
+        """
+        Returns the tags as an FFmpeg metadata file, with the cover as a Vorbis picture
+        comment if `picture` is True. Being read from a file, the description need not
+        fit on the command line.
+        """
+        lines = [";FFMETADATA1"]
+        for key, value in (("title", self.title), ("artist", self.artist), ("comment", self.comment)):
+            if value:
+                lines.append(f"{key}={_escape(value)}")
+        if picture and self.cover and self.cover_type in COVER_COPY_TYPES:
+            encoded = base64.b64encode(picture_block(self.cover, self.cover_type)).decode("ascii")  # type: ignore[arg-type]
+            lines.append(f"METADATA_BLOCK_PICTURE={encoded}")
+        return "\n".join(lines) + "\n"
+
+
+class TagFiles:
+    """
+    Writes the files FFmpeg reads the tags and cover art from to a temporary
+    directory, as the outputs need them, and removes them on exit.
+
+    They are read by the FFmpeg run that writes the outputs, so tagging an output
+    costs no pass over it besides the one making it.
+    """
+    def __init__(self, tags: MediaTags) -> None:
+        self.tags = tags
+        self._directory: Optional[tempfile.TemporaryDirectory[str]] = None
+        self._inputs: dict[str, int] = {}
+
+    def __enter__(self) -> "TagFiles":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Removes the files written so far."""
+        if self._directory is not None:
+            self._directory.cleanup()
+            self._directory = None
+
+    def _input(self, name: str, content: str | bytes, inputs: list[str]) -> int:
+        """Writes a file once and returns its index among the inputs of FFmpeg, adding it to them if needed."""
+        if name not in self._inputs:
+            if self._directory is None:
+                self._directory = tempfile.TemporaryDirectory(prefix="youtube_downloader-")
+            path = os.path.join(self._directory.name, name)
+            with open(path, "wb") as file:
+                file.write(content.encode("utf-8") if isinstance(content, str) else content)
+            self._inputs[name] = len(inputs)
+            inputs.append(path)
+        return self._inputs[name]
+
+    def apply(self, options: FFmpegOptions, file_format: Format, video_tracks: int, inputs: list[str]) -> None:
+        """
+        Adds the options tagging an output in `file_format` to its `options`, whose `map`
+        must already list the tracks of the source, and the files they read to `inputs`.
+
+        Parameters
+        ----------
+        options : FFmpegOptions
+            The options of the output, changed in place.
+        file_format : Format
+            The format of the output, whose `cover_art` tells how it holds a picture.
+        video_tracks : int
+            The video tracks the output gets from the source, the cover comes after them.
+        inputs : list[str]
+            The inputs of the FFmpeg run, in order.
+        """
+        cover_type = self.tags.cover_type
+        picture = file_format.cover_art == "picture_block" and cover_type in COVER_COPY_TYPES
+        metadata = self._input(
+            "tags-picture.ffmeta" if picture else "tags.ffmeta", self.tags.ffmetadata(picture), inputs
+        )
+        options["map_metadata"] = str(metadata)
+        if file_format.cover_art == "attached_pic" and self.tags.cover and cover_type is not None:
+            cover = self._input(f"cover.{IMAGE_EXTENSIONS[cover_type]}", self.tags.cover, inputs)
+            maps = options.get("map") or []
+            options["map"] = [*([maps] if isinstance(maps, str) else maps), f"{cover}:v"]
+            options[f"c:v:{video_tracks}"] = "copy" if cover_type in COVER_COPY_TYPES else "mjpeg"
+            options[f"disposition:v:{video_tracks}"] = "attached_pic"
+
+
+async def load_cover(video: VideoInfo) -> Optional[bytes]:
+    """
+    Returns the original thumbnail of a video to use as cover art, from the thumbnail
+    cache if its preview or an earlier download fetched it, never the copy scaled for
+    display, so the artwork does not depend on what was previewed. None if it has none
+    or it cannot be fetched, cover art is not worth failing a download over.
+    """
+    try:
+        cache = get_thumbnail_cache()
+        key = original_key(video.video_id)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+        if not video.thumbnail_url:
+            return None
+        async with get_engine().http.get(video.thumbnail_url) as body:
+            content = b"".join([chunk async for chunk in body])
+        await asyncio.to_thread(cache.put, key, content)
+        return content
+    except Exception:
+        logger.warning("Could not fetch the thumbnail of %s", video.video_id, exc_info=True)
+        return None
@@ -0,0 +1,144 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from .constants import CACHE_DIR, THUMBNAIL_CACHE_SIZE, THUMBNAIL_MEMORY_CACHE_SIZE
+from .files import atomic_write
+
+# File extensions of the image types, which the entries of the disk tier are named after
+IMAGE_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+# File extension of an entry that is not a known image
+UNKNOWN_EXTENSION = "bin"
+# File extensions an entry may be stored under
+ENTRY_EXTENSIONS = (*IMAGE_EXTENSIONS.values(), UNKNOWN_EXTENSION)
+
+
+def image_type(data: bytes) -> Optional[str]:
+    """Returns the MIME type of an encoded image from its signature, None if it is not a known one."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def original_key(video_id: str) -> str:
+    """The key of the original thumbnail of a video, as opposed to the one scaled for display."""
+    return f"{video_id}.original"
+
+
+class ThumbnailCache:
+    """
+    A two-tier cache of encoded thumbnails keyed by video id: an LRU in memory
+    backed by a directory on disk, each tier evicting its oldest entries once it
+    holds more than its size budget in bytes.
+
+    Thumbnails are stored already scaled for display, so a hit only costs the
+    decoding of a small image. The original images, embedded as cover art, are
+    kept as they were fetched under `original_key`. Files on disk are named after
+    the type of their image, whatever the key.
+
+    Attributes
+    ----------
+    directory : Optional[str]
+        The directory of the disk tier, or None to keep the cache in memory only.
+    max_bytes : int
+        The size budget of the disk tier.
+    max_memory_bytes : int
+        The size budget of the memory tier.
+    """
+    def __init__(
+            self,
+            directory: Optional[str] = None,
+            max_bytes: int = THUMBNAIL_CACHE_SIZE,
+            max_memory_bytes: int = THUMBNAIL_MEMORY_CACHE_SIZE
+            ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, video_id: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(video_id)
+            if data is not None:
+                self._entries.move_to_end(video_id)
+                return data
+        if self.directory is None:
+            return None
+        for extension in ENTRY_EXTENSIONS:
+            path = self._path(video_id, extension)
+            try:
+                with open(path, "rb") as file:
+                    data = file.read()
+                os.utime(path)  # Keeps recently used thumbnails out of the eviction
+            except OSError:
+                continue
+            self._remember(video_id, data)
+            return data
+        return None
+
+    def put(self, video_id: str, data: bytes) -> None:
+        self._remember(video_id, data)
+        if self.directory is None:
+            return
+        image = image_type(data)
+        extension = IMAGE_EXTENSIONS[image] if image is not None else UNKNOWN_EXTENSION
+        try:
+            with atomic_write(self._path(video_id, extension)) as file:
+                file.write(data)
+            # An earlier entry of another type would shadow this one
+            for other in ENTRY_EXTENSIONS:
+                if other != extension and os.path.exists(self._path(video_id, other)):
+                    os.remove(self._path(video_id, other))
+            self._prune()
+        except OSError:
+            pass  # The disk tier is an optimization, never fail a preview over it
+
+    def _path(self, video_id: str, extension: str) -> str:
+        return os.path.join(self.directory or "", f"{video_id}.{extension}")
+
+    def _remember(self, video_id: str, data: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop(video_id, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._entries[video_id] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _prune(self) -> None:
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.rsplit(".", 1)[-1] in ENTRY_EXTENSIONS]
+        total = sum(entry.stat().st_size for entry in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                total -= entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+_cache: ThumbnailCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Returns the process-wide thumbnail cache, stored under `CACHE_DIR`."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache(os.path.join(CACHE_DIR, "thumbnails"))
+        return _cache
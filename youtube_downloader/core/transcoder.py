@@ -0,0 +1,150 @@
+import collections
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from .constants import TRANSCODE_BACKLOG, TRANSCODE_SLOTS
+
+
+class TranscodePool:
+    """
+    Shares the CPU cores between FFmpeg encodes, separately from the network slots
+    of the `DownloadScheduler`.
+
+    Each encode reserves as many slots as the threads it runs and waits, in order
+    of arrival, until they are free. Remuxes only copy data and need no slot.
+    Encodes waiting for their turn form the backlog, which the scheduler checks
+    before starting new downloads so finished files do not pile up.
+
+    Attributes
+    ----------
+    slots : int
+        The number of CPU threads shared by the encodes, normally one per core.
+    max_backlog : int
+        The number of waiting encodes from which the pool reports itself backlogged.
+    """
+    def __init__(self, slots: int = TRANSCODE_SLOTS, max_backlog: int = TRANSCODE_BACKLOG) -> None:
+        self.slots = slots
+        self.max_backlog = max_backlog
+        self._available = slots
+        self._waiting: collections.deque[int] = collections.deque()
+        self._tickets = itertools.count()
+        self._changed = threading.Condition()
+        self._listeners: list[Callable[[], None]] = []
+        # Wake the asynchronous waiters, which the condition cannot reach
+        self._wakers: list[Callable[[], None]] = []
+
+    @property
+    def available(self) -> int:
+        with self._changed:
+            return self._available
+
+    @property
+    def backlog(self) -> int:
+        """The number of encodes waiting for slots."""
+        with self._changed:
+            return len(self._waiting)
+
+    @property
+    def is_backlogged(self) -> bool:
+        return self.backlog >= self.max_backlog
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Registers a function called, outside any lock, whenever slots are released or the backlog shrinks."""
+        self._listeners.append(listener)
+
+    def try_acquire(self, count: int) -> bool:
+        """Reserves `count` slots if they are free right now and nobody is waiting for them."""
+        count = min(count, self.slots)
+        with self._changed:
+            if self._waiting or self._available < count:
+                return False
+            self._available -= count
+            return True
+
+    def acquire(self, count: int) -> None:
+        """Reserves `count` slots, waiting behind the encodes that asked first."""
+        count = min(count, self.slots)
+        if count <= 0:
+            return
+        with self._changed:
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            try:
+                self._changed.wait_for(lambda: self._waiting[0] == ticket and self._available >= count)
+            finally:
+                self._waiting.remove(ticket)
+                self._changed.notify_all()
+            self._available -= count
+        self._notify()
+
+    async def acquire_async(self, count: int) -> None:
+        """Reserves `count` slots like `acquire`, waiting without blocking the event loop."""
+        # The GUI imports this module on startup, asyncio is only needed once a download runs
+        import asyncio
+        count = min(count, self.slots)
+        if count <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(changed.set)
+
+        with self._changed:
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            self._wakers.append(wake)
+        try:
+            while True:
+                with self._changed:
+                    if self._waiting[0] == ticket and self._available >= count:
+                        self._available -= count
+                        break
+                    changed.clear()
+                await changed.wait()
+        finally:
+            with self._changed:
+                self._waiting.remove(ticket)
+                self._wakers.remove(wake)
+                self._changed.notify_all()
+            self._notify()
+
+    def release(self, count: int) -> None:
+        count = min(count, self.slots)
+        if count <= 0:
+            return
+        with self._changed:
+            self._available += count
+            self._changed.notify_all()
+        self._notify()
+
+    def _notify(self) -> None:
+        with self._changed:
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake()
+        for listener in self._listeners:
+            listener()
+
+    @contextmanager
+    def reserve(self, count: int) -> Iterator[None]:
+        """Holds `count` slots for the duration of the block."""
+        self.acquire(count)
+        try:
+            yield
+        finally:
+            self.release(count)
+
+
+_pool: TranscodePool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_transcode_pool() -> TranscodePool:
+    """Returns the process-wide transcode pool, sized to the CPU cores."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscodePool()
+        return _pool
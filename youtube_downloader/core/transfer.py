@@ -0,0 +1,586 @@
+import asyncio
+import collections
+import dataclasses
+import hashlib
+import os
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Optional, TypeVar
+from .bandwidth import BandwidthShare, get_bandwidth_limiter
+from .constants import DOWNLOAD_CHUNK_SIZE, DOWNLOAD_CONNECTIONS, DOWNLOAD_RANGE_SIZE, DOWNLOAD_SEGMENT_SIZE
+from .engine import get_engine
+from .http import HttpStatusError
+from .manifest import MANIFEST_SUFFIX, PARTIAL_SUFFIX, CompletedRange, DownloadManifest, stream_source
+from .retry import StreamThrottled, ThroughputWindow, TransferPolicy, get_transfer_policy, is_transient
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def iter_chunks(
+        url: str,
+        end: int,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        start: int = 0,
+        share: Optional[BandwidthShare] = None,
+        policy: Optional[TransferPolicy] = None,
+        refresh: Optional[Callable[[str], Awaitable[str]]] = None,
+        raise_throttled: bool = False
+        ) -> AsyncIterator[bytes]:
+    """
+    Streams the content of a YouTube stream URL chunk by chunk, over the kept-alive
+    connections of the download engine.
+
+    The stream is requested in `DOWNLOAD_RANGE_SIZE` ranges and each response is
+    read `chunk_size` bytes at a time, so at most one chunk is held in memory.
+    Every chunk is charged to the bandwidth limiter before it is yielded.
+
+    The throughput of each response is measured over the policy's window. When it
+    falls under `min_rate`, or no data arrives for that long, the range is first
+    requested again from the current offset, which is repeated for as long as the
+    new requests average above `min_rate`, then from a refreshed URL. If the stream
+    is still throttled after that, `StreamThrottled` is raised, or the slow transfer
+    carries on if `raise_throttled` is False. A failed request is retried
+    after a jittered backoff when its error is transient, and a URL rejected with
+    a 403 is refreshed.
+
+    Parameters
+    ----------
+    url : str
+        The signed URL of the stream.
+    end : int
+        The offset at which to stop, exclusive. Pass the stream size to read it until the end.
+    chunk_size : int
+        The maximum size of a yielded chunk.
+    start : int
+        The offset of the first byte to read.
+    share : Optional[BandwidthShare]
+        The share of the bandwidth the chunks are charged to, the limiter's default share if None.
+    policy : Optional[TransferPolicy]
+        The throttling threshold and retries, the process-wide policy if None.
+    refresh : Optional[Callable[[str], Awaitable[str]]]
+        Called with a URL that stopped working or keeps being throttled, returns a fresh URL of the same stream.
+    raise_throttled : bool
+        Whether a stream still throttled after being requested again raises, so the caller can switch to another one.
+
+    Yields
+    ------
+    bytes
+        The next chunk of the stream.
+
+    Raises
+    ------
+    StreamThrottled
+        If the stream stays throttled and `raise_throttled` is True.
+    """
+    http = get_engine().http
+    share = share if share is not None else get_bandwidth_limiter().default_share
+    policy = policy if policy is not None else get_transfer_policy()
+    min_rate = policy.min_rate
+    downloaded = start
+    failures = 0
+    throttled = 0
+    while downloaded < end:
+        stop = min(downloaded + DOWNLOAD_RANGE_SIZE, end) - 1
+        range_start = downloaded
+        meter = ThroughputWindow(policy.window)
+        waited = 0.0
+        try:
+            async with http.get(f"{url}&range={range_start}-{stop}", chunk_size) as body:
+                chunks = aiter(body)
+                while True:
+                    read_start = time.perf_counter()
+                    stall = asyncio.timeout(policy.stall_timeout(chunk_size) if min_rate else None)
+                    try:
+                        async with stall:
+                            chunk = await anext(chunks)
+                    except StopAsyncIteration:
+                        break
+                    except TimeoutError:
+                        if not stall.expired():
+                            raise
+                        raise StreamThrottled(f"No data received for range {range_start}-{stop}")
+                    read_time = time.perf_counter() - read_start
+                    meter.add(len(chunk), read_time)
+                    waited += read_time
+                    chunk = chunk[:end - downloaded]
+                    downloaded += len(chunk)
+                    failures = 0
+                    await share.consume_async(len(chunk))
+                    yield chunk
+                    rate = meter.rate
+                    if min_rate and rate is not None and rate < min_rate:
+                        raise StreamThrottled(f"Throttled to {rate / 1024:.0f} KB/s")
+            if downloaded == range_start:
+                raise IOError(f"Empty response for range {range_start}-{stop}")
+            throttled = 0
+        except StreamThrottled as e:
+            # YouTube throttles connections rather than streams, as long as a new request
+            # makes up for its slow end it is cheaper than anything else
+            received = downloaded - range_start
+            recovered = min_rate is not None and waited > 0 and received / waited >= min_rate
+            throttled = 1 if recovered else throttled + 1
+            if throttled == 1:
+                logger.info("%s at offset %d, requesting the range again", e, downloaded)
+                continue
+            if throttled == 2 and refresh is not None:
+                logger.info("%s at offset %d, refreshing the stream URL", e, downloaded)
+                try:
+                    url = await refresh(url)
+                except Exception:
+                    logger.warning("Could not refresh a throttled stream URL", exc_info=True)
+                continue
+            if raise_throttled:
+                raise
+            # Nothing else can be done for this stream, a slow download still beats a failed one
+            logger.warning("%s, carrying on at that speed", e)
+            min_rate = None
+        except Exception as e:
+            failures += 1
+            if failures > policy.retries:
+                raise
+            if isinstance(e, HttpStatusError) and e.status == 403 and refresh is not None:
+                # The signature of the URL expired or was revoked
+                try:
+                    url = await refresh(url)
+                except Exception:
+                    logger.warning("Could not refresh a rejected stream URL", exc_info=True)
+                    raise e
+                continue
+            if not is_transient(e):
+                raise
+            delay = policy.retry_delay(failures)
+            logger.info("%s at offset %d, retrying in %.1f s", e, downloaded, delay)
+            await asyncio.sleep(delay)
+
+
+def split_ranges(end: int, segment_size: int, start: int = 0) -> list[tuple[int, int]]:
+    """
+    Splits the bytes from `start` to `end` into consecutive `(start, end)` ranges
+    of at most `segment_size` bytes, `end` being exclusive.
+    """
+    return [(offset, min(offset + segment_size, end)) for offset in range(start, end, segment_size)]
+
+
+def _check_size(url: str, filesize: int) -> None:
+    # Every range is planned from the size, an unknown one would end the transfer at once with nothing written
+    if filesize <= 0:
+        raise IOError(f"The size of the stream {stream_source(url)} is unknown")
+
+
+class _ContentHash:
+    """
+    The SHA-256 of a file written in any order, computed while it is written so the
+    library need not read it again. A chunk extending the hashed start of the file is
+    hashed at once, the others are read back, still in the page cache, once the
+    hashed part reaches them. Only used from the disk queue of the file.
+    """
+    def __init__(self, file: BinaryIO, written: list[tuple[int, int]]) -> None:
+        self.file = file
+        self.digest = hashlib.sha256()
+        self.offset = 0
+        # The ends of the parts written ahead of the hashed one, by their start
+        self._ahead = dict(written)
+
+    def update(self, offset: int, chunk: bytes) -> None:
+        if offset == self.offset:
+            self.digest.update(chunk)
+            self.offset += len(chunk)
+        else:
+            self._ahead[offset] = offset + len(chunk)
+        while self.offset in self._ahead:
+            end = self._ahead.pop(self.offset)
+            self.file.seek(self.offset)
+            while self.offset < end:
+                block = self.file.read(min(DOWNLOAD_CHUNK_SIZE, end - self.offset))
+                self.digest.update(block)
+                self.offset += len(block)
+
+    def hexdigest(self, filesize: int) -> str:
+        self.update(self.offset, b"")
+        if self.offset != filesize:
+            raise IOError(f"Only {self.offset} of {filesize} bytes were written")
+        return self.digest.hexdigest()
+
+
+class _DiskQueue:
+    """
+    Runs the blocking operations on one file one after the other, in the order they
+    are submitted, on the disk threads every transfer shares. Used as an async context
+    manager, which waits on exit for the operations still queued, even when the
+    transfer was cancelled, so the file is never closed under a write.
+    """
+    def __init__(self, executor: Executor) -> None:
+        self._executor = executor
+        self._last: Optional[asyncio.Future[Any]] = None
+
+    async def __aenter__(self) -> "_DiskQueue":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        if self._last is not None:
+            await asyncio.wait([self._last])
+
+    def submit(self, function: Callable[..., T], *args: Any) -> "asyncio.Future[T]":
+        """Queues `function(*args)`, returning a future of its result. Cancelling the future does not stop it."""
+        previous = self._last
+        loop = asyncio.get_running_loop()
+
+        async def run() -> T:
+            if previous is not None:
+                await asyncio.wait([previous])
+            return await loop.run_in_executor(self._executor, function, *args)
+
+        task = asyncio.ensure_future(run())
+        self._last = task
+        return asyncio.shield(task)
+
+
+def _write_at(file: BinaryIO, offset: int, chunk: bytes, content: _ContentHash) -> float:
+    """Writes a chunk at its offset in the file and hashes it, returning the seconds the write took."""
+    start = time.perf_counter()
+    file.seek(offset)
+    file.write(chunk)
+    elapsed = time.perf_counter() - start
+    content.update(offset, chunk)
+    return elapsed
+
+
+def _save_manifest(file: BinaryIO, manifest: DownloadManifest, manifest_path: str) -> None:
+    # The ranges the manifest records must reach the file before it does
+    file.flush()
+    manifest.save(manifest_path)
+
+
+def discard_partial(destination: str) -> None:
+    """Removes the partial download of `destination` and its manifest, if there are any."""
+    partial_path = destination + PARTIAL_SUFFIX
+    for path in (partial_path, partial_path + MANIFEST_SUFFIX):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def _open_partial(
+        url: str, filesize: int, partial_path: str, video_id: str, itag: int
+        ) -> tuple[DownloadManifest, bool]:
+    """
+    Returns the manifest of the partial download at `partial_path`, with the ranges whose
+    content is still intact, and whether it is resumed. A fresh one if there is nothing to resume.
+    """
+    manifest_path = partial_path + MANIFEST_SUFFIX
+    expected = DownloadManifest(video_id, itag, filesize, stream_source(url))
+    manifest = DownloadManifest.load(manifest_path)
+    resuming = (
+        manifest is not None
+        and manifest.matches(expected)
+        and os.path.isfile(partial_path)
+        and os.path.getsize(partial_path) == filesize
+    )
+    if manifest is not None and resuming:
+        # Hashing the partial file would stall every other transfer on the loop
+        await asyncio.to_thread(manifest.verify, partial_path)
+    else:
+        manifest = expected
+    await asyncio.to_thread(manifest.save, manifest_path)
+    return manifest, resuming
+
+
+def _read_at(file: BinaryIO, offset: int, size: int, content: _ContentHash) -> bytes:
+    file.seek(offset)
+    chunk = file.read(size)
+    content.update(offset, chunk)
+    return chunk
+
+
+async def download_to_file(
+        url: str,
+        filesize: int,
+        destination: str,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        connections: int = DOWNLOAD_CONNECTIONS,
+        segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+        video_id: str = "",
+        itag: int = 0,
+        on_write: Optional[Callable[[int, float], None]] = None,
+        share: Optional[BandwidthShare] = None,
+        policy: Optional[TransferPolicy] = None,
+        refresh: Optional[Callable[[str], Awaitable[str]]] = None,
+        raise_throttled: bool = False
+        ) -> str:
+    """
+    Downloads a stream to `destination` over several parallel connections,
+    without buffering it in memory, resuming any earlier partial download.
+
+    The stream is split into `segment_size` byte ranges that `connections` tasks
+    fetch concurrently, all on the engine's event loop. Each range is written at its offset
+    in a `.part` file preallocated to the full size in the destination directory,
+    which is renamed to `destination` once every range has arrived. The writes and
+    the manifest updates of the file run in order on the engine's disk threads, a few
+    shared by every transfer, so the disk never holds up the event loop, the other
+    transfers and the bandwidth limiter.
+
+    Every completed range is recorded with its checksum in a sidecar manifest.
+    When a partial file and manifest for the same video, itag, size and stream
+    media are found, the ranges whose checksum still matches are kept and only
+    the missing ones are requested. Otherwise the download starts from scratch.
+
+    Parameters
+    ----------
+    url : str
+        The signed URL of the stream.
+    filesize : int
+        The size of the stream in bytes.
+    destination : str
+        The path of the downloaded file.
+    on_progress : Optional[Callable[[int, int], None]]
+        Called after each chunk with the number of bytes downloaded so far, across
+        all connections, and the total size.
+    connections : int
+        The number of ranges fetched at the same time.
+    segment_size : int
+        The size of a range fetched by a single request.
+    video_id : str
+        The id of the video the stream belongs to, recorded in the manifest.
+    itag : int
+        The itag of the stream, recorded in the manifest.
+    on_write : Optional[Callable[[int, float], None]]
+        Called after each write to the disk with the bytes written and the seconds it took.
+    share : Optional[BandwidthShare]
+        The share of the bandwidth the download is charged to, across all its connections.
+    policy : Optional[TransferPolicy]
+        The throttling threshold and retries of each connection, see `iter_chunks`.
+    refresh : Optional[Callable[[str], Awaitable[str]]]
+        Returns a fresh URL of the stream when its URL stops working or keeps being throttled.
+        The connections starting later use the refreshed URL too.
+    raise_throttled : bool
+        Whether a connection still throttled after its URL was refreshed fails the download with
+        `StreamThrottled`, instead of carrying on slowly. The partial file is kept either way.
+
+    Returns
+    -------
+    str
+        The SHA-256 of the downloaded file, computed as it was written.
+
+    Raises
+    ------
+    IOError
+        If the size of the stream is unknown, or the transfer fails.
+    """
+    _check_size(url, filesize)
+    partial_path = destination + PARTIAL_SUFFIX
+    manifest_path = partial_path + MANIFEST_SUFFIX
+    manifest, resuming = await _open_partial(url, filesize, partial_path, video_id, itag)
+
+    downloaded = manifest.completed_bytes()
+    if on_progress is not None and downloaded:
+        on_progress(downloaded, filesize)
+
+    latest_url = url
+    async def refresh_url(stale: str) -> str:
+        nonlocal latest_url
+        latest_url = await refresh(stale)  # type: ignore[misc]
+        return latest_url
+
+    # The disk queue keeps the writes and manifest updates of every connection in order, without a lock
+    with open(partial_path, "r+b" if resuming else "w+b") as file:
+        async with _DiskQueue(get_engine().disk) as disk:
+            await disk.submit(file.truncate, filesize)
+            content = _ContentHash(file, [(completed.start, completed.end) for completed in manifest.ranges])
+
+            async def fetch(start: int, end: int) -> None:
+                # Every segment runs on the loop's thread, they need no lock between them
+                nonlocal downloaded
+                offset = start
+                digest = hashlib.sha256()
+                chunks = iter_chunks(
+                    latest_url,
+                    end,
+                    start=start,
+                    share=share,
+                    policy=policy,
+                    refresh=refresh_url if refresh is not None else None,
+                    raise_throttled=raise_throttled
+                )
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    # The other connections carry on while this chunk is written
+                    write_time = await disk.submit(_write_at, file, offset, chunk, content)
+                    downloaded += len(chunk)
+                    offset += len(chunk)
+                    if on_write is not None:
+                        on_write(len(chunk), write_time)
+                    if on_progress is not None:
+                        on_progress(downloaded, filesize)
+                manifest.ranges.append(CompletedRange(start, end, digest.hexdigest()))
+                # A copy, the connections keep adding ranges while it is written
+                snapshot = dataclasses.replace(manifest, ranges=list(manifest.ranges))
+                await disk.submit(_save_manifest, file, snapshot, manifest_path)
+
+            segments = collections.deque(
+                segment
+                for start, end in manifest.missing_ranges()
+                for segment in split_ranges(end, segment_size, start)
+            )
+
+            async def connection() -> None:
+                while segments:
+                    await fetch(*segments.popleft())
+
+            try:
+                # A failing segment cancels the others, its own error is the one reported
+                async with asyncio.TaskGroup() as group:
+                    for _ in range(min(max(1, connections), len(segments))):
+                        group.create_task(connection())
+            except BaseExceptionGroup as errors:
+                raise errors.exceptions[0]
+            sha256 = await disk.submit(content.hexdigest, filesize)
+
+    os.replace(partial_path, destination)
+    os.remove(manifest_path)
+    return sha256
+
+
+async def tee_to_file(
+        url: str,
+        filesize: int,
+        destination: str,
+        write: Callable[[bytes], Awaitable[object]],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+        video_id: str = "",
+        itag: int = 0,
+        on_write: Optional[Callable[[int, float], None]] = None,
+        share: Optional[BandwidthShare] = None,
+        policy: Optional[TransferPolicy] = None,
+        refresh: Optional[Callable[[str], Awaitable[str]]] = None
+        ) -> str:
+    """
+    Hands the content of a stream, chunk by chunk and in order, to a coroutine function
+    while saving it to `destination` like `download_to_file`, so an interrupted transfer
+    resumes instead of starting over.
+
+    The partial file and its manifest are the ones `download_to_file` uses, whichever
+    of the two wrote them. The ranges already on disk are read back from the partial
+    file and handed over as they are, only the missing ones are downloaded, one
+    `segment_size` range after the other over a single connection.
+
+    Parameters
+    ----------
+    url : str
+        The signed URL of the stream.
+    filesize : int
+        The size of the stream in bytes.
+    destination : str
+        The path of the saved stream.
+    write : Callable[[bytes], Awaitable[object]]
+        Called with each chunk, e.g. `ChunkPipe.write_async`. The next chunk is only read once it returns.
+    on_progress : Optional[Callable[[int, int], None]]
+        Called after each chunk with the number of bytes handed over so far and the total size.
+    segment_size : int
+        The size of the ranges recorded in the manifest as they complete.
+    video_id : str
+        The id of the video the stream belongs to, recorded in the manifest.
+    itag : int
+        The itag of the stream, recorded in the manifest.
+    on_write : Optional[Callable[[int, float], None]]
+        Called after each write to the disk with the bytes written and the seconds it took.
+    share : Optional[BandwidthShare]
+        The share of the bandwidth the download is charged to.
+    policy : Optional[TransferPolicy]
+        The throttling threshold and retries, see `iter_chunks`.
+    refresh : Optional[Callable[[str], Awaitable[str]]]
+        Returns a fresh URL of the stream when its URL stops working or keeps being throttled.
+
+    Returns
+    -------
+    str
+        The SHA-256 of the saved stream, computed as it was handed over.
+
+    Raises
+    ------
+    IOError
+        If the size of the stream is unknown, or the transfer fails. The partial file is kept.
+    """
+    _check_size(url, filesize)
+    partial_path = destination + PARTIAL_SUFFIX
+    manifest_path = partial_path + MANIFEST_SUFFIX
+    manifest, resuming = await _open_partial(url, filesize, partial_path, video_id, itag)
+    # The stream in order: the parts already on disk, read back, and the missing ones, downloaded
+    pieces: list[tuple[int, int, bool]] = []
+    offset = 0
+    for start, end in manifest.missing_ranges():
+        if start > offset:
+            pieces.append((offset, start, True))
+        pieces.extend((piece_start, piece_end, False) for piece_start, piece_end in split_ranges(end, segment_size, start))
+        offset = end
+    if offset < filesize:
+        pieces.append((offset, filesize, True))
+
+    latest_url = url
+    async def refresh_url(stale: str) -> str:
+        nonlocal latest_url
+        latest_url = await refresh(stale)  # type: ignore[misc]
+        return latest_url
+
+    done = 0
+    # The range being downloaded, whose part received so far is kept if the transfer is interrupted
+    range_start = offset = 0
+    digest: Optional["hashlib._Hash"] = None
+    try:
+        with open(partial_path, "r+b" if resuming else "w+b") as file:
+            async with _DiskQueue(get_engine().disk) as disk:
+                await disk.submit(file.truncate, filesize)
+                # The stream is handed over in order, the parts on disk are hashed as they are read back
+                content = _ContentHash(file, [])
+                for start, end, on_disk in pieces:
+                    if on_disk:
+                        for chunk_start in range(start, end, DOWNLOAD_CHUNK_SIZE):
+                            chunk = await disk.submit(
+                                _read_at, file, chunk_start, min(DOWNLOAD_CHUNK_SIZE, end - chunk_start), content
+                            )
+                            await write(chunk)
+                            done += len(chunk)
+                            if on_progress is not None:
+                                on_progress(done, filesize)
+                        continue
+                    range_start = offset = start
+                    digest = hashlib.sha256()
+                    chunks = iter_chunks(
+                        latest_url,
+                        end,
+                        start=start,
+                        share=share,
+                        policy=policy,
+                        refresh=refresh_url if refresh is not None else None
+                    )
+                    # What was handed over cannot be taken back, a throttled stream carries on rather than being replaced
+                    async for chunk in chunks:
+                        saved = disk.submit(_write_at, file, offset, chunk, content)
+                        await write(chunk)
+                        write_time = await saved
+                        # Only counted once on disk, so the digest always matches the bytes up to the offset
+                        digest.update(chunk)
+                        done += len(chunk)
+                        offset += len(chunk)
+                        if on_write is not None:
+                            on_write(len(chunk), write_time)
+                        if on_progress is not None:
+                            on_progress(done, filesize)
+                    manifest.ranges.append(CompletedRange(start, end, digest.hexdigest()))
+                    digest = None
+                    await disk.submit(_save_manifest, file, manifest, manifest_path)
+                sha256 = await disk.submit(content.hexdigest, filesize)
+    except BaseException:
+        # The disk queue is drained and the file closed by now
+        if digest is not None and offset > range_start:
+            manifest.ranges.append(CompletedRange(range_start, offset, digest.hexdigest()))
+            manifest.save(manifest_path)
+        raise
+
+    os.replace(partial_path, destination)
+    os.remove(manifest_path)
+    return sha256
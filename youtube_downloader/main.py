@@ -2,19 +2,44 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
+import importlib
+import threading
+import time
+from dataclasses import asdict
+from typing import TYPE_CHECKING, Optional
+
+_import_started = time.perf_counter()
+
 from PySide6.QtWidgets import QPushButton, QLabel, \
 	QMessageBox
-from PySide6.QtGui import QIcon
-from PySide6.QtCore import Qt, QObject
+from PySide6.QtGui import QIcon, QPaintEvent
+from PySide6.QtCore import Qt, QObject, QTimer, Signal
 from PySide6.QtWidgets import QApplication, QWidget, QVBoxLayout
 
-from .core.constants import Formats
-from .workers.video_data import DownloadWorker
-from .workers.preview_worker import PreviewWorker
-from .components import PreviewSection, ControlSection, ProgressSection, MessageBox 
+_qt_imported = time.perf_counter()
+
+from .core.constants import Formats, INTERACTIVE_PRIORITY
+from .components import PreviewSection, ControlSection, ProgressSection, MessageBox, QueueSection
 
 from .core.state import AppState
-from .core.events import EventBus
+from .core.batch import is_batch_url
+from .core.progress import overall_progress
+from .core.startup import STARTUP_PROFILE_FLAG, StartupProfile
+from .models.job import DownloadJob, JobProgress, JobState
+from .models.video_data import VideoPreviewData
+
+if TYPE_CHECKING:
+	from .workers.video_data import DownloadWorker
+	from .workers.preview_worker import PreviewWorker
+	from .workers.batch_worker import BatchWorker
+
+_startup = StartupProfile(_import_started)
+_startup.add("import Qt", _qt_imported - _import_started)
+_startup.add("import the application", time.perf_counter() - _qt_imported)
+
+# The workers pull in pytubefix and python-ffmpeg, which the window does not need
+# to show up. They are imported on a background thread once it is painted, or on first use.
+DEFERRED_IMPORTS = (".workers.video_data", ".workers.preview_worker", ".workers.batch_worker")
 
 
 def format_time(seconds: int) -> str:
@@ -51,20 +76,33 @@ def format_time(seconds: int) -> str:
 
 
 class YouTubeDownloader(QWidget):
-	def __init__(self):
+	# The scheduler starts jobs from whichever thread freed a slot, workers must be created on the GUI thread
+	job_start_requested = Signal(DownloadJob)
+	# Emitted once the deferred modules are imported, after the first paint
+	preloaded = Signal()
+
+	def __init__(self, startup: Optional[StartupProfile] = None):
 		super().__init__()
-		self.state = AppState(os.getcwd())
-		self.event_bus = EventBus()
+		self.startup = startup if startup is not None else StartupProfile()
+		with self.startup.phase("application state"):
+			self.state = AppState(os.getcwd(), self.job_start_requested.emit)
+		self.event_bus = self.state.events
 		
-		# Initialize components
-		self.preview_section = PreviewSection(self)
-		self.control_section = ControlSection(self)
-		self.progress_section = ProgressSection(self)
+		# Initialize components, the preview and progress sections are only built once they have something to show
+		self._preview_section: Optional[PreviewSection] = None
+		self._progress_section: Optional[ProgressSection] = None
+		with self.startup.phase("control section"):
+			self.control_section = ControlSection(self)
+		with self.startup.phase("queue section"):
+			self.queue_section = QueueSection(self.state.queue, self)
 		
-		self.worker = None
-		self.preview_worker = None
+		self.workers: dict[int, "DownloadWorker"] = {}
+		self.batch_workers: list["BatchWorker"] = []
+		self._preview_worker: Optional["PreviewWorker"] = None
+		self._painted = False
 		
-		self.init_ui()
+		with self.startup.phase("layout"):
+			self.init_ui()
 		self.connect_signals()
 		
 	def init_ui(self):
@@ -73,54 +111,168 @@ class YouTubeDownloader(QWidget):
 		
 		layout.addWidget(self.control_section)
 		# layout.addWidget(self.progress_section)
-		layout.addWidget(self.preview_section)
+		layout.addWidget(self.queue_section)
 		
 		self.setLayout(layout)
+		# Kept typed, `self.layout()` may be None as far as the type checker knows
+		self._layout = layout
 		self.setMinimumSize(800, 400)
+
+	@property
+	def preview_section(self) -> PreviewSection:
+		if self._preview_section is None:
+			self._preview_section = PreviewSection(self)
+			self._layout.addWidget(self._preview_section)
+		return self._preview_section
+
+	@property
+	def progress_section(self) -> ProgressSection:
+		if self._progress_section is None:
+			self._progress_section = ProgressSection(self)
+		return self._progress_section
+
+	@property
+	def preview_worker(self) -> "PreviewWorker":
+		# A single worker for every preview, so a new URL cancels the loads of the previous ones instead of racing them
+		if self._preview_worker is None:
+			from .workers.preview_worker import PreviewWorker
+			self._preview_worker = PreviewWorker()
+			# Emitted on the engine's threads, methods of the window are called on the GUI thread
+			self._preview_worker.finished.connect(self.show_preview)
+			self._preview_worker.error.connect(self.show_preview_error)
+		return self._preview_worker
+
+	def paintEvent(self, event: QPaintEvent) -> None:
+		super().paintEvent(event)
+		if not self._painted:
+			self._painted = True
+			self.startup.mark_first_paint()
+			# Queued, so the imports start once this paint has reached the screen
+			QTimer.singleShot(0, self.start_preload)
+
+	def start_preload(self) -> None:
+		threading.Thread(target=self.preload, name="preload", daemon=True).start()
+
+	def preload(self) -> None:
+		"""Imports the deferred modules, so the first download or preview does not wait for them."""
+		with self.startup.phase("deferred imports, in the background"):
+			for name in DEFERRED_IMPORTS:
+				with self.startup.phase(f"import {name.lstrip('.')}"):
+					importlib.import_module(name, __package__)
+		self.preloaded.emit()
 		
 	def connect_signals(self):
 		# Control Section Signals
 		self.control_section.preview_clicked.connect(self.preview_video)
+		self.control_section.url_settled.connect(self.prefetch_preview)
 		self.control_section.download_clicked.connect(self.handle_download)
 		self.control_section.directory_changed.connect(self.handle_directory_change)
 
 		# Connect Progress Section to state changes
 		self.state.state_changed.connect(self.update_ui_state)
 
-	def handle_download(self, url: str, format_name: str) -> None:
-		self.state.update(
-			url=url,
-			format=format_name,
-			is_downloading=True
-		)
-		self.start_download()
+		# Queue Signals
+		self.job_start_requested.connect(self.start_download)
+		self.state.job_changed.connect(self.handle_job_changed)
+
+	def handle_download(self, url: str, format_names: list[str], priority: int = 0) -> None:
+		self.state.update(format=format_names[0])
+		if is_batch_url(url):
+			self.start_batch(url, format_names, priority)
+			return
+		# A single video is waited for, unlike the videos of a playlist it goes ahead of them
+		self.state.scheduler.submit(DownloadJob(
+			url,
+			self.state.path,
+			Formats[format_names[0]].value,
+			priority + INTERACTIVE_PRIORITY,
+			[Formats[name].value for name in format_names[1:]]
+		))
+
+	def start_batch(self, url: str, format_names: list[str], priority: int = 0) -> None:
+		"""
+		Expands a playlist or channel in the background and queues its videos as they are found.
+		"""
+		from .workers.batch_worker import BatchWorker
+		path = self.state.path
+		file_format, *extra_formats = (Formats[name].value for name in format_names)
+		worker = BatchWorker(url)
+		worker.videos_found.connect(lambda urls: self.state.scheduler.submit_many([
+			DownloadJob(video_url, path, file_format, priority, list(extra_formats)) for video_url in urls
+		]))
+		worker.error.connect(lambda msg: self.show_message_box(
+			QMessageBox.Icon.Critical,
+			self,
+			"Playlist Error",
+			msg
+		))
+		# QThread's own finished signal, emitted once the thread has exited
+		worker.finished.connect(lambda: self.batch_workers.remove(worker))
+		self.batch_workers.append(worker)
+		worker.start()
 
 	def handle_directory_change(self, path: str) -> None:
 		self.state.update(path=path)
 
 	def update_ui_state(self) -> None:
 		# Update UI based on state changes
-		self.progress_section.setVisible(self.state.is_downloading)
-		self.control_section.setEnabled(not self.state.is_downloading)
-
-	def preview_video(self) -> None:
-		self.preview_worker = PreviewWorker(self.state.url)
-		# Preview Worker Signals
-		self.preview_worker.finished.connect(self.preview_section.update_preview)
-		self.preview_worker.error.connect(lambda msg: self.show_message_box(
+		if self._progress_section is not None or self.state.is_downloading:
+			self.progress_section.setVisible(self.state.is_downloading)
+		self.queue_section.update_summary(*overall_progress(self.state.scheduler.jobs))
+
+	def prefetch_preview(self, url: str) -> None:
+		# Loading starts while the user is still deciding, the metadata is also what the download needs
+		self.preview_worker.prefetch(url)
+
+	def preview_video(self, url: str) -> None:
+		self.preview_worker.preview(url)
+
+	def show_preview(self, data: VideoPreviewData) -> None:
+		self.preview_section.update_preview(data)
+
+	def show_preview_error(self, message: str) -> None:
+		self.show_message_box(
 			QMessageBox.Icon.Critical, 
 			self, 
 			"Preview Error", 
-			msg
-		))
-		self.preview_worker.start()
+			message
+		)
 
-	def start_download(self) -> None:
-		self.worker = DownloadWorker(
-			self.state.url,
-			self.state.path,
-			Formats[self.state.format].value
+	def start_download(self, job: DownloadJob) -> None:
+		from .workers.video_data import DownloadWorker
+		scheduler = self.state.scheduler
+		worker = DownloadWorker(
+			job.url,
+			job.path,
+			job.format,
+			priority=job.priority,
+			extra_formats=job.extra_formats
 		)
+		# The scheduler is thread-safe, so these handlers may run on any thread
+		worker.title_resolved.connect(lambda title: scheduler.update(job, title=title))
+		worker.progress_updated.connect(lambda progress: scheduler.update(job, **asdict(progress)))
+		worker.state_changed.connect(lambda state: scheduler.update(job, state=state, **asdict(JobProgress(0))))
+		worker.error.connect(lambda msg: scheduler.update(job, state=JobState.FAILED, error=msg))
+		def on_finished() -> None:
+			if job.state is not JobState.FAILED:
+				scheduler.update(job, state=JobState.DONE, **asdict(JobProgress(100)))
+		worker.finished.connect(on_finished)
+		self.workers[job.id] = worker
+		worker.start()
+
+	def handle_job_changed(self, job: DownloadJob) -> None:
+		if job.state.is_finished and job.id in self.workers:
+			# The job is reported finished from its done callback, by then its future has completed
+			self.workers.pop(job.id).wait()
+
+	def show_message_box(
+			self,
+			message_level: QMessageBox.Icon,
+			parent: QWidget,
+			title: str,
+			message: str
+			) -> None:
+		MessageBox(parent, title, message, message_level).exec()
 
 	def make_label_selectable(self, widget: QWidget | QObject) -> None:
 		"""
@@ -153,14 +305,23 @@ def main() -> int:
 	try:
 		import logging
 		logging.basicConfig(filename='error.log', level=logging.ERROR)
-		app = QApplication(sys.argv)
-		app.setApplicationName("YouTube Downloader")
-		app.setWindowIcon(QIcon("youtube_downloader/assets/icon.png"))
-		ex = YouTubeDownloader()
+		with _startup.phase("create the application"):
+			app = QApplication(sys.argv)
+			app.setApplicationName("YouTube Downloader")
+			app.setWindowIcon(QIcon("youtube_downloader/assets/icon.png"))
+		with _startup.phase("build the window"):
+			ex = YouTubeDownloader(_startup)
+		if STARTUP_PROFILE_FLAG in sys.argv:
+			# Reports once the deferred imports are done too, then exits, so cold starts can be compared
+			def report() -> None:
+				print(_startup.report(), file=sys.stderr)
+				app.quit()
+			ex.preloaded.connect(report)
 		global _app, _ex
 		_app = app
 		_ex = ex
-		ex.show()
+		with _startup.phase("show the window"):
+			ex.show()
 		return app.exec()
 	except Exception as e:
 		logging.exception(e)
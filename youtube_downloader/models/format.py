@@ -1,11 +1,18 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class Format:
     name: str
     extension: str
     ffmpeg_args: str
+    audio_only: bool = False
+    # Container of the YouTube streams preferred as a source, whose codecs this format can hold as they are
+    source_extension: Optional[str] = None
+    # Codecs, as named in YouTube's stream manifest, that this format can hold without encoding them again
+    copy_codecs: tuple[str, ...] = ()
+    # How the container holds cover art: "attached_pic" as a picture track, "picture_block" as a Vorbis comment, None if it cannot
+    cover_art: Optional[str] = None
 
     def __str__(self) -> str:
         return self.extension
-    
\ No newline at end of file
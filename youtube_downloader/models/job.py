@@ -0,0 +1,54 @@
+import itertools
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Optional
+from .format import Format
+
+_job_ids = itertools.count(1)
+
+
+class JobState(Enum):
+    QUEUED = "Queued"
+    DOWNLOADING = "Downloading"
+    CONVERTING = "Converting"
+    DONE = "Done"
+    FAILED = "Failed"
+
+    @property
+    def is_finished(self) -> bool:
+        return self in (JobState.DONE, JobState.FAILED)
+
+
+@dataclass
+class JobProgress:
+    """
+    A progress report of the current step of a job, named after the fields of
+    `DownloadJob` it updates. `speed` and `remaining` are in bytes while
+    downloading, 0 otherwise.
+    """
+    progress: int
+    speed: float = 0.0
+    eta: Optional[float] = None
+    remaining: int = 0
+
+
+@dataclass
+class DownloadJob:
+    url: str
+    path: str
+    format: Format
+    priority: int = 0
+    # Formats also made from the same download, by the same FFmpeg run as `format`
+    extra_formats: list[Format] = field(default_factory=list)
+    state: JobState = JobState.QUEUED
+    progress: int = 0
+    speed: float = 0.0
+    eta: Optional[float] = None
+    remaining: int = 0
+    title: str = ""
+    error: str = ""
+    id: int = field(default_factory=lambda: next(_job_ids))
+
+    @property
+    def formats(self) -> list[Format]:
+        return [self.format, *self.extra_formats]
@@ -1,8 +1,12 @@
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PySide6.QtGui import QImage
 
 @dataclass
 class VideoPreviewData:
     title: str
     duration: int
     description: str
-    thumbnail_data: bytes
\ No newline at end of file
+    thumbnail: "QImage"
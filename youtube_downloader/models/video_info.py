@@ -0,0 +1,91 @@
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+# Lifetime assumed for stream URLs that do not carry an expire parameter
+DEFAULT_STREAM_LIFETIME = 6 * 3600
+
+
+@dataclass
+class StreamInfo:
+    itag: int
+    url: str
+    mime_type: str
+    is_progressive: bool
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    resolution: Optional[str] = None
+    abr: Optional[str] = None
+    bitrate: Optional[int] = None
+    filesize: int = 0
+
+    def __post_init__(self) -> None:
+        if not self.filesize:
+            # Signed stream URLs carry the content length, saving a HEAD request
+            self.filesize = int(self._query_value("clen") or 0)
+
+    def _query_value(self, key: str) -> Optional[str]:
+        values = parse_qs(urlparse(self.url).query).get(key)
+        return values[0] if values else None
+
+    @property
+    def extension(self) -> str:
+        return self.mime_type.split("/")[-1]
+
+    @property
+    def includes_video(self) -> bool:
+        return self.video_codec is not None
+
+    @property
+    def includes_audio(self) -> bool:
+        return self.audio_codec is not None
+
+    @property
+    def height(self) -> int:
+        """The height of the video track in pixels, 0 for audio-only streams."""
+        digits = "".join(itertools.takewhile(str.isdigit, self.resolution or ""))
+        return int(digits or 0)
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        """The time at which the signed URL expires, if the URL says so."""
+        expire = self._query_value("expire")
+        return float(expire) if expire else None
+
+
+@dataclass
+class VideoInfo:
+    """
+    The resolved metadata and stream manifest of a video, detached from pytubefix
+    so it can be cached and stored.
+    """
+    video_id: str
+    title: str
+    author: str
+    length: int
+    description: str
+    thumbnail_url: str
+    streams: list[StreamInfo] = field(default_factory=list)
+    resolved_at: float = field(default_factory=time.time)
+
+    @property
+    def streams_expire_at(self) -> float:
+        """The time at which the first stream URL expires."""
+        expirations = [stream.expires_at for stream in self.streams if stream.expires_at is not None]
+        return min(expirations, default=self.resolved_at + DEFAULT_STREAM_LIFETIME)
+
+    def streams_expired(self, margin: float = 0) -> bool:
+        """Whether a stream URL expires within `margin` seconds."""
+        return time.time() + margin >= self.streams_expire_at
+
+    def find_stream(self, progressive: Optional[bool] = None, extension: Optional[str] = None) -> Optional[StreamInfo]:
+        """Returns the first stream matching the criteria, in the order YouTube lists them."""
+        for stream in self.streams:
+            if progressive is not None and stream.is_progressive != progressive:
+                continue
+            if extension is not None and stream.extension != extension:
+                continue
+            return stream
+        return None
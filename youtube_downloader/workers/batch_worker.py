@@ -0,0 +1,34 @@
+from PySide6.QtCore import QThread, Signal
+from ..core.batch import iter_video_urls
+from ..core.constants import BATCH_SIZE
+
+class BatchWorker(QThread):
+    """
+    Expands a playlist or channel URL into its video URLs, handing them over in
+    batches as the pages are fetched so the first videos can start downloading
+    before the whole playlist is known.
+    """
+    videos_found = Signal(list)
+    completed = Signal(int)
+    error = Signal(str)
+
+    def __init__(self, url: str, batch_size: int = BATCH_SIZE) -> None:
+        super().__init__()
+        self.url = url
+        self.batch_size = batch_size
+
+    def run(self) -> None:
+        try:
+            batch: list[str] = []
+            count = 0
+            for video_url in iter_video_urls(self.url):
+                batch.append(video_url)
+                count += 1
+                if len(batch) >= self.batch_size:
+                    self.videos_found.emit(batch)
+                    batch = []
+            if batch:
+                self.videos_found.emit(batch)
+            self.completed.emit(count)
+        except Exception as e:
+            self.error.emit(str(e))
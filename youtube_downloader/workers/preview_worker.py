@@ -1,26 +1,126 @@
-from PySide6.QtCore import QThread, Signal
-from pytubefix import YouTube
-import requests
+import asyncio
+import concurrent.futures
+import threading
+from typing import Optional
+from PySide6.QtCore import QObject, Signal, QBuffer, QByteArray, QIODevice, Qt
+from PySide6.QtGui import QImage, QImageWriter
+from ..core.batch import find_video_id
+from ..core.constants import THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT
+from ..core.engine import DownloadEngine, get_engine
+from ..core.resolver import get_resolver
+from ..core.thumbnails import get_thumbnail_cache, original_key
 from ..models.video_data import VideoPreviewData
 
-class PreviewWorker(QThread):
+
+class PreviewWorker(QObject):
+    """
+    Loads the previews of videos on the download engine, ahead of a click when possible.
+
+    `prefetch` is called with the URL being typed once it settles, and starts loading
+    its preview speculatively. `preview` asks for the preview to be shown: it is
+    emitted at once if the prefetch already finished, or as soon as it does, so a
+    preview is never loaded twice. Each new URL cancels the loads of the previous
+    ones, unless it is the preview waiting to be shown. A metadata lookup already
+    running finishes anyway, into the resolver's cache, where the download of the
+    video finds it.
+
+    Only the preview asked for last is emitted, a slower earlier one is dropped.
+    """
     finished = Signal(VideoPreviewData)
     error = Signal(str)
-    
-    def __init__(self, url: str) -> None:
+
+    def __init__(self, engine: Optional[DownloadEngine] = None) -> None:
         super().__init__()
-        self.url = url
-        
-    def run(self) -> None:
+        self.engine = engine if engine is not None else get_engine()
+        self._loads: dict[str, concurrent.futures.Future[VideoPreviewData]] = {}
+        self._wanted: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def prefetch(self, url: str) -> None:
+        """Starts loading the preview of `url` if it points to a video, cancelling the loads no longer needed."""
+        video_id = find_video_id(url)
+        if video_id is not None:
+            self._load(url, video_id)
+
+    def preview(self, url: str) -> None:
+        """Emits the preview of `url` once it is loaded, which may be right away."""
+        # Anything that is not recognized as a video is still looked up, for the resolver to report the error
+        video_id = find_video_id(url) or url
+        with self._lock:
+            self._wanted = video_id
+        self._load(url, video_id).add_done_callback(lambda future: self._deliver(video_id, future))
+
+    def cancel(self) -> None:
+        """Cancels every load, including the preview waiting to be shown."""
+        with self._lock:
+            self._wanted = None
+            loads, self._loads = self._loads, {}
+        for future in loads.values():
+            future.cancel()
+
+    def _load(self, url: str, video_id: str) -> concurrent.futures.Future[VideoPreviewData]:
+        with self._lock:
+            future = self._loads.get(video_id)
+            # A failed load, e.g. from a network blip while prefetching, is tried again rather than reported forever
+            if future is None or future.cancelled() or (future.done() and future.exception() is not None):
+                future = self.engine.submit(self._load_preview(url))
+            keep = {video_id, self._wanted}
+            stale = [load for key, load in self._loads.items() if key not in keep]
+            self._loads = {key: load for key, load in self._loads.items() if key in keep}
+            self._loads[video_id] = future
+        for load in stale:
+            load.cancel()
+        return future
+
+    def _deliver(self, video_id: str, future: concurrent.futures.Future[VideoPreviewData]) -> None:
+        with self._lock:
+            if video_id != self._wanted or future.cancelled():
+                return
         try:
-            video = YouTube(self.url)
-            response = requests.get(video.thumbnail_url)
-            preview_data = VideoPreviewData(
-                title=video.title,
-                duration=video.length,
-                description=video.description or "No description available",
-                thumbnail_data=response.content
-            )
-            self.finished.emit(preview_data)
+            self.finished.emit(future.result())
         except Exception as e:
-            self.error.emit(str(e))
\ No newline at end of file
+            self.error.emit(str(e))
+
+    async def _load_preview(self, url: str) -> VideoPreviewData:
+        # Resolved through the shared cache, so downloading the previewed video needs no new lookup.
+        # Shielded since other callers may share the lookup, cancelling the preview must not cancel it for them.
+        video = await asyncio.shield(asyncio.wrap_future(get_resolver().fetch(url, streams=False)))
+        return VideoPreviewData(
+            title=video.title,
+            duration=video.length,
+            description=video.description or "No description available",
+            thumbnail=await self.load_thumbnail(video.video_id, video.thumbnail_url)
+        )
+
+    async def load_thumbnail(self, video_id: str, thumbnail_url: str) -> QImage:
+        """
+        Returns the thumbnail of a video scaled for display, decoded off the GUI thread
+        so it only has to paint it. A video without a thumbnail gets a null image.
+        """
+        cache = get_thumbnail_cache()
+        data = await asyncio.to_thread(cache.get, video_id)
+        if data is not None:
+            image = QImage.fromData(data)
+            if not image.isNull():
+                return image
+        if not thumbnail_url:
+            return QImage()
+        async with self.engine.http.get(thumbnail_url) as body:
+            content = b"".join([chunk async for chunk in body])
+        return await asyncio.to_thread(self._scale_thumbnail, video_id, content)
+
+    @staticmethod
+    def _scale_thumbnail(video_id: str, content: bytes) -> QImage:
+        # Kept as it is too, for the cover art of a download of the video
+        get_thumbnail_cache().put(original_key(video_id), content)
+        image = QImage.fromData(content).scaled(
+            THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        # QImage.save takes the format as a str, which its stubs type as bytes
+        QImageWriter(buffer, QByteArray(b"PNG")).write(image)
+        get_thumbnail_cache().put(video_id, bytes(buffer.data()))
+        return image
@@ -1,15 +1,18 @@
-import os
-from io import BytesIO
-from PySide6.QtCore import QThread, Signal
-from ffmpeg import Progress, FFmpeg  # type: ignore
-from pytubefix import YouTube, Stream
+import concurrent.futures
+from typing import Optional, Sequence
+from PySide6.QtCore import QObject, Signal
 from ..models.format import Format
-from ..core.constants import Formats
+from ..models.job import JobProgress, JobState
+from ..core.constants import DOWNLOAD_CONNECTIONS, DOWNLOAD_SEGMENT_SIZE
+from ..core.downloader import Downloader
 
 
-class DownloadWorker(QThread):
+class DownloadWorker(QObject):
 	"""
-	A worker thread that downloads a YouTube video and optionally converts it to a different format.
+	The bridge between the Qt UI and a `Downloader` running on the download engine.
+
+	It owns no thread: the job runs on the engine's event loop, and its signals are
+	emitted from the engine's threads, which Qt delivers to widgets on the GUI thread.
 
 	Attributes
 	----------
@@ -19,68 +22,73 @@ class DownloadWorker(QThread):
 		The path where the video will be saved.
 	format : Format
 		The format in which the video will be downloaded.
+	downloader : Downloader
+		The Qt-free downloader doing the actual work.
 	"""
-	progress_updated = Signal(int)
+	progress_updated = Signal(JobProgress)
 	status_updated = Signal(str)
+	state_changed = Signal(JobState)
+	title_resolved = Signal(str)
 	visibility_changed = Signal(bool)
 	finished = Signal()
 	error = Signal(str)
 	
-	def __init__(self, url: str, path: str, file_format: Format) -> None:
+	def __init__(
+			self,
+			url: str,
+			path: str,
+			file_format: Format,
+			pipelined: bool = True,
+			connections: int = DOWNLOAD_CONNECTIONS,
+			segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+			priority: int = 0,
+			extra_formats: Sequence[Format] = ()
+			) -> None:
 		super().__init__()
 		self.url = url
 		self.path = path
 		self.format = file_format
-		def on_progress(stream: Stream, _: bytes, bytes_remaining: int) -> None:
-			self.progress_updated.emit(int((stream.filesize - bytes_remaining) / stream.filesize * 100))
-		self._on_progress_download = on_progress
+		self.downloader = Downloader(
+			url,
+			path,
+			file_format,
+			pipelined,
+			connections,
+			segment_size,
+			priority=priority,
+			extra_formats=extra_formats,
+			on_progress=self.progress_updated.emit,
+			on_status=self.status_updated.emit,
+			on_state=self.state_changed.emit,
+			on_title=self.title_resolved.emit
+		)
+
+		self._future: Optional[concurrent.futures.Future[str]] = None
 
-	def run(self) -> None:
+	def start(self) -> None:
 		self.status_updated.emit("Downloading video...")
 		self.visibility_changed.emit(True)
-		self.progress_updated.emit(0)
+		self.progress_updated.emit(JobProgress(0))
+		self._future = self.downloader.submit()
+		self._future.add_done_callback(self._on_done)
+
+	def cancel(self) -> None:
+		self.downloader.cancel()
+
+	def wait(self) -> None:
+		"""Blocks until the job has ended, which it has by the time `finished` or `error` is emitted."""
+		if self._future is not None:
+			concurrent.futures.wait([self._future])
+
+	def _on_done(self, future: concurrent.futures.Future[str]) -> None:
 		try:
-			video = YouTube(self.url, on_progress_callback=self._on_progress_download)
-			stream = video.streams.filter(progressive=True, file_extension='mp4').first()
-			video_path = os.path.join(self.path, f"{video.title}.mp4")
-			buffer = BytesIO()
-			stream.stream_to_buffer(buffer)
-			buffer.seek(0)
-			if self.format.extension != "mp4":
-				self.convert_video(video.title, buffer.getvalue(), Formats[self.format.name].value, self.path)
-			else:
-				with open(video_path, "wb") as file:
-					file.write(buffer.getvalue())
-			self.progress_updated.emit(0)
+			future.result()
+			self.progress_updated.emit(JobProgress(0))
 			self.finished.emit()
+		except concurrent.futures.CancelledError:
+			self.error.emit("Cancelled")
 		except Exception as e:
 			self.error.emit(str(e))
 		finally:
 			self.status_updated.emit("Download complete!")
 			self.visibility_changed.emit(False)
-
-	def convert_video(self, name: str, input_data: bytes, output_format: Format, path: str) -> None:
-		"""
-		Converts the video to the specified format using FFmpeg.
-
-		Parameters
-		----------
-		name : str
-			The name of the video file.
-		input_data : bytes
-			The binary data of the video file.
-		output_format : Format
-			The format to which the video will be converted.
-		"""
-		output_file = os.path.join(path, f"{name}.{output_format.extension}")
-		self.status_updated.emit(f"Converting to {output_format}...")
-		self.progress_updated.emit(0)
-		try:
-			process = FFmpeg().input("pipe:0").output(output_file)
-			@process.on('progress')
-			def on_progress(progress: Progress) -> None:
-				self.progress_updated.emit(int(progress.size/len(input_data)*100))
-			process.execute(input_data)
-		except Exception as e:
-			self.error.emit(f"Conversion failed: {str(e)}")
-